@@ -1,3 +1,8 @@
+from .array_spec import ArraySpec
+from .dispatcher import jit
+
+__version__ = '0.1.1'
+
 def add_func_decorator(tree, decorator):
     """
     Adds a decorator to all functions in the AST.
@@ -0,0 +1,197 @@
+import re
+
+_SIGNATURE_RE = re.compile(r"^\s*(\w+)\s*(?:\[([^\]]*)\])?\s*(?::\s*([CFA]))?\s*$")
+
+
+def _normalize_dtype(dtype):
+    '''
+    Canonical dtype name, e.g. 'f4' -> 'float32'. Falls back to `str(dtype)`
+    when numpy is not available.
+    '''
+    try:
+        import numpy as np
+    except ImportError:
+        return str(dtype)
+    return np.dtype(dtype).name
+
+
+def _is_memmap(val):
+    return any(cls.__name__ == 'memmap' for cls in type(val).__mro__)
+
+
+class ArraySpec:
+    '''
+    A lightweight stand-in for an array argument that carries only the static
+    information the analyses need: shape, dtype, strides and memory order.
+    It can be passed in `runtime_vals` wherever an array is accepted, so
+    kernels can be compiled without allocating their inputs.
+
+    Specs are immutable and hash in constant time, which makes them suitable
+    as cache keys.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        The array shape. An empty tuple describes a scalar.
+    dtype : str or dtype-like, optional
+        The element type. Default is 'float64'.
+    strides : tuple of int, optional
+        Byte strides, or None for a contiguous array in `order`.
+    order : {'C', 'F', 'A'}, optional
+        Memory order. Default is 'C'.
+    memmap : bool, optional
+        Whether the array is an `np.memmap`, which passes such as
+        `stream_memmap` treat differently. Default is False.
+    '''
+    __slots__ = ('shape', 'dtype', 'strides', 'order', 'memmap', '_hash')
+
+    def __init__(self, shape, dtype='float64', strides=None, order='C', memmap=False):
+        if order not in ('C', 'F', 'A'):
+            raise ValueError(f"order must be 'C', 'F' or 'A', got {order!r}")
+        object.__setattr__(self, 'shape', tuple(int(d) for d in shape))
+        object.__setattr__(self, 'dtype', _normalize_dtype(dtype))
+        object.__setattr__(self, 'strides', tuple(strides) if strides is not None else None)
+        object.__setattr__(self, 'order', order)
+        object.__setattr__(self, 'memmap', bool(memmap))
+        object.__setattr__(self, '_hash', hash((self.shape, self.dtype, self.strides, self.order, self.memmap)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ArraySpec is immutable")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, ArraySpec):
+            return NotImplemented
+        return (
+            self._hash == other._hash
+            and self.shape == other.shape
+            and self.dtype == other.dtype
+            and self.strides == other.strides
+            and self.order == other.order
+            and self.memmap == other.memmap
+        )
+
+    def __repr__(self):
+        if self.memmap:
+            return f"ArraySpec({self.signature()!r}, memmap=True)"
+        return f"ArraySpec({self.signature()!r})"
+
+    def __reduce__(self):
+        return (ArraySpec, (self.shape, self.dtype, self.strides, self.order, self.memmap))
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        n = 1
+        for d in self.shape:
+            n *= d
+        return n
+
+    @property
+    def itemsize(self):
+        import numpy as np
+        return np.dtype(self.dtype).itemsize
+
+    @property
+    def nbytes(self):
+        return self.size * self.itemsize
+
+    def signature(self):
+        '''
+        The signature string this spec can be rebuilt from, e.g.
+        'float32[3, 4]:F'.
+        '''
+        sig = self.dtype
+        if self.shape:
+            sig += "[" + ", ".join(str(d) for d in self.shape) + "]"
+        if self.order != 'C':
+            sig += f":{self.order}"
+        return sig
+
+    @classmethod
+    def from_array(cls, array):
+        '''
+        Build a spec from an array-like object with `.shape` and `.dtype`.
+        Memory-mapped arrays give specs with `memmap` set.
+        '''
+        flags = getattr(array, 'flags', None)
+        if flags is not None and flags['C_CONTIGUOUS']:
+            order = 'C'
+        elif flags is not None and flags['F_CONTIGUOUS']:
+            order = 'F'
+        else:
+            order = 'A'
+        strides = getattr(array, 'strides', None) if order == 'A' else None
+        return cls(array.shape, array.dtype, strides, order, _is_memmap(array))
+
+    @classmethod
+    def from_signature(cls, sig):
+        '''
+        Parse a signature string of the form `dtype[d0, d1, ...]`, optionally
+        followed by `:C`, `:F` or `:A`. A bare dtype describes a scalar.
+
+        Examples
+        --------
+        ::
+
+            ArraySpec.from_signature("float32[1024, 3]")
+            ArraySpec.from_signature("f8[100]:F")
+        '''
+        m = _SIGNATURE_RE.match(sig)
+        if m is None:
+            raise ValueError(f"Invalid array signature: {sig!r}")
+        dtype, dims, order = m.groups()
+        shape = tuple(int(d) for d in dims.split(',') if d.strip()) if dims else ()
+        return cls(shape, dtype, order=order or 'C')
+
+
+def to_spec(val):
+    '''
+    Convert an array-like runtime value to an `ArraySpec`. Scalars, modules,
+    specs and other values are returned unchanged.
+    '''
+    if isinstance(val, ArraySpec):
+        return val
+    if hasattr(val, 'shape') and hasattr(val, 'dtype') and len(val.shape) > 0:
+        return ArraySpec.from_array(val)
+    return val
+
+
+def to_specs(runtime_vals):
+    '''
+    Return a copy of `runtime_vals` with every array replaced by its spec.
+    '''
+    return {var: to_spec(val) for var, val in runtime_vals.items()}
+
+
+def value_signature(val):
+    '''
+    A string describing what the analyses can observe of a runtime value:
+    the spec signature of arrays, the module name of modules and the type of
+    scalars, e.g. 'float64[3, 4]', 'module:numpy' or 'int'.
+    '''
+    import inspect
+    if inspect.ismodule(val):
+        return f"module:{val.__name__}"
+    spec = to_spec(val)
+    if isinstance(spec, ArraySpec):
+        sig = spec.signature()
+        if spec.strides is not None:
+            sig += str(list(spec.strides))
+        if spec.memmap:
+            sig += ":memmap"
+        return sig
+    return type(val).__name__
+
+
+def runtime_signature(runtime_vals):
+    '''
+    A canonical string describing `runtime_vals` for use in cache keys, e.g.
+    'a: float64[3, 4]; n: int'.
+    '''
+    return "; ".join(f"{var}: {value_signature(runtime_vals[var])}" for var in sorted(runtime_vals))
@@ -0,0 +1,282 @@
+'''
+Autotuning of pipelines by measurement.
+
+Whether the loops generated by `vector_op_to_loop` beat the NumPy code, or
+which options of a pass work best, depends on the sizes and the host. An
+`Autotuner` transforms a kernel with every candidate pipeline of a search
+space, checks the outputs of each candidate against the original code, times
+them in-process and keeps the fastest. The choice is stored in a `TuningDB`
+keyed on the kernel, the signature of the runtime values, the search space and
+the host, so later calls with the same key reuse it without measuring::
+
+    space = SearchSpace(
+        lambda loops, jit: (['vector_op_to_loop'] if loops else []) +
+                           ([('add_func_decorator', {'decorator': 'numba.njit'})] if jit else []),
+        loops=[False, True], jit=[False, True],
+    )
+    tuner = Autotuner(space, db_path="~/.cache/astpass/tuning.json")
+    new_src = tuner.transform(src, runtime_vals)
+'''
+import hashlib
+import itertools
+import json
+import os
+import platform
+import signal
+import tempfile
+import threading
+import time
+
+from . import harness
+from .array_spec import runtime_signature
+from .transform_cache import pipeline_key
+
+
+def host_id():
+    '''
+    A string identifying the host, so that choices measured on one machine
+    are not reused on another.
+    '''
+    return f"{platform.node()}/{platform.machine()}/{platform.processor() or '?'}/{os.cpu_count()}"
+
+
+def call_with_deadline(func, timeout):
+    '''
+    Return `func()`, or raise TimeoutError once `timeout` seconds have passed.
+
+    On the main thread, where the platform has interval timers, a timer
+    signal interrupts `func` (after the NumPy call it is in, if any).
+    Elsewhere `func` runs on a daemon thread that is abandoned, still
+    running, when the deadline passes.
+    '''
+    if timeout <= 0:
+        raise TimeoutError("no time left")
+    if threading.current_thread() is threading.main_thread() and hasattr(signal, 'setitimer'):
+        def expire(signum, frame):
+            raise TimeoutError(f"exceeded {timeout:.3g} s")
+        previous = signal.signal(signal.SIGALRM, expire)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return func()
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    outcome = {}
+    def target():
+        try:
+            outcome['result'] = func()
+        except BaseException as e:
+            outcome['error'] = e
+    thread = threading.Thread(target=target, name='astpass-autotune', daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"exceeded {timeout:.3g} s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+class SearchSpace:
+    '''
+    The candidate pipelines of all combinations of some options.
+
+    Parameters
+    ----------
+    build : callable
+        `build(**choice)` returns the pipeline for one combination.
+    **axes : list
+        The values of each option.
+    '''
+    def __init__(self, build, **axes):
+        self.build = build
+        self.axes = axes
+
+    def candidates(self):
+        '''
+        Return a dict from candidate names, e.g. 'jit=True,loops=False', to
+        pipelines.
+        '''
+        names = sorted(self.axes)
+        candidates = {}
+        for values in itertools.product(*[self.axes[n] for n in names]):
+            choice = dict(zip(names, values))
+            name = ",".join(f"{n}={v}" for n, v in choice.items())
+            candidates[name] = list(self.build(**choice))
+        return candidates
+
+
+def _to_pipeline(entries):
+    # JSON turns `(name, options)` tuples into lists
+    return [entry if isinstance(entry, str) else tuple(entry) for entry in entries]
+
+
+class TuningDB:
+    '''
+    JSON file holding the tuning results, written atomically. Entries written
+    by other processes since the file was loaded are merged in before every
+    write.
+    '''
+    def __init__(self, path=None):
+        self.path = os.path.expanduser(path) if path is not None else None
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def read(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self):
+        with self.lock:
+            self.entries.update(self.read())
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            if self.path is None:
+                return
+            entries = self.read()
+            entries[key] = entry
+            self.entries.update(entries)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tuning-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+
+
+class TuningResult:
+    '''
+    The chosen candidate, the times (in seconds) or errors of all candidates,
+    and whether the choice was read from the database.
+    '''
+    def __init__(self, best, pipeline, times, errors, cached):
+        self.best = best
+        self.pipeline = pipeline
+        self.times = times
+        self.errors = errors
+        self.cached = cached
+
+    def __repr__(self):
+        return f"TuningResult({self.best!r}, cached={self.cached})"
+
+
+class Autotuner:
+    '''
+    Chooses the fastest candidate pipeline for a kernel by measurement.
+
+    Parameters
+    ----------
+    space : SearchSpace or dict
+        The candidates, or a dict from candidate names to pipelines. The
+        original code is always a candidate, named 'original'.
+    db_path : str, optional
+        JSON file persisting the choices. Without it they are only kept in
+        memory.
+    repeat : int, optional
+        Number of timing measurements per candidate; the best one is used.
+    min_time : float, optional
+        Minimum duration of one measurement in seconds.
+    timeout : float, optional
+        Time limit of one candidate in seconds. A candidate still running when
+        it expires is rejected (see `call_with_deadline`), and fewer
+        measurements are taken of slow candidates so that the limit holds.
+    rtol, atol : float, optional
+        Tolerances of the comparison with the outputs of the original code.
+    '''
+    def __init__(self, space, db_path=None, repeat=5, min_time=0.01, timeout=10.0, rtol=1e-7, atol=0.0):
+        candidates = space.candidates() if isinstance(space, SearchSpace) else dict(space)
+        self.candidates = {harness.ORIGINAL: [], **candidates}
+        self.db = TuningDB(db_path)
+        self.repeat = repeat
+        self.min_time = min_time
+        self.timeout = timeout
+        self.rtol = rtol
+        self.atol = atol
+
+    def key(self, src, runtime_vals):
+        from . import __version__
+        h = hashlib.sha256()
+        space = sorted((name, pipeline_key(p)) for name, p in self.candidates.items())
+        for part in (__version__, host_id(), repr(space), runtime_signature(runtime_vals), src):
+            h.update(part.encode())
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def measure(self, kernel, expected, names):
+        '''
+        Validate `kernel` and return its best time per run, within the time
+        limit.
+        '''
+        return call_with_deadline(lambda: self.validate_and_time(kernel, expected, names), self.timeout)
+
+    def validate_and_time(self, kernel, expected, names):
+        start = time.perf_counter()
+        harness.check_outputs(expected, kernel.run(kernel.fresh_inputs()), names, self.rtol, self.atol)
+        first = time.perf_counter() - start
+        # Plan the measurements for half of the time left, so that they end
+        # well before the deadline
+        budget = (self.timeout - first) / 2
+        repeat = max(1, min(self.repeat, int(budget / max(first, self.min_time))))
+        return harness.time_kernel(kernel, repeat, min(self.min_time, budget / repeat))
+
+    def tune(self, src, runtime_vals, force=False):
+        '''
+        Return the `TuningResult` for `src` and `runtime_vals`, measuring the
+        candidates unless the database has a choice (or `force` is set).
+        '''
+        key = self.key(src, runtime_vals)
+        entry = None if force else self.db.get(key)
+        if entry is not None:
+            return TuningResult(entry['best'], _to_pipeline(entry['pipeline']),
+                                entry['times'], entry['errors'], cached=True)
+
+        original = harness.Kernel(src, runtime_vals)
+        expected = original.run(original.fresh_inputs())
+        names = harness.output_names(original, expected)
+        times, errors = {}, {}
+        for name, pipeline in self.candidates.items():
+            try:
+                if pipeline:
+                    kernel = harness.Kernel(harness.transform_variant(src, runtime_vals, pipeline), runtime_vals)
+                else:
+                    kernel = original
+                times[name] = self.measure(kernel, expected, names)
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+
+        if not times:
+            raise RuntimeError(f"No candidate could be measured: {errors}")
+        best = min(times, key=times.get)
+        pipeline = self.candidates[best]
+        self.db.put(key, {
+            'best': best, 'pipeline': pipeline, 'times': times, 'errors': errors,
+            'host': host_id(), 'signature': runtime_signature(runtime_vals),
+        })
+        return TuningResult(best, pipeline, times, errors, cached=False)
+
+    def transform(self, src, runtime_vals):
+        '''
+        Return `src` transformed with its best pipeline.
+        '''
+        result = self.tune(src, runtime_vals)
+        return harness.transform_variant(src, runtime_vals, result.pipeline)
@@ -0,0 +1,142 @@
+'''
+Transform many kernels in parallel on a process pool.
+
+Jobs are shipped to the workers compactly: trees as source text, arrays as
+`ArraySpec`s and modules by name, so neither object graphs of AST nodes nor
+array data are pickled. Every job is independent, and an exception raised by
+one job is reported in its result without affecting the others.
+'''
+import ast
+import importlib
+import inspect
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from .array_spec import to_spec
+
+
+class BatchResult:
+    '''
+    The outcome of one job: the transformed `source`, or the `error` message
+    and formatted `traceback` of the exception it raised.
+    '''
+    __slots__ = ('source', 'error', 'traceback')
+
+    def __init__(self, source=None, error=None, traceback=None):
+        self.source = source
+        self.error = error
+        self.traceback = traceback
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return f"BatchResult(source={self.source!r})"
+        return f"BatchResult(error={self.error!r})"
+
+
+def encode_runtime_vals(runtime_vals):
+    '''
+    Return `(values, modules)`: the runtime values with arrays replaced by
+    specs and modules left out, and a map from variable to module name.
+    '''
+    values, modules = {}, {}
+    for var, val in runtime_vals.items():
+        if inspect.ismodule(val):
+            modules[var] = val.__name__
+        else:
+            values[var] = to_spec(val)
+    return values, modules
+
+
+def decode_runtime_vals(values, modules):
+    runtime_vals = dict(values)
+    for var, name in modules.items():
+        runtime_vals[var] = importlib.import_module(name)
+    return runtime_vals
+
+
+def encode_job(job, pipeline):
+    if len(job) == 3:
+        src, runtime_vals, pipeline = job
+    else:
+        src, runtime_vals = job
+    if pipeline is None:
+        raise ValueError("No pipeline given for job")
+    if isinstance(src, ast.AST):
+        src = ast.unparse(src)
+    for entry in pipeline:
+        if not isinstance(entry, (str, tuple, list)):
+            raise TypeError(f"Batch pipelines must refer to registered passes by name, got {entry!r}")
+    values, modules = encode_runtime_vals(runtime_vals)
+    return src, values, modules, list(pipeline)
+
+
+def _run_job(args):
+    '''
+    Task executed in a worker process.
+    '''
+    src, values, modules, pipeline, fuse, cache_dir = args
+    try:
+        runtime_vals = decode_runtime_vals(values, modules)
+        if cache_dir is not None:
+            from .transform_cache import TransformCache
+            return BatchResult(TransformCache(cache_dir).transform(src, runtime_vals, pipeline, fuse))
+        from .pass_manager import PassManager
+        tree = PassManager(pipeline, fuse=fuse).run(ast.parse(src), runtime_vals)
+        return BatchResult(ast.unparse(tree))
+    except Exception as e:
+        return BatchResult(error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+
+
+def transform_batch(jobs, pipeline=None, max_workers=None, fuse=False, cache_dir=None):
+    '''
+    Run a pass pipeline on many sources in parallel.
+
+    Parameters
+    ----------
+    jobs : iterable
+        `(src, runtime_vals)` or `(src, runtime_vals, pipeline)` tuples.
+        `src` is source text or an AST, and arrays in `runtime_vals` may be
+        given as arrays or `ArraySpec`s.
+    pipeline : list, optional
+        The `PassManager` pipeline of jobs that do not give their own.
+        Passes must be referred to by their registered names.
+    max_workers : int, optional
+        Number of worker processes. Default is the number of CPUs. With 1,
+        jobs run in the calling process.
+    fuse : bool, optional
+        Passed to `PassManager`.
+    cache_dir : str, optional
+        Directory of a `TransformCache` shared by the workers.
+
+    Returns
+    -------
+    list of BatchResult
+        One result per job, in the order of `jobs`.
+    '''
+    tasks = []
+    results = {}
+    for i, job in enumerate(jobs):
+        try:
+            tasks.append((i, encode_job(job, pipeline) + (fuse, cache_dir)))
+        except Exception as e:
+            results[i] = BatchResult(error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+
+    n_jobs = len(tasks) + len(results)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(tasks) <= 1:
+        for i, task in tasks:
+            results[i] = _run_job(task)
+    else:
+        max_workers = min(max_workers, len(tasks))
+        # A few chunks per worker amortise the IPC without hurting balance
+        chunksize = max(1, len(tasks) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            outputs = executor.map(_run_job, [task for _, task in tasks], chunksize=chunksize)
+            for (i, _), result in zip(tasks, outputs):
+                results[i] = result
+    return [results[i] for i in range(n_jobs)]
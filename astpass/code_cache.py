@@ -0,0 +1,207 @@
+'''
+In-memory compilation of generated source with a content-addressed cache of
+code objects and modules.
+
+Generated kernels are compiled with `compile()` and executed into a fresh
+module object instead of being written to a temporary file and imported, and
+nothing is registered in `sys.modules`. Both the code objects and the loaded
+modules are kept in bounded LRU caches keyed by the SHA-256 of the source, so
+loading the same source again is a dictionary lookup.
+
+Optionally, code objects are also stored marshalled on disk so that they
+survive process restarts. Files are written to a temporary name and renamed
+into place, so concurrent processes sharing a cache directory never see a
+partially written entry.
+'''
+import hashlib
+import importlib.util
+import linecache
+import marshal
+import os
+import sys
+import tempfile
+import threading
+import types
+from collections import Counter, OrderedDict
+
+from . import profiling
+
+DEFAULT_MAXSIZE = 256
+
+# Entries written by another interpreter version are ignored
+_DISK_HEADER = importlib.util.MAGIC_NUMBER
+
+
+def source_hash(src):
+    return hashlib.sha256(src.encode()).hexdigest()
+
+
+class CodeCache:
+    '''
+    Bounded cache of compiled generated source.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of code objects and of modules kept in memory.
+    cache_dir : str, optional
+        Directory of the persistent cache of marshalled code objects. No
+        persistent cache is used if None.
+
+    Notes
+    -----
+    The source of every cached entry is registered in `linecache` under its
+    filename, so tracebacks and `inspect.getsource` work on the loaded
+    functions without a file on disk.
+    '''
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, cache_dir=None):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.codes = OrderedDict()
+        self.modules = OrderedDict()
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def filename(self, key):
+        return f"<astpass-{key[:16]}>"
+
+    def get_code(self, src, key=None):
+        '''
+        Return the code object of `src`, compiling it only on a cache miss.
+        '''
+        if key is None:
+            key = source_hash(src)
+        with self.lock:
+            code = self.codes.get(key)
+            if code is not None:
+                self.codes.move_to_end(key)
+                self.stats['hits'] += 1
+        prof = profiling.active()
+        if code is not None:
+            if prof is not None:
+                prof.count('compile', 'code_cache', cache='hit')
+            return code
+
+        filename = self.filename(key)
+        with profiling.record('compile', 'code_cache') as event:
+            code = self.read_disk(key)
+            stat = 'disk_hits'
+            if code is None:
+                stat = 'misses'
+                code = compile(src, filename, 'exec')
+                self.write_disk(key, code)
+            if event is not None:
+                event.cache = 'disk' if stat == 'disk_hits' else 'miss'
+        linecache.cache[filename] = (len(src), None, src.splitlines(True), filename)
+
+        with self.lock:
+            self.stats[stat] += 1
+            self.codes[key] = code
+            self.evict(self.codes)
+        return code
+
+    def load(self, src):
+        '''
+        Execute `src` in a new module and return the module. Loading the same
+        source again returns the cached module.
+        '''
+        key = source_hash(src)
+        with self.lock:
+            module = self.modules.get(key)
+            if module is not None:
+                self.modules.move_to_end(key)
+                self.stats['module_hits'] += 1
+        if module is not None:
+            prof = profiling.active()
+            if prof is not None:
+                prof.count('load', 'code_cache', cache='hit')
+            return module
+
+        code = self.get_code(src, key)
+        module = types.ModuleType(f"module_{key}")
+        module.__file__ = code.co_filename
+        with profiling.record('load', 'code_cache', cache='miss'):
+            exec(code, module.__dict__)
+
+        with self.lock:
+            # Another thread may have loaded the same source meanwhile
+            module = self.modules.setdefault(key, module)
+            self.evict(self.modules)
+        return module
+
+    def evict(self, entries):
+        while len(entries) > self.maxsize:
+            key, _ = entries.popitem(last=False)
+            self.stats['evictions'] += 1
+            if key not in self.codes and key not in self.modules:
+                linecache.cache.pop(self.filename(key), None)
+
+    def disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.{sys.implementation.cache_tag}.bin")
+
+    def read_disk(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.disk_path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data.startswith(_DISK_HEADER):
+            return None
+        try:
+            return marshal.loads(data[len(_DISK_HEADER):])
+        except (EOFError, ValueError, TypeError):
+            # A corrupt entry is recompiled and overwritten
+            return None
+
+    def write_disk(self, key, code):
+        if self.cache_dir is None:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{key[:16]}-", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_DISK_HEADER + marshal.dumps(code))
+            os.replace(tmp_path, self.disk_path(key))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def clear(self):
+        with self.lock:
+            for key in set(self.codes) | set(self.modules):
+                linecache.cache.pop(self.filename(key), None)
+            self.codes.clear()
+            self.modules.clear()
+            self.stats.clear()
+
+
+_default_cache = CodeCache()
+
+
+def get_default_cache():
+    return _default_cache
+
+
+def set_default_cache(cache):
+    '''
+    Replace the cache used by `load_code` and `compile_code`, e.g. with one
+    that has a persistent `cache_dir`.
+    '''
+    global _default_cache
+    _default_cache = cache
+
+
+def compile_code(src):
+    return _default_cache.get_code(src)
+
+
+def load_code(src):
+    return _default_cache.load(src)
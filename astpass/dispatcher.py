@@ -0,0 +1,379 @@
+'''
+The `jit` decorator: transform and compile a function on its first call.
+
+On the first call with a new combination of argument shapes, dtypes and types,
+the source of the function is parsed, run through a pipeline with the actual
+arguments as runtime values, unparsed and compiled. The compiled
+specialization is cached, and later calls with the same combination only pay
+for building the key and one dict lookup::
+
+    @astpass.jit(pipeline=['vector_op_to_loop', ('add_func_decorator', {'decorator': 'numba.njit'})])
+    def kernel(a, b, c):
+        c[:] = a * 2.0 + b
+
+Scalar arguments named in `specialize` are also keyed on their value and
+replaced by constants in the body before the pipeline runs, so the passes see
+e.g. `a[:4]` instead of `a[:n]`.
+
+Like Numba, a specialization sees the module globals as they were when it was
+compiled.
+
+With `tiered=True`, calls that have no specialization yet run the original
+function right away while the specialization is compiled on a background
+executor. Later calls pick it up as soon as it is stored (a single dict
+assignment, which is atomic). If compiling fails, the error is logged and
+calls with that key keep running the original function without retrying.
+
+With `profile=True` (or a `ShapeProfile`), the signatures of the calls are
+recorded, and `warm()` compiles the most frequent ones ahead of time.
+'''
+import ast
+import concurrent.futures
+import contextvars
+import functools
+import inspect
+import itertools
+import logging
+import textwrap
+import threading
+
+from . import code_cache, profiling
+from .array_spec import ArraySpec, to_spec
+from .visitor import Transformer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PIPELINE = ('vector_op_to_loop',)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def default_executor():
+    '''
+    The executor compiling tiered specializations by default: a single
+    background thread shared by all dispatchers.
+    '''
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='astpass-jit')
+        return _executor
+
+
+class SubstituteScalars(Transformer):
+    '''
+    Replaces loads of the given names by constants.
+    '''
+    def __init__(self, values):
+        self.values = values
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.values:
+            return ast.copy_location(ast.Constant(self.values[node.id]), node)
+        return node
+
+
+def assigned_names(tree):
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+    return names
+
+
+def parse_function(func):
+    '''
+    Return the module tree holding only the definition of `func`, without
+    its decorators, with the line numbers of its file.
+    '''
+    if func.__code__.co_freevars:
+        raise ValueError(f"{func.__qualname__} refers to variables of an enclosing function")
+    try:
+        src = textwrap.dedent(inspect.getsource(func))
+    except (OSError, TypeError) as e:
+        raise ValueError(f"The source of {func.__qualname__} is not available") from e
+    tree = ast.parse(src)
+    if len(tree.body) != 1 or not isinstance(tree.body[0], ast.FunctionDef):
+        raise ValueError(f"{func.__qualname__} is not defined by a def statement")
+    tree.body[0].decorator_list = []
+    # Locations, and so the provenance of generated code, refer to the file
+    ast.increment_lineno(tree, func.__code__.co_firstlineno - 1)
+    return tree
+
+
+class Specialization:
+    '''
+    A compiled variant of the function and the source it was compiled from.
+    A failed tiered compile stores the original function with no source.
+    '''
+    __slots__ = ('func', 'src')
+
+    def __init__(self, func, src):
+        self.func = func
+        self.src = src
+
+
+class Dispatcher:
+    '''
+    Callable wrapping a function with a cache of its specializations. See
+    `jit` for the parameters.
+    '''
+    def __init__(self, func, pipeline=DEFAULT_PIPELINE, specialize=(), fuse=False, cache_dir=None,
+                 tiered=False, executor=None, profile=None):
+        self.func = func
+        self.pipeline = list(pipeline)
+        self.fuse = fuse
+        self.signature = inspect.signature(func)
+        self.params = list(self.signature.parameters)
+        for param in self.signature.parameters.values():
+            if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                raise ValueError(f"{func.__qualname__} takes variable arguments")
+        for name in specialize:
+            if name not in self.params:
+                raise ValueError(f"{func.__qualname__} has no parameter {name!r}")
+        self.specialize = frozenset(specialize)
+        self.specialize_index = frozenset(i for i, p in enumerate(self.params) if p in self.specialize)
+        self.transform_cache = None
+        if cache_dir is not None:
+            from .transform_cache import TransformCache
+            self.transform_cache = TransformCache(cache_dir)
+        self.specializations = {}
+        self.lock = threading.Lock()
+        self.tiered = tiered
+        self.executor = executor
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        if profile is True:
+            from .shape_profile import ShapeProfile
+            profile = ShapeProfile()
+        if profile is not None and profile.params is None:
+            profile.params = self.params
+        self.profile = profile
+        self.tree = None
+        functools.update_wrapper(self, func)
+
+    def bind(self, args, kwargs):
+        '''
+        The arguments as a tuple in parameter order, with defaults applied.
+        '''
+        if not kwargs and len(args) == len(self.params):
+            return args
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return tuple(bound.arguments[p] for p in self.params)
+
+    def key(self, args):
+        key = []
+        for i, arg in enumerate(args):
+            shape = getattr(arg, 'shape', None)
+            if shape is not None:
+                # The type separates memmaps, which some passes treat differently
+                key.append((shape, arg.dtype, type(arg)))
+            elif i in self.specialize_index:
+                key.append((type(arg), arg))
+            else:
+                key.append(type(arg))
+        return tuple(key)
+
+    def __call__(self, *args, **kwargs):
+        args = self.bind(args, kwargs)
+        key = self.key(args)
+        if self.profile is not None:
+            self.profile.record(key, args)
+        spec = self.specializations.get(key)
+        if spec is None:
+            if self.tiered:
+                self.compile_async(key, args)
+                return self.func(*args)
+            spec = self.compile(args, key)
+        return spec.func(*args)
+
+    def runtime_vals(self, args):
+        runtime_vals = {p: arg for p, arg in zip(self.params, args) if p not in self.specialize}
+        # Modules the function refers to, e.g. `np`, are needed by shape analysis
+        from .names import names_in
+        for name in names_in(self.tree):
+            val = self.func.__globals__.get(name)
+            if inspect.ismodule(val):
+                runtime_vals[name] = val
+        return runtime_vals
+
+    def transform(self, args):
+        '''
+        Return the source of the specialization for `args`.
+        '''
+        if self.tree is None:
+            self.tree = parse_function(self.func)
+        tree = self.tree
+        values = {p: arg for p, arg in zip(self.params, args) if p in self.specialize}
+        if values:
+            from .utils import clone_ast
+            fdef = clone_ast(tree.body[0])
+            # Reassigned parameters keep their name
+            assigned = assigned_names(fdef)
+            fdef.body = [SubstituteScalars({p: v for p, v in values.items() if p not in assigned}).visit(stmt)
+                         for stmt in fdef.body]
+            tree = ast.Module(body=[fdef], type_ignores=[])
+        src = ast.unparse(tree)
+        runtime_vals = self.runtime_vals(args)
+        if self.transform_cache is not None:
+            return self.transform_cache.transform(src, runtime_vals, self.pipeline, self.fuse)
+        from .pass_manager import PassManager
+        return ast.unparse(PassManager(self.pipeline, fuse=self.fuse).run(ast.parse(src), runtime_vals))
+
+    def compile(self, args, key=None):
+        key = self.key(args) if key is None else key
+        with self.lock:
+            spec = self.specializations.get(key)
+            if spec is not None:
+                return spec
+            with profiling.record(self.func.__qualname__, 'jit'):
+                src = self.transform(args)
+                namespace = dict(self.func.__globals__)
+                from .harness import import_decorators
+                import_decorators(ast.parse(src), namespace)
+                exec(code_cache.compile_code(src), namespace)
+                func = namespace[self.func.__name__]
+            spec = Specialization(func, src)
+            self.specializations[key] = spec
+            return spec
+
+    def compile_async(self, key, args):
+        '''
+        Start compiling the specialization for `args` in the background,
+        unless it is already being compiled. Returns its future.
+        '''
+        with self.pending_lock:
+            future = self.pending.get(key)
+            if future is None:
+                # Only the shapes and dtypes are needed: do not keep the arrays alive
+                args = tuple(to_spec(arg) for arg in args)
+                executor = self.executor or default_executor()
+                # Run in a copy of the context so that an active profile records it
+                future = executor.submit(contextvars.copy_context().run, self.compile_tiered, key, args)
+                self.pending[key] = future
+            return future
+
+    def compile_tiered(self, key, args):
+        try:
+            return self.compile(args, key)
+        except Exception:
+            logger.warning("Compiling %s failed, falling back to the original function",
+                           self.func.__qualname__, exc_info=True)
+            spec = self.specializations[key] = Specialization(self.func, None)
+            return spec
+        finally:
+            with self.pending_lock:
+                self.pending.pop(key, None)
+
+    def wait(self, timeout=None):
+        '''
+        Wait for the background compiles in progress. Returns True if they
+        all finished.
+        '''
+        with self.pending_lock:
+            futures = list(self.pending.values())
+        done, not_done = concurrent.futures.wait(futures, timeout)
+        return not not_done
+
+    def spec_key(self, args):
+        '''
+        The key of calls with arrays matching the specs among `args`.
+        '''
+        import numpy as np
+        return tuple((k[0], np.dtype(k[1]), np.memmap if arg.memmap else np.ndarray)
+                     if isinstance(arg, ArraySpec) else k
+                     for arg, k in zip(args, self.key(args)))
+
+    def warm(self, profile=None, max_signatures=4, min_fraction=0.01, background=False):
+        '''
+        Compile the specializations for the most frequent signatures of
+        `profile` (by default the one recorded by this dispatcher), see
+        `ShapeProfile.select`. Specialized scalar parameters are compiled for
+        each of their hot values. Signatures that fail to compile are logged
+        and skipped. Returns the keys compiled or, with `background`, being
+        compiled.
+        '''
+        profile = profile if profile is not None else self.profile
+        keys = []
+        for sig in profile.select(max_signatures, min_fraction):
+            example = profile.example(sig)
+            if example is None:
+                continue
+            choices = [[arg] for arg in example]
+            for i in self.specialize_index:
+                hot = [v for v in profile.hot_values(self.params[i]) if type(v) is type(example[i])]
+                choices[i] = hot or choices[i]
+            for args in itertools.product(*choices):
+                key = self.spec_key(args)
+                if key in self.specializations:
+                    continue
+                if background:
+                    self.compile_async(key, args)
+                else:
+                    try:
+                        self.compile(args, key)
+                    except Exception:
+                        logger.warning("Compiling %s for %s failed", self.func.__qualname__, sig, exc_info=True)
+                        continue
+                keys.append(key)
+        return keys
+
+    def source(self, *args, **kwargs):
+        '''
+        Return the source of the specialization that a call with these
+        arguments runs, compiling it if needed.
+        '''
+        args = self.bind(args, kwargs)
+        key = self.key(args)
+        spec = self.specializations.get(key)
+        if spec is None:
+            spec = self.compile(args, key)
+        return spec.src
+
+    def __repr__(self):
+        return f"<astpass.jit {self.func.__qualname__}, {len(self.specializations)} specializations>"
+
+
+def jit(func=None, *, pipeline=DEFAULT_PIPELINE, specialize=(), fuse=False, cache_dir=None,
+        tiered=False, executor=None, profile=None):
+    '''
+    Transform and compile a function lazily, once per combination of
+    argument shapes, dtypes and types.
+
+    Parameters
+    ----------
+    func : function
+        The function to wrap. Its source must be available and it must not
+        refer to variables of an enclosing function.
+    pipeline : list, optional
+        The `PassManager` pipeline applied to the function, without its
+        decorators. Default is `['vector_op_to_loop']`.
+    specialize : tuple of str, optional
+        Names of scalar parameters whose values are compiled in as constants.
+    fuse : bool, optional
+        Fuse node-local passes, see `PassManager`.
+    cache_dir : str, optional
+        Directory of a `TransformCache` for the transformed sources, which
+        lets new processes skip the passes.
+    tiered : bool, optional
+        Run the original function while specializations are compiled in the
+        background, and fall back to it for good if compiling fails.
+    executor : concurrent.futures.Executor, optional
+        Executor of the background compiles, e.g. the one of an asyncio
+        event loop. Default is a single shared thread.
+    profile : bool or ShapeProfile, optional
+        Record the signatures of the calls in this profile (a new one if
+        True), available as the `profile` attribute.
+
+    Returns
+    -------
+    Dispatcher
+        Can be used as ``@jit`` or ``@jit(...)``.
+    '''
+    def wrap(func):
+        return Dispatcher(func, pipeline, specialize, fuse, cache_dir, tiered, executor, profile)
+    if func is not None:
+        return wrap(func)
+    return wrap
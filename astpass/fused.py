@@ -0,0 +1,159 @@
+import ast
+from .visitor import Transformer, compute_descend, get_fields, get_handlers
+
+
+def descends(handler):
+    '''
+    Whether `handler` visits the children of its node, i.e. calls
+    `generic_visit`. A handler that does not leaves the subtree below its
+    node unchanged.
+    '''
+    func = getattr(handler, '__func__', handler)
+    return 'generic_visit' in func.__code__.co_names
+
+
+class FusedTransformer(Transformer):
+    '''
+    Runs several node-local `ast.NodeTransformer`s in a single traversal.
+
+    The tree is walked bottom-up, once where the handlers allow it. At each
+    node the `visit_<NodeType>` handlers of the fused transformers are called
+    in order, each receiving the node returned by the previous one. If a handler replaces the node with
+    a node of another type, the remaining transformers are dispatched on the
+    new type; if it returns a list, each element goes through the remaining
+    transformers; if it returns None, the node is removed.
+
+    As when run on its own, a transformer whose handler does not call
+    `generic_visit` does not see the subtree below the nodes that handler
+    receives: at such a node, the transformers before it go through the
+    subtree first, its handler is called, and the transformers after it walk
+    the result. The result is that of applying the transformers one after
+    another, provided their handlers only rewrite the node they are given
+    (and, if they call `generic_visit`, find nothing left to do in the
+    children the driver already visited). Nodes a handler creates below the
+    node it returns are not revisited by the transformers that follow it.
+    '''
+    def __init__(self, transformers):
+        self.transformers = list(transformers)
+        self.transformer_handlers = [get_handlers(t) for t in self.transformers]
+        self.all = tuple(range(len(self.transformers)))
+        self.stops = {}
+        self.descend = {}
+
+    def stop(self, cls, group):
+        '''
+        The position in `group` of the first transformer that does not
+        descend below nodes of type `cls`, or `len(group)`.
+        '''
+        key = (cls, group)
+        stop = self.stops.get(key)
+        if stop is None:
+            stop = len(group)
+            for pos, i in enumerate(group):
+                handler = self.transformer_handlers[i].get(cls)
+                if handler is not None and not descends(handler):
+                    stop = pos
+                    break
+            self.stops[key] = stop
+        return stop
+
+    def descend_for(self, group):
+        if group not in self.descend:
+            handled = set()
+            for i in group:
+                handled.update(self.transformer_handlers[i])
+            # Only descend into subtrees where the group has work
+            self.descend[group] = compute_descend(handled)
+        return self.descend[group]
+
+    def visit(self, node):
+        return self.visit_group(node, self.all)
+
+    def visit_group(self, node, group):
+        stop = self.stop(node.__class__, group)
+        if stop == 0:
+            result = self.transformer_handlers[group[0]][node.__class__](node)
+            return self.visit_rest(result, group[1:])
+        head = group[:stop]
+        self.visit_children(node, head)
+        return self.visit_rest(self.apply(node, head), group[stop:])
+
+    def visit_rest(self, result, group):
+        if result is None or not group:
+            return result
+        if not isinstance(result, list):
+            return self.visit_group(result, group)
+        new_nodes = []
+        for node in result:
+            node = self.visit_group(node, group)
+            if isinstance(node, list):
+                new_nodes.extend(node)
+            elif node is not None:
+                new_nodes.append(node)
+        return new_nodes
+
+    def visit_children(self, node, group):
+        descend = self.descend_for(group)
+        for field in get_fields(node.__class__):
+            old_value = getattr(node, field, None)
+            if isinstance(old_value, list):
+                new_values = []
+                changed = False
+                for value in old_value:
+                    if isinstance(value, ast.AST) and (descend is None or value.__class__ in descend):
+                        new_value = self.visit_group(value, group)
+                        if new_value is not value:
+                            changed = True
+                        if new_value is None:
+                            continue
+                        elif not isinstance(new_value, ast.AST):
+                            new_values.extend(new_value)
+                            continue
+                        value = new_value
+                    new_values.append(value)
+                if changed:
+                    old_value[:] = new_values
+            elif isinstance(old_value, ast.AST) and (descend is None or old_value.__class__ in descend):
+                new_node = self.visit_group(old_value, group)
+                if new_node is None:
+                    delattr(node, field)
+                elif new_node is not old_value:
+                    setattr(node, field, new_node)
+
+    def apply(self, node, group):
+        for pos, i in enumerate(group):
+            handler = self.transformer_handlers[i].get(node.__class__)
+            if handler is None:
+                continue
+            result = handler(node)
+            if result is None:
+                return None
+            if isinstance(result, list):
+                new_nodes = []
+                for new_node in result:
+                    new_node = self.apply(new_node, group[pos + 1:])
+                    if new_node is None:
+                        continue
+                    if isinstance(new_node, list):
+                        new_nodes.extend(new_node)
+                    else:
+                        new_nodes.append(new_node)
+                return new_nodes
+            if type(result) is not type(node):
+                return self.apply(result, group[pos + 1:])
+            node = result
+        return node
+
+
+def fuse(*transformers):
+    '''
+    Compose node-local transformers into a single traversal. Equivalent to
+    applying them one after another, e.g.::
+
+        tree = fuse(RemoveFuncDecorator(), WhereToTernary()).visit(tree)
+    '''
+    return FusedTransformer(transformers)
+
+
+def transform(tree, transformers):
+    return FusedTransformer(transformers).visit(tree)
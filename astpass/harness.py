@@ -0,0 +1,306 @@
+'''
+Runtime harness comparing transformed code with the original.
+
+A snippet is run as written and through each variant pipeline (e.g.
+`vector_op_to_loop`, optionally followed by `add_func_decorator` to compile
+the loops with Numba) on a sweep of input sizes. The outputs of every variant
+are checked against the original and the variants are timed, which shows at
+which sizes the generated loops start to beat the NumPy code::
+
+    def make_vals(n):
+        return {'a': np.random.rand(n), 'b': np.random.rand(n), 'c': np.empty(n), 'np': np}
+
+    report = harness.sweep("c = a * 2.0 + b", make_vals, [10, 1000, 100000], {
+        'loops': ['vector_op_to_loop'],
+    })
+    print(report.table())
+    print(report.crossover('loops'))
+
+A snippet is either straight-line code, run in a namespace holding the
+runtime values, or a single function, called with the runtime values named
+like its parameters. The outputs compared are the variables and arrays the
+original writes, and the return value of a function.
+'''
+import ast
+import copy
+import importlib
+import time
+
+from . import code_cache
+
+ORIGINAL = 'original'
+
+
+class Mismatch(Exception):
+    pass
+
+
+def get_function(tree):
+    '''
+    Return the function defined by a single-function snippet, else None.
+    '''
+    body = tree.body
+    if len(body) == 1 and isinstance(body[0], ast.FunctionDef):
+        return body[0]
+    return None
+
+
+def transform_variant(src, runtime_vals, pipeline):
+    if not pipeline:
+        return src
+    from .pass_manager import PassManager
+    tree = PassManager(pipeline).run(ast.parse(src), runtime_vals)
+    return ast.unparse(ast.fix_missing_locations(tree))
+
+
+def import_decorators(tree, namespace):
+    '''
+    Import the root modules of decorators such as `numba.njit` that the
+    namespace does not define.
+    '''
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef):
+            for dec in node.decorator_list:
+                while isinstance(dec, (ast.Attribute, ast.Call)):
+                    dec = dec.value if isinstance(dec, ast.Attribute) else dec.func
+                if isinstance(dec, ast.Name) and dec.id not in namespace:
+                    namespace[dec.id] = importlib.import_module(dec.id)
+
+
+class Kernel:
+    '''
+    A variant of a snippet compiled for one set of runtime values.
+    '''
+    def __init__(self, src, runtime_vals):
+        self.src = src
+        self.runtime_vals = runtime_vals
+        tree = ast.parse(src)
+        self.code = code_cache.compile_code(src)
+        func = get_function(tree)
+        self.func_name = func.name if func is not None else None
+        self.params = [a.arg for a in func.args.args] if func is not None else None
+        self.modules = {k: v for k, v in runtime_vals.items() if type(v).__name__ == 'module'}
+        import_decorators(tree, self.modules)
+        self.func = None
+        if self.func_name is not None:
+            namespace = dict(self.modules)
+            exec(self.code, namespace)
+            self.func = namespace[self.func_name]
+
+    def fresh_inputs(self):
+        # Arrays are written in place, so each run gets its own copies
+        return {k: (v if k in self.modules else copy.copy(v)) for k, v in self.runtime_vals.items()}
+
+    def run(self, inputs):
+        '''
+        Run on `inputs` and return the namespace after the run, or the
+        arguments and the return value (as '<return>') for a function.
+        '''
+        if self.func is not None:
+            result = self.func(*[inputs[p] for p in self.params])
+            outputs = dict(inputs)
+            outputs['<return>'] = result
+            return outputs
+        inputs.update(self.modules)
+        exec(self.code, inputs)
+        return inputs
+
+
+def output_names(kernel, outputs):
+    '''
+    The names a run of the original wrote: new variables, and variables that
+    were rebound or modified in place.
+    '''
+    import numpy as np
+    names = []
+    for name, val in outputs.items():
+        if name.startswith('__') or name in kernel.modules or callable(val):
+            continue
+        if name not in kernel.runtime_vals or not _same(kernel.runtime_vals[name], val, np):
+            names.append(name)
+    return names
+
+
+def _same(a, b, np):
+    try:
+        return bool(np.array_equal(a, b, equal_nan=True))
+    except TypeError:
+        return a == b
+
+
+def check_outputs(expected, actual, names, rtol, atol):
+    import numpy as np
+    for name in names:
+        if name not in actual:
+            raise Mismatch(f"{name} is not set")
+        if expected[name] is None or actual[name] is None:
+            if expected[name] is not actual[name]:
+                raise Mismatch(f"{name} differs from the original")
+        elif not np.allclose(actual[name], expected[name], rtol=rtol, atol=atol, equal_nan=True):
+            raise Mismatch(f"{name} differs from the original")
+
+
+def time_kernel(kernel, repeat, min_time):
+    '''
+    Best time of one run, over `repeat` measurements of `number` runs, with
+    `number` chosen so that a measurement lasts at least `min_time`.
+    '''
+    number = 1
+    while True:
+        inputs = [kernel.fresh_inputs() for _ in range(number)]
+        start = time.perf_counter()
+        for inp in inputs:
+            kernel.run(inp)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        inputs = [kernel.fresh_inputs() for _ in range(number)]
+        start = time.perf_counter()
+        for inp in inputs:
+            kernel.run(inp)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+class VariantResult:
+    '''
+    Outcome of one variant at one size: the best time per run in seconds, or
+    the error that prevented the variant from being built, run or validated.
+    '''
+    __slots__ = ('variant', 'size', 'time', 'error', 'src')
+
+    def __init__(self, variant, size, time=None, error=None, src=None):
+        self.variant = variant
+        self.size = size
+        self.time = time
+        self.error = error
+        self.src = src
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return f"VariantResult({self.variant!r}, {self.size}, {self.time * 1e6:.1f} us)"
+        return f"VariantResult({self.variant!r}, {self.size}, error={self.error!r})"
+
+
+class Report:
+    '''
+    The results of a sweep, indexed by `(variant, size)`.
+    '''
+    def __init__(self, variants, sizes):
+        self.variants = list(variants)
+        self.sizes = list(sizes)
+        self.results = {}
+
+    def add(self, result):
+        self.results[result.variant, result.size] = result
+
+    def __getitem__(self, key):
+        return self.results[key]
+
+    def speedup(self, variant, size, baseline=ORIGINAL):
+        a, b = self.results[variant, size], self.results[baseline, size]
+        if not (a.ok and b.ok):
+            return None
+        return b.time / a.time
+
+    def crossover(self, variant, baseline=ORIGINAL):
+        '''
+        Return the smallest size from which `variant` is faster than
+        `baseline` at every larger size of the sweep, or None.
+        '''
+        crossover = None
+        for size in reversed(self.sizes):
+            s = self.speedup(variant, size, baseline)
+            if s is None or s <= 1:
+                break
+            crossover = size
+        return crossover
+
+    def table(self, baseline=ORIGINAL):
+        header = f"{'size':>10}" + "".join(f" {v:>24}" for v in self.variants)
+        lines = [header]
+        for size in self.sizes:
+            row = f"{size:>10}"
+            for v in self.variants:
+                r = self.results[v, size]
+                if not r.ok:
+                    cell = "error"
+                elif v == baseline:
+                    cell = f"{r.time * 1e6:.1f} us"
+                else:
+                    cell = f"{r.time * 1e6:.1f} us ({self.speedup(v, size, baseline) or 0:.2f}x)"
+                row += f" {cell:>24}"
+            lines.append(row)
+        for v in self.variants:
+            if v != baseline:
+                lines.append(f"crossover {v}: {self.crossover(v, baseline)}")
+        errors = {r.variant: r.error for r in self.results.values() if not r.ok}
+        for v, error in errors.items():
+            lines.append(f"error {v}: {error}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {
+            'sizes': self.sizes,
+            'results': [
+                {'variant': r.variant, 'size': r.size, 'time': r.time, 'error': r.error}
+                for r in self.results.values()
+            ],
+            'crossover': {v: self.crossover(v) for v in self.variants if v != ORIGINAL},
+        }
+
+
+def sweep(src, make_runtime_vals, sizes, variants, repeat=5, min_time=0.01, rtol=1e-7, atol=0.0):
+    '''
+    Validate and time the variants of a snippet on a sweep of sizes.
+
+    Parameters
+    ----------
+    src : str
+        The snippet, straight-line code or a single function.
+    make_runtime_vals : callable
+        `make_runtime_vals(size)` returns the runtime values to run on. Since
+        transforms specialise on shapes, each variant is rebuilt per size.
+    sizes : list of int
+        The sizes of the sweep, in increasing order.
+    variants : dict
+        Maps variant names to `PassManager` pipelines. The original code is
+        added as the variant 'original'.
+    repeat : int, optional
+        Number of timing measurements; the best one is reported.
+    min_time : float, optional
+        Minimum duration of one measurement in seconds.
+    rtol, atol : float, optional
+        Tolerances of the comparison with the original outputs.
+
+    Returns
+    -------
+    Report
+    '''
+    variants = {ORIGINAL: [], **variants}
+    report = Report(variants, sizes)
+    for size in sizes:
+        runtime_vals = make_runtime_vals(size)
+        original = Kernel(src, runtime_vals)
+        expected = original.run(original.fresh_inputs())
+        names = output_names(original, expected)
+
+        for name, pipeline in variants.items():
+            variant_src = None
+            try:
+                variant_src = transform_variant(src, runtime_vals, pipeline)
+                kernel = original if not pipeline else Kernel(variant_src, runtime_vals)
+                # Also warms up JIT-compiled variants before timing
+                check_outputs(expected, kernel.run(kernel.fresh_inputs()), names, rtol, atol)
+                t = time_kernel(kernel, repeat, min_time)
+                report.add(VariantResult(name, size, time=t, src=variant_src))
+            except Exception as e:
+                report.add(VariantResult(name, size, error=f"{type(e).__name__}: {e}", src=variant_src))
+    return report
@@ -1,5 +1,7 @@
 import ast
 from astpass.utils import *
+from astpass.names import get_names
+from astpass.passes.ast_utils import StructKey
 
 class ArrayReferenceCheck(ast.NodeVisitor):
     def __init__(self):
@@ -19,10 +21,10 @@ class ArrayReferenceCheck(ast.NodeVisitor):
 
             # Check if the array is always referenced with the same index
             if name not in self.array_indices:
-                self.array_indices[name] = ast.unparse(node.slice)
+                self.array_indices[name] = StructKey(node.slice)
                 self.always_same_index[name] = True
             else:
-                if self.array_indices[name] != ast.unparse(node.slice):
+                if self.array_indices[name] != StructKey(node.slice):
                     self.always_same_index[name] = False
 
             if isinstance(node.ctx, ast.Store):
@@ -32,26 +34,26 @@ class ArrayReferenceCheck(ast.NodeVisitor):
 
 
 class IntraloopScalarReplacement(ast.NodeTransformer):
+    def __init__(self, names):
+        self.names = names
+
     def visit_For(self, node):
         self.generic_visit(node)
 
         visitor = ArrayReferenceCheck()
         visitor.visit(node)
 
-        scalar_count = 0
-     
         for varname in visitor.always_same_index:
             indices = visitor.array_indices[varname]
             # Only perform the replacement if this condition is met
             if visitor.always_same_index[varname] and visitor.array_referenced_times[varname] > 0:
-                scalar_var = f'__scalar_{scalar_count}'
+                scalar_var = self.names.fresh('__scalar_')
                 ReplaceSubscriptsWithName(varname, indices, scalar_var).visit(node)
-                scalar_count += 1
 
                 # Insert the stores at the end of the loop if the array is ever written to
                 if visitor.array_ever_written[varname]:
                     node.body.append(
-                        new_ast_assign_from_str(f'{varname}[{indices}] = {scalar_var}')
+                        new_ast_assign_from_str(f'{varname}[{ast.unparse(indices.node)}] = {scalar_var}')
                     )
 
         # # Scan the loop body and replace the subscripts with the generated scalar variables
@@ -78,12 +80,12 @@ class ReplaceSubscriptsWithName(ast.NodeTransformer):
         self.scalar_var = scalar_var
 
     def visit_Subscript(self, node):
-        if isinstance(node.value, ast.Name) and node.value.id == self.name and ast.unparse(node.slice) == self.indices:
+        if isinstance(node.value, ast.Name) and node.value.id == self.name and StructKey(node.slice) == self.indices:
             if isinstance(node.ctx, ast.Load):
                 return new_ast_name(self.scalar_var)
             else:
                 return new_ast_name(self.scalar_var, ctx=ast.Store())
         return node
 
-def transform(node):
-    return IntraloopScalarReplacement().visit(node)
\ No newline at end of file
+def transform(node, names=None):
+    return IntraloopScalarReplacement(get_names(node, names)).visit(node)
\ No newline at end of file
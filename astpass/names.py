@@ -0,0 +1,106 @@
+import ast
+from .visitor import Visitor
+
+
+class CollectNames(Visitor):
+    def __init__(self):
+        self.names = set()
+
+    def visit_Name(self, node):
+        self.names.add(node.id)
+
+    def visit_FunctionDef(self, node):
+        self.names.add(node.name)
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+    visit_ClassDef = visit_FunctionDef
+
+    def visit_arg(self, node):
+        self.names.add(node.arg)
+        self.generic_visit(node)
+
+    def visit_alias(self, node):
+        self.names.add((node.asname or node.name).split('.')[0])
+
+
+def names_in(tree):
+    '''
+    All identifiers bound or referenced in `tree`: the names of `ast.Name`
+    nodes, plus function, class and argument names, which are not.
+    '''
+    visitor = CollectNames()
+    visitor.visit(tree)
+    return visitor.names
+
+
+class NameGenerator:
+    '''
+    Generates fresh variable names that do not clash with the names used in a
+    tree or with each other.
+
+    The generated names only depend on the tree and the sequence of requests,
+    so transforming the same input always produces the same output text.
+    A single generator is meant to be shared by all passes run on a tree, e.g.
+    `PassManager` provides one as the `names` analysis.
+
+    Parameters
+    ----------
+    tree : ast.AST, optional
+        The tree whose names must be avoided.
+    used : iterable of str, optional
+        Additional names to avoid.
+
+    Examples
+    --------
+    ::
+
+        names = NameGenerator(ast.parse("__i0 = 1"))
+        names.fresh('__i')           # '__i1'
+        names.fresh('__i')           # '__i2'
+        names.unique('__ret')        # '__ret'
+        names.unique('__ret')        # '__ret_1'
+    '''
+    def __init__(self, tree=None, used=()):
+        self.used = set(used)
+        if tree is not None:
+            self.used |= names_in(tree)
+        self.counters = {}
+        self.generated = set()
+
+    def take(self, name):
+        self.used.add(name)
+        self.generated.add(name)
+        return name
+
+    def fresh(self, prefix, start=0):
+        '''
+        Return `prefix` followed by the smallest counter, from `start` on,
+        that gives an unused name.
+        '''
+        n = self.counters.get(prefix, start)
+        while f"{prefix}{n}" in self.used:
+            n += 1
+        self.counters[prefix] = n + 1
+        return self.take(f"{prefix}{n}")
+
+    def unique(self, name):
+        '''
+        Return `name` itself if it is unused, otherwise `name_1`, `name_2`, ...
+        '''
+        if name not in self.used:
+            return self.take(name)
+        return self.fresh(f"{name}_", start=1)
+
+    def is_generated(self, name):
+        return name in self.generated
+
+    def __contains__(self, name):
+        return name in self.used
+
+
+def get_names(tree, names=None):
+    '''
+    Return `names`, or a new generator for `tree` if it is None.
+    '''
+    return names if names is not None else NameGenerator(tree)
@@ -0,0 +1,313 @@
+import time
+from collections import Counter
+from . import profiling
+from .provenance import Provenance, propagate_locations
+
+# Value of `preserves` for passes that do not change the tree
+ALL = '*'
+
+ANALYSES = {}
+ANALYSIS_REQUIRES = {}
+PASSES = {}
+
+
+def register_analysis(name, requires=()):
+    '''
+    Register `func(tree, runtime_vals, **analyses)` as the analysis `name`.
+    The (possibly cached) result of each analysis in `requires` is passed as
+    the keyword argument of the same name.
+    '''
+    def decorator(func):
+        ANALYSES[name] = func
+        ANALYSIS_REQUIRES[name] = tuple(requires)
+        return func
+    return decorator
+
+
+class Pass:
+    '''
+    A transform together with the analyses it requires and the analyses it
+    leaves valid.
+
+    Parameters
+    ----------
+    name : str
+        The name the pass is referred to in pipelines.
+    run : callable
+        `run(tree, analyses, runtime_vals, **options)` returning the new tree.
+        `analyses` maps each name in `requires` to its (possibly cached) result.
+    requires : tuple of str
+        Names of the analyses the pass consumes.
+    preserves : tuple of str or ALL
+        Names of the analyses that are still valid after the pass. All other
+        cached analyses are invalidated.
+    transformer : callable, optional
+        For node-local passes, `transformer(**options)` returns the
+        `ast.NodeTransformer` implementing the pass, which allows the pass
+        manager to fuse it with its neighbours into a single traversal.
+    '''
+    def __init__(self, name, run, requires=(), preserves=(), transformer=None):
+        self.name = name
+        self.run = run
+        self.requires = tuple(requires)
+        self.preserves = preserves if preserves == ALL else tuple(preserves)
+        self.transformer = transformer
+
+    def __repr__(self):
+        return f"Pass({self.name!r})"
+
+
+def register_pass(name, requires=(), preserves=(), transformer=None):
+    '''
+    Register `run(tree, analyses, runtime_vals, **options)` as the pass `name`.
+    '''
+    def decorator(run):
+        PASSES[name] = Pass(name, run, requires, preserves, transformer)
+        return run
+    return decorator
+
+
+def fuse_passes(passes):
+    '''
+    Combine `(Pass, options)` entries of node-local passes into one pass that
+    runs all of them in a single traversal.
+    '''
+    from .fused import FusedTransformer
+
+    def run(tree, analyses, runtime_vals):
+        transformers = [p.transformer(**options) for p, options in passes]
+        return FusedTransformer(transformers).visit(tree)
+
+    preserves = ALL
+    for p, _ in passes:
+        if p.preserves != ALL:
+            preserves = p.preserves if preserves == ALL else tuple(n for n in preserves if n in p.preserves)
+    name = "fused(" + ", ".join(p.name for p, _ in passes) + ")"
+    return Pass(name, run, preserves=preserves), {}
+
+
+class PassManager:
+    '''
+    Runs a pipeline of passes over a tree, caching analysis results between
+    passes and invalidating them only when a pass does not preserve them.
+
+    The pipeline is a list whose entries are registered pass names, `(name,
+    options)` tuples or `Pass` objects, e.g.::
+
+        pm = PassManager([
+            'remove_func_decorator',
+            'where_to_ternary',
+            ('vector_op_to_loop', {'loop_index_prefix': '__j'}),
+            'hoist_shape_access',
+        ])
+        tree = pm.run(tree, runtime_vals)
+
+    After a run, `timings` holds `(name, seconds)` for every pass and every
+    analysis computed (prefixed with 'analysis:'), and `stats` counts how many
+    times each analysis was computed and served from the cache.
+
+    With `fuse=True`, runs of consecutive node-local passes (those registered
+    with a `transformer`) are combined into a single tree traversal.
+
+    Every node of the returned tree has a source location, taken from the
+    node it replaced or from its enclosing node. With `provenance=True`,
+    `provenance` holds the `Provenance` table of the last run, which also
+    records the pass that created each node.
+    '''
+    def __init__(self, pipeline, fuse=False, provenance=False):
+        self.pipeline = [self.resolve(entry) for entry in pipeline]
+        if fuse:
+            self.pipeline = self.fuse_node_local(self.pipeline)
+        self.track_provenance = provenance
+        self.provenance = None
+        self.cache = {}
+        self.timings = []
+        self.stats = {'computed': Counter(), 'cached': Counter()}
+
+    def resolve(self, entry):
+        if isinstance(entry, Pass):
+            return entry, {}
+        if isinstance(entry, str):
+            name, options = entry, {}
+        else:
+            name, options = entry
+        if name not in PASSES:
+            raise KeyError(f"Unknown pass: {name}")
+        return PASSES[name], dict(options)
+
+    def fuse_node_local(self, pipeline):
+        fused, group = [], []
+        for entry in pipeline + [None]:
+            if entry is not None and entry[0].transformer is not None and not entry[0].requires:
+                group.append(entry)
+                continue
+            if len(group) > 1:
+                fused.append(fuse_passes(group))
+            else:
+                fused.extend(group)
+            group = []
+            if entry is not None:
+                fused.append(entry)
+        return fused
+
+    def get_analysis(self, name, tree, runtime_vals):
+        prof = profiling.active()
+        if name in self.cache:
+            self.stats['cached'][name] += 1
+            if prof is not None:
+                prof.count(name, 'analysis', cache='hit')
+            return self.cache[name]
+        if name not in ANALYSES:
+            raise KeyError(f"Unknown analysis: {name}")
+        deps = {dep: self.get_analysis(dep, tree, runtime_vals) for dep in ANALYSIS_REQUIRES[name]}
+        start = time.perf_counter()
+        if prof is None:
+            result = ANALYSES[name](tree, runtime_vals, **deps)
+        else:
+            with prof.record(name, 'analysis', tree, cache='miss'):
+                result = ANALYSES[name](tree, runtime_vals, **deps)
+        self.timings.append((f"analysis:{name}", time.perf_counter() - start))
+        self.stats['computed'][name] += 1
+        self.cache[name] = result
+        return result
+
+    def invalidate(self, preserves):
+        if preserves == ALL:
+            return
+        self.cache = {name: result for name, result in self.cache.items() if name in preserves}
+
+    def run(self, tree, runtime_vals=None):
+        runtime_vals = runtime_vals if runtime_vals is not None else {}
+        self.cache = {}
+        self.timings = []
+        prov = self.provenance = Provenance(tree) if self.track_provenance else None
+        for p, options in self.pipeline:
+            analyses = {name: self.get_analysis(name, tree, runtime_vals) for name in p.requires}
+            if prov is not None:
+                before = prov.snapshot(tree)
+            start = time.perf_counter()
+            prof = profiling.active()
+            if prof is None:
+                tree = p.run(tree, analyses, runtime_vals, **options)
+            else:
+                with prof.record(p.name, 'pass', tree) as event:
+                    tree = p.run(tree, analyses, runtime_vals, **options)
+                    event.set_output(tree)
+            self.timings.append((p.name, time.perf_counter() - start))
+            self.invalidate(p.preserves)
+            if prov is not None:
+                prov.record(tree, before, p.name)
+        self.cache = {}
+        return propagate_locations(tree)
+
+    def report(self):
+        '''
+        Return the timings of the last run as a printable table.
+        '''
+        lines = [f"{name:<40} {seconds * 1000:10.3f} ms" for name, seconds in self.timings]
+        total = sum(seconds for _, seconds in self.timings)
+        lines.append(f"{'total':<40} {total * 1000:10.3f} ms")
+        return "\n".join(lines)
+
+
+## Built-in analyses
+@register_analysis('shapes')
+def _shapes(tree, runtime_vals):
+    from .passes import shape_analysis
+    return shape_analysis.analyze(tree, runtime_vals)
+
+@register_analysis('cost', requires=('shapes',))
+def _cost(tree, runtime_vals, shapes):
+    from .passes import cost_model
+    return cost_model.analyze(tree, runtime_vals, shape_info=shapes)
+
+@register_analysis('def_use')
+def _def_use(tree, runtime_vals):
+    from .passes import attach_def_use_vars
+    return attach_def_use_vars.analyze(tree)
+
+@register_analysis('names')
+def _names(tree, runtime_vals):
+    from .names import NameGenerator
+    return NameGenerator(tree)
+
+@register_analysis('used_names')
+def _used_names(tree, runtime_vals):
+    from .passes import get_used_names
+    return get_used_names.analyze(tree, no_funcname=False)
+
+
+## Built-in passes
+def _node_transformer(module_name, class_name):
+    def make(**options):
+        import importlib
+        m = importlib.import_module(f'.passes.{module_name}', __package__)
+        return getattr(m, class_name)(**options)
+    return make
+
+@register_pass('remove_func_decorator', preserves=('shapes', 'cost', 'def_use'),
+               transformer=_node_transformer('remove_func_decorator', 'RemoveFuncDecorator'))
+def _remove_func_decorator(tree, analyses, runtime_vals):
+    from .passes import remove_func_decorator
+    return remove_func_decorator.transform(tree)
+
+@register_pass('add_func_decorator', preserves=('shapes', 'cost', 'def_use'),
+               transformer=_node_transformer('add_func_decorator', 'AddFuncDecorator'))
+def _add_func_decorator(tree, analyses, runtime_vals, decorator):
+    from .passes import add_func_decorator
+    return add_func_decorator.transform(tree, decorator)
+
+@register_pass('remove_func_arg_annotation', preserves=('shapes', 'cost', 'def_use'),
+               transformer=_node_transformer('remove_func_arg_annotation', 'RemoveFuncArgAnnotation'))
+def _remove_func_arg_annotation(tree, analyses, runtime_vals):
+    from .passes import remove_func_arg_annotation
+    return remove_func_arg_annotation.transform(tree)
+
+@register_pass('where_to_ternary', preserves=('def_use',),
+               transformer=_node_transformer('where_to_ternary', 'WhereToTernary'))
+def _where_to_ternary(tree, analyses, runtime_vals):
+    from .passes import where_to_ternary
+    return where_to_ternary.transform(tree)
+
+@register_pass('normalize_ranges', preserves=('def_use', 'used_names'),
+               transformer=_node_transformer('normalize_ranges', 'NormalizeRange'))
+def _normalize_ranges(tree, analyses, runtime_vals):
+    from .passes import normalize_ranges
+    return normalize_ranges.transform(tree)
+
+@register_pass('replace_name', transformer=_node_transformer('replace_name', 'ReplaceName'))
+def _replace_name(tree, analyses, runtime_vals, old_name, new_name):
+    from .passes import replace_name
+    return replace_name.transform(tree, old_name, new_name)
+
+@register_pass('hoist_shape_access', requires=('names',), preserves=('names',))
+def _hoist_shape_access(tree, analyses, runtime_vals):
+    from .passes import hoist_shape_access
+    return hoist_shape_access.transform(tree, analyses['names'])
+
+@register_pass('to_single_op_form', requires=('names',), preserves=('names',))
+def _to_single_op_form(tree, analyses, runtime_vals):
+    from .passes import to_single_op_form
+    return to_single_op_form.transform(tree, analyses['names'])
+
+@register_pass('attach_def_use_vars', preserves=ALL)
+def _attach_def_use_vars(tree, analyses, runtime_vals):
+    from .passes import attach_def_use_vars
+    return attach_def_use_vars.transform(tree)
+
+@register_pass('vector_op_to_loop', requires=('shapes', 'names'), preserves=('names',))
+def _vector_op_to_loop(tree, analyses, runtime_vals, loop_index_prefix=None):
+    from .passes import vector_op_to_loop
+    return vector_op_to_loop.transform(tree, runtime_vals, loop_index_prefix, shape_info=analyses['shapes'],
+                                       names=analyses['names'])
+
+@register_pass('multiversion')
+def _multiversion(tree, analyses, runtime_vals, signatures, pipeline=('vector_op_to_loop',)):
+    from .passes import multiversion
+    return multiversion.transform(tree, signatures, pipeline, runtime_vals)
+
+@register_pass('stream_memmap', requires=('shapes', 'names'), preserves=('names',))
+def _stream_memmap(tree, analyses, runtime_vals, **options):
+    from .passes import stream_memmap
+    return stream_memmap.transform(tree, runtime_vals, shape_info=analyses['shapes'], names=analyses['names'],
+                                   **options)
@@ -1,6 +1,7 @@
 import ast
+from ...visitor import Transformer
 
-class AddFuncDecorator(ast.NodeTransformer):
+class AddFuncDecorator(Transformer):
     def __init__(self, decorator: str):
         if decorator.startswith('@'):
             decorator = decorator[1:]
@@ -1,4 +1,100 @@
 import ast
+from functools import lru_cache
+
+# Fields that do not affect the meaning of an expression as far as the passes
+# are concerned; `ast.unparse` does not render them either.
+_IGNORED_FIELDS = frozenset(['ctx', 'kind', 'type_comment'])
+_struct_fields_cache = {}
+
+def _struct_fields(cls):
+    fields = _struct_fields_cache.get(cls)
+    if fields is None:
+        fields = _struct_fields_cache[cls] = tuple(f for f in cls._fields if f not in _IGNORED_FIELDS)
+    return fields
+
+def struct_hash(node, cache=None):
+    '''
+    Structural hash of an AST node, computed bottom-up. Locations, `ctx` and
+    constant `kind` are ignored. If `cache` (a dict) is given, the hash of
+    every subtree is memoized in it by node identity; the cache must not
+    outlive mutations of the tree.
+    '''
+    if cache is not None:
+        entry = cache.get(id(node))
+        if entry is not None and entry[0] is node:
+            return entry[1]
+
+    cls = node.__class__
+    if cls is ast.Name:
+        return hash((cls, node.id))
+    if cls is ast.Constant:
+        return hash((cls, node.value.__class__, node.value))
+
+    items = [cls]
+    for field in _struct_fields(node.__class__):
+        value = getattr(node, field, None)
+        if isinstance(value, ast.AST):
+            items.append(struct_hash(value, cache))
+        elif isinstance(value, list):
+            items.append(tuple(
+                struct_hash(v, cache) if isinstance(v, ast.AST) else (v.__class__, v)
+                for v in value
+            ))
+        else:
+            # Include the type so that 1, 1.0 and True are told apart
+            items.append((value.__class__, value))
+    h = hash(tuple(items))
+
+    if cache is not None:
+        cache[id(node)] = (node, h)
+    return h
+
+def struct_eq(a, b):
+    '''
+    Structural equality of two AST nodes (or lists/values of node fields),
+    with the same rules as `struct_hash`.
+    '''
+    if a is b:
+        return True
+    if a.__class__ is not b.__class__:
+        return False
+    if isinstance(a, ast.AST):
+        if a.__class__ is ast.Name:
+            return a.id == b.id
+        for field in _struct_fields(a.__class__):
+            if not struct_eq(getattr(a, field, None), getattr(b, field, None)):
+                return False
+        return True
+    if isinstance(a, list):
+        return len(a) == len(b) and all(struct_eq(x, y) for x, y in zip(a, b))
+    return a == b
+
+class StructKey:
+    '''
+    Wraps an AST node so that it can be used as a dict key or set member,
+    comparing and hashing structurally. The hash is computed once, so the
+    node must not be mutated while the key is in use.
+    '''
+    __slots__ = ('node', 'hash')
+
+    def __init__(self, node, cache=None):
+        self.node = node
+        self.hash = struct_hash(node, cache)
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        if not isinstance(other, StructKey):
+            return NotImplemented
+        return self.hash == other.hash and struct_eq(self.node, other.node)
+
+    def __repr__(self):
+        return f"StructKey({ast.unparse(self.node)!r})"
+
+@lru_cache(maxsize=None)
+def _expr_keys(names):
+    return frozenset(StructKey(str_to_ast_expr(name)) for name in names)
 
 def is_call(node, names=None):
     '''
@@ -6,8 +102,8 @@ def is_call(node, names=None):
     '''
     if isinstance(node, ast.Call):
         if names:
-            names = names if isinstance(names, (tuple, list)) else (names,)
-            return ast.unparse(node.func) in names
+            names = tuple(names) if isinstance(names, (tuple, list)) else (names,)
+            return StructKey(node.func) in _expr_keys(names)
         else:
             return True
     else:
@@ -1,7 +1,8 @@
 import ast
 from ..utils import *
+from ..visitor import Visitor, Transformer
 
-class NameVistor(ast.NodeVisitor):
+class NameVistor(Visitor):
     def __init__(self):
         self.vars = []
 
@@ -18,7 +19,7 @@ class NameVistor(ast.NodeVisitor):
                 self.visit(kw.value)  # Visit keyword argument values
 
 
-class AttachDefUseVars(ast.NodeTransformer):
+class AttachDefUseVars(Transformer):
     def visit_Assign(self, node):
         assert isinstance(node.targets[0], ast.Name)
         node.def_vars = [node.targets[0].id]
@@ -62,3 +63,24 @@ def transform(tree):
     visitor = AttachDefUseVars()
     tree = visitor.visit(tree)
     return tree
+
+def get_use_vars(node):
+    visitor = NameVistor()
+    visitor.visit(node)
+    return visitor.vars
+
+def analyze(tree):
+    '''
+    Return a map from each statement to its `(def_vars, use_vars)`, like
+    `transform` but without attaching attributes to the tree.
+    '''
+    def_use = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            assert isinstance(node.targets[0], ast.Name)
+            def_use[node] = ([node.targets[0].id], get_use_vars(node.value))
+        elif isinstance(node, (ast.Return, ast.Expr)):
+            def_use[node] = ([], get_use_vars(node.value) if node.value is not None else [])
+        elif isinstance(node, (ast.While, ast.If)):
+            def_use[node] = ([], get_use_vars(node.test))
+    return def_use
@@ -0,0 +1,2 @@
+from .analyze_cost import analyze, estimate, Cost
+from .machine import Machine, DEFAULT_MACHINE
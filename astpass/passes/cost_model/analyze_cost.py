@@ -0,0 +1,463 @@
+import ast
+import inspect
+from . import cost_table
+from .machine import DEFAULT_MACHINE
+from .. import shape_analysis
+
+_COST_FIELDS = ('flops', 'bytes_read', 'bytes_written', 'temporaries', 'temp_bytes', 'ops')
+
+class Cost:
+    '''
+    Work and memory traffic of a piece of code.
+
+    `flops` counts arithmetic operations, `bytes_read` and `bytes_written` the
+    array elements moved to and from memory (including the temporary arrays
+    NumPy materializes for intermediate results), and `temporaries` and
+    `temp_bytes` the number and total size of those temporaries. Scalars are
+    assumed to live in registers. `ops` counts the operations the interpreter
+    executes, one per expression node evaluated or target stored, whatever
+    the size of the arrays involved, so that it grows with the iterations of
+    explicit loops but not with the size of vector operations. `exact` is
+    False when some extent, trip count or function cost was unknown and
+    guessed.
+    '''
+    __slots__ = _COST_FIELDS + ('exact',)
+
+    def __init__(self, flops=0, bytes_read=0, bytes_written=0, temporaries=0, temp_bytes=0, ops=0, exact=True):
+        self.flops = flops
+        self.bytes_read = bytes_read
+        self.bytes_written = bytes_written
+        self.temporaries = temporaries
+        self.temp_bytes = temp_bytes
+        self.ops = ops
+        self.exact = exact
+
+    @property
+    def bytes(self):
+        return self.bytes_read + self.bytes_written
+
+    @property
+    def intensity(self):
+        '''
+        Arithmetic intensity in flops per byte of memory traffic.
+        '''
+        if self.bytes == 0:
+            return float('inf') if self.flops else 0.0
+        return self.flops / self.bytes
+
+    def __add__(self, other):
+        return Cost(*[getattr(self, f) + getattr(other, f) for f in _COST_FIELDS],
+                    exact=self.exact and other.exact)
+
+    def scaled(self, k):
+        return Cost(*[getattr(self, f) * k for f in _COST_FIELDS], exact=self.exact)
+
+    def max(self, other):
+        '''
+        Field-wise maximum, the cost of either of two alternatives.
+        '''
+        return Cost(*[max(getattr(self, f), getattr(other, f)) for f in _COST_FIELDS],
+                    exact=self.exact and other.exact)
+
+    def time(self, machine=None):
+        return (machine or DEFAULT_MACHINE).time(self)
+
+    def bound(self, machine=None):
+        return (machine or DEFAULT_MACHINE).bound(self)
+
+    def to_dict(self):
+        d = {f: getattr(self, f) for f in _COST_FIELDS}
+        d['exact'] = self.exact
+        return d
+
+    def __eq__(self, other):
+        return isinstance(other, Cost) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        inexact = '' if self.exact else ', exact=False'
+        return (f"Cost(flops={self.flops}, bytes_read={self.bytes_read}, "
+                f"bytes_written={self.bytes_written}, temporaries={self.temporaries}, ops={self.ops}{inexact})")
+
+
+def itemsize(dtype):
+    if dtype is None or dtype in ('int', 'float'):
+        return 8
+    if dtype == 'complex':
+        return 16
+    if dtype == 'bool':
+        return 1
+    import numpy as np
+    return np.dtype(dtype).itemsize
+
+
+def count_ops(*nodes):
+    '''
+    Number of expression nodes in `nodes` (which may be None or lists), the
+    interpreted operations of evaluating them once.
+    '''
+    n = 0
+    for node in nodes:
+        if isinstance(node, list):
+            n += count_ops(*node)
+        elif node is not None:
+            n += sum(isinstance(child, ast.expr) for child in ast.walk(node))
+    return n
+
+
+def evaluate(node, env):
+    '''
+    Value of a size expression such as `n - 1` or `a.shape[0]` from the
+    runtime values in `env`, or None if it cannot be determined.
+    '''
+    if isinstance(node, ast.Constant):
+        return node.value if type(node.value) is int else None
+    if isinstance(node, ast.Name):
+        val = env.get(node.id)
+        return val if type(val) is int else None
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        val = evaluate(node.operand, env)
+        return None if val is None else -val
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.FloorDiv)):
+        left, right = evaluate(node.left, env), evaluate(node.right, env)
+        if left is None or right is None or (isinstance(node.op, ast.FloorDiv) and right == 0):
+            return None
+        if isinstance(node.op, ast.Add):
+            return left + right
+        if isinstance(node.op, ast.Sub):
+            return left - right
+        if isinstance(node.op, ast.Mult):
+            return left * right
+        return left // right
+    if (
+        isinstance(node, ast.Subscript)
+        and isinstance(node.value, ast.Attribute)
+        and node.value.attr == 'shape'
+        and isinstance(node.value.value, ast.Name)
+        and isinstance(node.slice, ast.Constant)
+    ):
+        shape = getattr(env.get(node.value.value.id), 'shape', None)
+        try:
+            return int(shape[node.slice.value])
+        except (TypeError, IndexError):
+            return None
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == 'len'
+        and len(node.args) == 1
+        and isinstance(node.args[0], ast.Name)
+    ):
+        shape = getattr(env.get(node.args[0].id), 'shape', None)
+        return int(shape[0]) if shape else None
+    return None
+
+
+def evaluate_src(src, env):
+    try:
+        return evaluate(ast.parse(src, mode='eval').body, env)
+    except SyntaxError:
+        return None
+
+
+class AnalyzeCost:
+    '''
+    Computes the `Cost` of every statement from the results of shape
+    analysis. Loops multiply the cost of their body by their trip count, which
+    is known for `range` loops with bounds computable from the runtime values
+    and for loops over arrays. The cost of a statement inside a loop body is
+    the cost of one iteration.
+    '''
+    # Guessed extent of dimensions and trip count of loops that are unknown
+    UNKNOWN_EXTENT = 1
+
+    def __init__(self, shape_info, rt_vals):
+        self.shape_info = shape_info
+        self.env = {k: v for k, v in rt_vals.items() if not inspect.ismodule(v)}
+        self.modules = {k: v for k, v in rt_vals.items() if inspect.ismodule(v)}
+        self.costs = {}
+        self.exact = True
+
+    ## Sizes
+
+    def extent(self, dim):
+        if isinstance(dim, int):
+            return dim
+        if isinstance(dim, str):
+            low, _, up = dim.partition(':')
+            low = evaluate_src(low, self.env) if low else 0
+            up = evaluate_src(up, self.env) if up else None
+            if low is not None and up is not None:
+                return max(up - low, 0)
+        self.exact = False
+        return self.UNKNOWN_EXTENT
+
+    def elements(self, node):
+        shape = self.shape_info.get(node)
+        if shape is None:
+            self.exact = False
+            return self.UNKNOWN_EXTENT
+        n = 1
+        for dim in shape:
+            n *= self.extent(dim)
+        return n
+
+    def is_array(self, node):
+        shape = self.shape_info.get(node)
+        return shape is None or len(shape) > 0
+
+    def nbytes(self, node):
+        return self.elements(node) * itemsize(shape_analysis.get_dtype(self.shape_info.get(node)))
+
+    def memory_bytes(self, node):
+        '''
+        Bytes moved when reading or writing `node`: scalar variables live in
+        registers, everything else in memory.
+        '''
+        if isinstance(node, ast.Name) and not self.is_array(node):
+            return 0
+        return self.nbytes(node)
+
+    ## Expressions
+
+    def expr(self, node):
+        '''
+        Return the cost of evaluating `node` and whether its value is a new
+        temporary array.
+        '''
+        method = getattr(self, 'expr_' + node.__class__.__name__, None)
+        if method is None:
+            # Not modelled: only count the operands
+            self.exact = False
+            cost = Cost()
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr):
+                    cost += self.operand(child)
+            return cost, False
+        return method(node)
+
+    def operand(self, node):
+        '''
+        Cost of evaluating `node` and reading its value back if it was
+        materialized as a temporary.
+        '''
+        cost, temp = self.expr(node)
+        if temp:
+            cost += Cost(bytes_read=self.nbytes(node))
+        return cost
+
+    def result(self, node, cost):
+        if self.is_array(node):
+            nbytes = self.nbytes(node)
+            return cost + Cost(bytes_written=nbytes, temporaries=1, temp_bytes=nbytes), True
+        return cost, False
+
+    def expr_Constant(self, node):
+        return Cost(), False
+
+    def expr_Attribute(self, node):
+        return Cost(), False
+
+    def expr_Slice(self, node):
+        return Cost(), False
+
+    def expr_Name(self, node):
+        return Cost(bytes_read=self.memory_bytes(node)), False
+
+    def expr_Subscript(self, node):
+        # Index arithmetic is not counted
+        return Cost(bytes_read=self.nbytes(node)), False
+
+    def expr_Tuple(self, node):
+        cost = Cost()
+        for elt in node.elts:
+            cost += self.operand(elt)
+        return cost, False
+
+    expr_List = expr_Tuple
+
+    def expr_BinOp(self, node):
+        cost = self.operand(node.left) + self.operand(node.right)
+        if isinstance(node.op, ast.MatMult):
+            left = self.shape_info.get(node.left)
+            k = self.extent(left[-1]) if left else self.UNKNOWN_EXTENT
+            flops = 2 * k * self.elements(node)
+        else:
+            flops = cost_table.BINOP_FLOPS.get(type(node.op).__name__, 1) * self.elements(node)
+        return self.result(node, cost + Cost(flops=flops))
+
+    def expr_UnaryOp(self, node):
+        cost = self.operand(node.operand)
+        flops = cost_table.UNARYOP_FLOPS.get(type(node.op).__name__, 1) * self.elements(node)
+        return self.result(node, cost + Cost(flops=flops))
+
+    def expr_Compare(self, node):
+        cost = self.operand(node.left)
+        for comparator in node.comparators:
+            cost += self.operand(comparator)
+        flops = cost_table.COMPARE_FLOPS * len(node.ops) * self.elements(node)
+        return self.result(node, cost + Cost(flops=flops))
+
+    def expr_BoolOp(self, node):
+        cost = Cost()
+        for value in node.values:
+            cost += self.operand(value)
+        return cost, False
+
+    def expr_IfExp(self, node):
+        cost = self.operand(node.test) + self.operand(node.body).max(self.operand(node.orelse))
+        flops = cost_table.IFEXP_FLOPS * self.elements(node)
+        return self.result(node, cost + Cost(flops=flops))
+
+    def func_name(self, node):
+        if isinstance(node.func, ast.Name):
+            return node.func.id
+        if (
+            isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name)
+            and node.func.value.id in self.modules
+        ):
+            return f"{self.modules[node.func.value.id].__name__}_{node.func.attr}"
+        return None
+
+    def expr_Call(self, node):
+        cost = Cost()
+        for arg in node.args:
+            cost += self.operand(arg)
+        f_name = self.func_name(node)
+        if f_name in cost_table.REDUCE_FLOPS and node.args:
+            flops = cost_table.REDUCE_FLOPS[f_name] * self.elements(node.args[0])
+        else:
+            per_element = cost_table.func_flops(f_name)
+            if per_element is None:
+                self.exact = False
+                per_element = 0
+            flops = per_element * self.elements(node)
+        return self.result(node, cost + Cost(flops=flops))
+
+    ## Statements
+
+    def stmt(self, node):
+        saved, self.exact = self.exact, True
+        method = getattr(self, 'stmt_' + node.__class__.__name__, self.stmt_generic)
+        cost = method(node)
+        if not self.exact:
+            cost = cost + Cost(exact=False)
+        self.exact = saved
+        self.costs[node] = cost
+        return cost
+
+    def stmts(self, stmts):
+        cost = Cost()
+        for stmt in stmts:
+            cost += self.stmt(stmt)
+        return cost
+
+    def stmt_generic(self, node):
+        cost = Cost()
+        for field in ('body', 'orelse', 'finalbody'):
+            cost += self.stmts(getattr(node, field, []))
+        return cost
+
+    def stmt_Assign(self, node):
+        value = node.value
+        targets = node.targets
+        ops = Cost(ops=count_ops(targets, value))
+        if (
+            all(isinstance(t, ast.Name) for t in targets)
+            and isinstance(value, (ast.Name, ast.Subscript, ast.Attribute))
+            and self.is_array(value)
+        ):
+            # Binds the names to an existing array or a view of it
+            return ops
+        cost, temp = self.expr(value)
+        cost += ops
+        for target in targets:
+            if isinstance(target, (ast.Subscript, ast.Attribute)):
+                # Copied into an existing array
+                if temp:
+                    cost += Cost(bytes_read=self.nbytes(value))
+                cost += Cost(bytes_written=self.nbytes(target))
+        return cost
+
+    def stmt_AugAssign(self, node):
+        target = node.target
+        cost = self.operand(node.value)
+        nbytes = self.memory_bytes(target)
+        flops = cost_table.BINOP_FLOPS.get(type(node.op).__name__, 1) * self.elements(target)
+        return cost + Cost(flops=flops, bytes_read=nbytes, bytes_written=nbytes,
+                           ops=count_ops(target, node.value) + 1)
+
+    def stmt_Expr(self, node):
+        return self.expr(node.value)[0] + Cost(ops=count_ops(node.value))
+
+    def stmt_Return(self, node):
+        if node.value is None:
+            return Cost(ops=1)
+        return self.expr(node.value)[0] + Cost(ops=count_ops(node.value) + 1)
+
+    def stmt_If(self, node):
+        test = self.operand(node.test) + Cost(ops=count_ops(node.test))
+        return test + self.stmts(node.body).max(self.stmts(node.orelse))
+
+    def trip_count(self, node):
+        it = node.iter
+        if isinstance(it, ast.Call) and isinstance(it.func, ast.Name) and it.func.id == 'range':
+            args = [evaluate(arg, self.env) for arg in it.args]
+            if 1 <= len(args) <= 3 and None not in args:
+                start, stop, step = ([0] if len(args) == 1 else []) + args + [1] * (len(args) < 3)
+                if step:
+                    return len(range(start, stop, step))
+        else:
+            shape = self.shape_info.get(it)
+            if shape:
+                return self.extent(shape[0])
+        self.exact = False
+        return self.UNKNOWN_EXTENT
+
+    def stmt_For(self, node):
+        # The elements iterated over are counted where the body reads them
+        trips = self.trip_count(node)
+        # Each iteration advances the iterator and stores the target
+        body = self.stmts(node.body) + Cost(ops=count_ops(node.target) + 1)
+        return Cost(ops=count_ops(node.iter)) + body.scaled(trips) + self.stmts(node.orelse)
+
+    def stmt_While(self, node):
+        self.exact = False
+        body = self.operand(node.test) + self.stmts(node.body) + Cost(ops=count_ops(node.test))
+        return body.scaled(self.UNKNOWN_EXTENT) + self.stmts(node.orelse)
+
+    def stmt_Pass(self, node):
+        return Cost()
+
+    stmt_Import = stmt_ImportFrom = stmt_Break = stmt_Continue = stmt_Pass
+
+    def visit(self, tree):
+        if isinstance(tree, ast.Module):
+            self.costs[tree] = self.stmts(tree.body)
+        elif isinstance(tree, ast.stmt):
+            self.stmt(tree)
+        return self.costs
+
+
+def analyze(tree, rt_vals, shape_info=None):
+    '''
+    Estimate the cost of every statement of `tree` for the given runtime
+    values.
+
+    Returns a dict mapping each statement node (and the module) to its
+    `Cost`; compound statements include the cost of their bodies, and loops
+    that of all their iterations. `shape_info`, the result of
+    `shape_analysis.analyze` on the same tree, is computed if not given.
+    '''
+    if shape_info is None:
+        shape_info = shape_analysis.analyze(tree, rt_vals)
+    return AnalyzeCost(shape_info, rt_vals).visit(tree)
+
+
+def estimate(tree, rt_vals, machine=None, shape_info=None):
+    '''
+    Estimated seconds to run `tree` on `machine` (a `Machine`, by default
+    `DEFAULT_MACHINE`).
+    '''
+    costs = analyze(tree, rt_vals, shape_info)
+    return costs[tree].time(machine)
@@ -0,0 +1,63 @@
+'''
+Cost counterparts of the entries in `func_table`: the floating-point
+operations per output element of each function.
+
+The counts of transcendental functions are the usual rough equivalents of
+their vectorized implementations in flops; they only need to rank code
+correctly, not to predict cycle counts.
+'''
+
+# Flops per element of binary and unary operators, by operator class name
+BINOP_FLOPS = {
+    'Add': 1, 'Sub': 1, 'Mult': 1, 'Div': 4, 'FloorDiv': 4, 'Mod': 4, 'Pow': 20,
+    'BitAnd': 1, 'BitOr': 1, 'BitXor': 1, 'LShift': 1, 'RShift': 1,
+}
+
+UNARYOP_FLOPS = {'USub': 1, 'UAdd': 0, 'Not': 1, 'Invert': 1}
+
+COMPARE_FLOPS = 1
+
+IFEXP_FLOPS = 1
+
+# Flops per element of calls, keyed like `func_table`
+FUNC_FLOPS = {
+    'numpy_sin': 20,
+    'numpy_cos': 20,
+    'numpy_tan': 30,
+    'numpy_sinh': 25,
+    'numpy_cosh': 25,
+    'numpy_tanh': 25,
+    'numpy_round': 1,
+    'numpy_rint': 1,
+    'numpy_log': 20,
+    'numpy_exp': 20,
+    'numpy_sqrt': 4,
+    'numpy_pow': 20,
+    'numpy_power': 20,
+    'numpy_add': 1,
+    'numpy_subtract': 1,
+    'numpy_multiply': 1,
+    'numpy_divide': 4,
+    'numpy_minimum': 1,
+    'numpy_maximum': 1,
+    'pow': 20,
+    'min': 1,
+    'max': 1,
+    'erf': 30,
+}
+
+# Reductions combine every input element once, whatever their output shape
+REDUCE_FLOPS = {
+    'numpy_sum': 1,
+    'numpy_min': 1,
+    'numpy_max': 1,
+    'numpy_argmin': 1,
+    'numpy_argmax': 1,
+}
+
+
+def func_flops(f_name):
+    '''
+    Flops per element of `f_name`, or None if the function is unknown.
+    '''
+    return FUNC_FLOPS.get(f_name)
@@ -0,0 +1,69 @@
+class Machine:
+    '''
+    Roofline description of a machine: a statement takes at least its flops
+    divided by the peak flop rate and at least its memory traffic divided by
+    the memory bandwidth, whichever is larger, plus a fixed cost per
+    temporary array allocated and per operation the interpreter executes.
+    The latter dominates explicit loops run by CPython, while NumPy runs the
+    element-wise work of vector code at the roofline.
+
+    Parameters
+    ----------
+    name : str, optional
+        Label of the description.
+    peak_flops : float, optional
+        Peak floating-point operations per second.
+    bandwidth : float, optional
+        Sustained memory bandwidth in bytes per second.
+    alloc_time : float, optional
+        Seconds spent allocating (and freeing) one temporary array.
+    op_time : float, optional
+        Seconds the interpreter spends on one operation, e.g. loading a name
+        or indexing an array with a scalar. Set it to 0 for code compiled
+        with e.g. Numba.
+    '''
+    def __init__(self, name='generic', peak_flops=5e10, bandwidth=2e10, alloc_time=2e-7, op_time=3e-8):
+        self.name = name
+        self.peak_flops = float(peak_flops)
+        self.bandwidth = float(bandwidth)
+        self.alloc_time = float(alloc_time)
+        self.op_time = float(op_time)
+
+    @property
+    def ridge_point(self):
+        '''
+        The arithmetic intensity (flops per byte) from which code is
+        compute bound rather than memory bound.
+        '''
+        return self.peak_flops / self.bandwidth
+
+    def attainable_flops(self, intensity):
+        return min(self.peak_flops, intensity * self.bandwidth)
+
+    def time(self, cost):
+        '''
+        Estimated seconds to run code of the given `Cost`.
+        '''
+        return (max(cost.flops / self.peak_flops, cost.bytes / self.bandwidth)
+                + cost.temporaries * self.alloc_time + cost.ops * self.op_time)
+
+    def bound(self, cost):
+        '''
+        'compute' or 'memory', whichever limits code of the given `Cost`.
+        '''
+        return 'compute' if cost.intensity >= self.ridge_point else 'memory'
+
+    def to_dict(self):
+        return {'name': self.name, 'peak_flops': self.peak_flops, 'bandwidth': self.bandwidth,
+                'alloc_time': self.alloc_time, 'op_time': self.op_time}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**d)
+
+    def __repr__(self):
+        return (f"Machine({self.name!r}, peak_flops={self.peak_flops:.3g}, "
+                f"bandwidth={self.bandwidth:.3g})")
+
+
+DEFAULT_MACHINE = Machine()
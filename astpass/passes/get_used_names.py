@@ -1,6 +1,7 @@
 import ast
+from ..visitor import Visitor
 
-class GetUsedNames(ast.NodeVisitor):
+class GetUsedNames(Visitor):
     def __init__(self, no_funcname):
         self.used = []
         self.no_funcname = no_funcname
@@ -1,12 +1,22 @@
 import ast
+from ...names import get_names
+from ...visitor import Transformer
 
-class HoistShapeAttr(ast.NodeTransformer):
+class HoistShapeAttr(Transformer):
     '''
     Updates `a.shape[0]` to `a_shape_0` and inserts an assignment `a_shape_0 = a.shape[0]`
     before the loop.
     '''
-    def __init__(self):
+    def __init__(self, names):
         self.hoisted_shapes = None
+        self.names = names
+        self.shape_names = {}
+
+    def get_shape_name(self, array_name, dim_index):
+        key = (array_name, dim_index)
+        if key not in self.shape_names:
+            self.shape_names[key] = self.names.unique(f"{array_name}_shape_{dim_index}")
+        return self.shape_names[key]
 
     def visit_Subscript(self, node):
         self.generic_visit(node)
@@ -18,7 +28,7 @@ class HoistShapeAttr(ast.NodeTransformer):
         ):
             array_name = node.value.value.id
             dim_index = node.slice.value
-            new_name = f"{array_name}_shape_{dim_index}"
+            new_name = self.get_shape_name(array_name, dim_index)
             tos = self.hoisted_shapes
             if (array_name, dim_index) not in tos:
                 tos.append((array_name, dim_index))            
@@ -37,7 +47,7 @@ class HoistShapeAttr(ast.NodeTransformer):
         self.generic_visit(node)
         new_assignments = []
         for array_name, dim_index in self.hoisted_shapes:
-            new_name = f"{array_name}_shape_{dim_index}"
+            new_name = self.get_shape_name(array_name, dim_index)
             shape_access = ast.Subscript(
                 value=ast.Attribute(
                     value=ast.Name(id=array_name, ctx=ast.Load()),
@@ -55,10 +65,11 @@ class HoistShapeAttr(ast.NodeTransformer):
         self.hoisted_shapes = None
         return new_assignments + [node]
     
-def transform(tree):
+def transform(tree, names=None):
     '''
-    Transforms the AST by hoisting shape attribute accesses.
+    Transforms the AST by hoisting shape attribute accesses. `names` is the
+    `NameGenerator` to take the new variable names from.
     '''
-    tree = HoistShapeAttr().visit(tree)
+    tree = HoistShapeAttr(get_names(tree, names)).visit(tree)
     ast.fix_missing_locations(tree)
     return tree
\ No newline at end of file
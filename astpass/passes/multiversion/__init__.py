@@ -0,0 +1,136 @@
+'''
+Shape-guarded multiversioning.
+
+For each of several runtime-value signatures, a copy of the code is run
+through the shape-dependent passes, and the specialised bodies are combined in
+one function behind guards on the shapes and dtypes of its array arguments,
+with the original body as the fallback::
+
+    def f(a, b):
+        if getattr(a, 'shape', None) == (8,) and getattr(a, 'dtype', None) == 'float64' and ...:
+            <body transformed for 8 float64 elements>
+        elif getattr(a, 'shape', None) == (64,) and getattr(a, 'dtype', None) == 'float64' and ...:
+            <body transformed for 64 float64 elements>
+        else:
+            <original body>
+
+Arguments that are scalars in a signature are guarded as non-arrays, so a call
+that matches no version, whatever the types of its arguments, runs the
+original body.
+
+Straight-line code (a module without functions) is versioned as a whole, with
+guards on the arrays it uses.
+'''
+import ast
+from ...array_spec import to_spec
+from ...names import names_in
+from ...provenance import propagate_locations
+from ...utils import clone_ast
+
+DEFAULT_PIPELINE = ('vector_op_to_loop',)
+
+def attr_test(name, attr, value):
+    # `getattr` so that a non-array argument fails the test instead of raising
+    left = ast.Call(
+        func=ast.Name(id='getattr', ctx=ast.Load()),
+        args=[ast.Name(id=name, ctx=ast.Load()), ast.Constant(attr), ast.Constant(None)],
+        keywords=[],
+    )
+    if value is None:
+        return ast.Compare(left=left, ops=[ast.Is()], comparators=[ast.Constant(None)])
+    if isinstance(value, tuple):
+        value = ast.Tuple(elts=[ast.Constant(int(d)) for d in value], ctx=ast.Load())
+    else:
+        value = ast.Constant(value)
+    return ast.Compare(left=left, ops=[ast.Eq()], comparators=[value])
+
+def shape_guard(names, runtime_vals):
+    '''
+    The test `getattr(x, 'shape', None) == (...) and getattr(x, 'dtype', None)
+    == '...' and ...` over the arrays among `names`, also checking that the
+    other names with a runtime value are not arrays, or None if none of them
+    is an array. NumPy dtypes compare equal to their names.
+    '''
+    tests = []
+    has_array = False
+    for name in names:
+        if name not in runtime_vals:
+            continue
+        val = to_spec(runtime_vals[name])
+        shape = getattr(val, 'shape', None)
+        tests.append(attr_test(name, 'shape', shape))
+        if shape is not None:
+            has_array = True
+            dtype = val.dtype
+            tests.append(attr_test(name, 'dtype', getattr(dtype, 'name', dtype)))
+    if not has_array:
+        return None
+    return tests[0] if len(tests) == 1 else ast.BoolOp(op=ast.And(), values=tests)
+
+def guarded(versions, fallback):
+    '''
+    Chain `(guard, body)` versions into an if/elif statement ending with the
+    `fallback` body.
+    '''
+    stmts = fallback
+    for guard, body in reversed(versions):
+        stmts = [ast.If(test=guard, body=body, orelse=stmts)]
+    return stmts
+
+def specialize(tree, runtime_vals, pipeline):
+    from ...pass_manager import PassManager
+    return PassManager(pipeline).run(clone_ast(tree), runtime_vals)
+
+def transform(tree, signatures, pipeline=DEFAULT_PIPELINE, runtime_vals=None):
+    '''
+    Version the functions of `tree` (or its statements, if it defines none)
+    for each of `signatures`.
+
+    Parameters
+    ----------
+    tree : ast.Module
+        The code to transform; it is modified in place.
+    signatures : list of dict
+        Runtime values, arrays or `ArraySpec`s, of each version. Signatures
+        that give the same guard as an earlier one, e.g. arrays that differ
+        only in strides, are skipped.
+    pipeline : list, optional
+        The shape-dependent passes run for each version.
+    runtime_vals : dict, optional
+        Runtime values shared by all signatures, e.g. modules.
+
+    Returns
+    -------
+    ast.Module
+        The transformed tree.
+    '''
+    runtime_vals = runtime_vals or {}
+    funcs = [i for i, stmt in enumerate(tree.body) if isinstance(stmt, ast.FunctionDef)]
+    if funcs:
+        guard_names = {i: [arg.arg for arg in tree.body[i].args.args] for i in funcs}
+    else:
+        used = names_in(tree)
+        guard_names = {None: sorted({name for sig in signatures for name in sig if name in used})}
+
+    versions = {i: [] for i in guard_names}
+    seen = {i: set() for i in guard_names}
+    for sig in signatures:
+        vals = {**runtime_vals, **sig}
+        specialized = specialize(tree, vals, pipeline)
+        for i, names in guard_names.items():
+            guard = shape_guard(names, sig)
+            if guard is None:
+                raise ValueError(f"Signature {sorted(sig)} has no array to guard on")
+            key = ast.dump(guard)
+            if key in seen[i]:
+                continue
+            seen[i].add(key)
+            body = specialized.body if i is None else specialized.body[i].body
+            versions[i].append((guard, body))
+
+    for i, v in versions.items():
+        if i is None:
+            tree.body = guarded(v, tree.body)
+        else:
+            tree.body[i].body = guarded(v, tree.body[i].body)
+    return propagate_locations(tree)
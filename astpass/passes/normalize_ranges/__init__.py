@@ -1,6 +1,7 @@
 import ast
+from ...visitor import Transformer
 
-class NormalizeRange(ast.NodeTransformer):
+class NormalizeRange(Transformer):
     def visit_Call(self, node):
         if isinstance(node.func, ast.Name) and node.func.id == 'range':
             if len(node.args) == 1:
@@ -1,6 +1,7 @@
 import ast
+from ..visitor import Transformer
 
-class RemoveFuncArgAnnotation(ast.NodeTransformer):
+class RemoveFuncArgAnnotation(Transformer):
     def visit_arguments(self, node):
         for arg in node.args:
             arg.annotation = None
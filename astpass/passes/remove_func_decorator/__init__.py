@@ -1,6 +1,7 @@
 import ast
+from ...visitor import Transformer
 
-class RemoveFuncDecorator(ast.NodeTransformer):
+class RemoveFuncDecorator(Transformer):
     def visit_FunctionDef(self, node):
         node.decorator_list = []
         return node
@@ -1,6 +1,7 @@
 import ast
+from ...visitor import Transformer
 
-class ReplaceName(ast.NodeTransformer):
+class ReplaceName(Transformer):
     def __init__(self, old_name, new_name):
         self.old_name = old_name
         self.new_name = new_name
@@ -1 +1 @@
-from .analyze_shapes import analyze
\ No newline at end of file
+from .analyze_shapes import analyze, TypedShape, get_dtype
\ No newline at end of file
@@ -1,24 +1,56 @@
 import ast
 import inspect
-from . import func_table
+from . import func_table, dtype_table
 from ..ast_utils import is_call
+from ...visitor import Visitor
 
-class AnalyzeExprShapes(ast.NodeVisitor):
+class TypedShape(tuple):
+    '''
+    A shape tuple that also carries the dtype of the value, so that it compares
+    equal to the plain shape tuple. `dtype` is a NumPy dtype name, one of the
+    weak Python scalar types 'int', 'float', 'complex' (see `dtype_table`), or
+    None if unknown.
+    '''
+    def __new__(cls, shape, dtype=None):
+        self = super().__new__(cls, shape)
+        self.dtype = dtype
+        return self
+
+    def __repr__(self):
+        return tuple.__repr__(self)
+
+def get_dtype(shape):
+    return getattr(shape, 'dtype', None)
+
+class AnalyzeExprShapes(Visitor):
     def __init__(self, rt_vals):
         self.node_shapes = {}
         self.var_shapes = {}
+        self.var_dtypes = {}
         self.modules = {}
         self.init_rt_var_shapes(rt_vals)
         self.init_module_names(rt_vals)
 
     def init_rt_var_shapes(self, rt_vals):
         for var, val in rt_vals.items():
+            if inspect.ismodule(val):
+                # Modules are handled by `init_module_names`
+                continue
             if isinstance(val, (int, float, bool)):
                 self.var_shapes[var] = ()
             elif hasattr(val, 'shape'):
                 self.var_shapes[var] = val.shape
             else:
                 raise RuntimeError(f"Unsupported type: {type(val)}")
+            self.var_dtypes[var] = dtype_table.dtype_of_value(val)
+
+    def set_shape(self, node, shape, dtype):
+        if shape is not None:
+            shape = TypedShape(shape, dtype)
+        self.node_shapes[node] = shape
+
+    def dtype_of(self, node):
+        return get_dtype(self.node_shapes[node])
 
     def init_module_names(self, rt_vals):
         for var, val in rt_vals.items():
@@ -28,13 +60,13 @@ class AnalyzeExprShapes(ast.NodeVisitor):
     # Two types of leaf nodes
     def visit_Constant(self, node):
         if isinstance(node.value, (int, float, bool)):
-            self.node_shapes[node] = ()
+            self.set_shape(node, (), dtype_table.dtype_of_value(node.value))
         else:
             raise RuntimeError(f"Unsupported constant type: {type(node.value)}")
 
     def visit_Name(self, node):
         if node.id in self.var_shapes:
-            self.node_shapes[node] = self.var_shapes[node.id]
+            self.set_shape(node, self.var_shapes[node.id], self.var_dtypes.get(node.id))
         else:
             raise RuntimeError(f"Name {node.id} not found in runtime values")
     
@@ -42,16 +74,20 @@ class AnalyzeExprShapes(ast.NodeVisitor):
     def visit_UnaryOp(self, node):
         self.generic_visit(node)
         f = getattr(func_table, 'uop_generic')
-        self.node_shapes[node] = f(self.node_shapes[node.operand])
+        dtype = 'bool' if isinstance(node.op, ast.Not) else dtype_table.uop_generic(self.dtype_of(node.operand))
+        self.set_shape(node, f(self.node_shapes[node.operand]), dtype)
     
     def visit_BinOp(self, node):
         self.generic_visit(node)
+        left_dtype, right_dtype = self.dtype_of(node.left), self.dtype_of(node.right)
         if isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.BitAnd, ast.BitOr, ast.BitXor)):
             f = getattr(func_table, 'binop_generic')
-            self.node_shapes[node] = f(self.node_shapes[node.left], self.node_shapes[node.right])
+            dtype = dtype_table.binop_generic(type(node.op).__name__, left_dtype, right_dtype)
+            self.set_shape(node, f(self.node_shapes[node.left], self.node_shapes[node.right]), dtype)
         elif isinstance(node.op, ast.MatMult):
             f = getattr(func_table, 'matmul_generic')
-            self.node_shapes[node] = f(self.node_shapes[node.left], self.node_shapes[node.right])
+            dtype = dtype_table.matmul_generic(left_dtype, right_dtype)
+            self.set_shape(node, f(self.node_shapes[node.left], self.node_shapes[node.right]), dtype)
         else:
             raise NotImplementedError(f"Binary operator {node.op} not implemented")
         
@@ -59,12 +95,15 @@ class AnalyzeExprShapes(ast.NodeVisitor):
         self.generic_visit(node)
         assert len(node.comparators) == 1
         f = getattr(func_table, 'compare_generic')        
-        self.node_shapes[node] = f(self.node_shapes[node.left], self.node_shapes[node.comparators[0]])
+        shape = f(self.node_shapes[node.left], self.node_shapes[node.comparators[0]])
+        self.set_shape(node, shape, dtype_table.compare_generic(self.dtype_of(node.left), self.dtype_of(node.comparators[0])))
 
     def visit_IfExp(self, node: ast.IfExp):
         self.generic_visit(node)
         f = getattr(func_table, 'ifexp_generic')
-        self.node_shapes[node] = f(self.node_shapes[node.test], self.node_shapes[node.body], self.node_shapes[node.orelse])
+        shape = f(self.node_shapes[node.test], self.node_shapes[node.body], self.node_shapes[node.orelse])
+        dtype = dtype_table.ifexp_generic(self.dtype_of(node.test), self.dtype_of(node.body), self.dtype_of(node.orelse))
+        self.set_shape(node, shape, dtype)
 
     def dispatch_call(self, f_name, args):
         if f_name in ['numpy_sum', 'numpy_min', 'numpy_max', 'numpy_argmin', 'numpy_argmax']:
@@ -79,6 +118,12 @@ class AnalyzeExprShapes(ast.NodeVisitor):
         else:
             f = getattr(func_table, f_name)
             return f(*[self.node_shapes[arg] for arg in args])
+
+    def dispatch_call_dtype(self, f_name, args):
+        f = getattr(dtype_table, f_name, None)
+        if f is None:
+            return None
+        return f(*[self.dtype_of(arg) for arg in args])
         
     def visit_Call(self, node: ast.Call):
         for arg in node.args:
@@ -101,7 +146,7 @@ class AnalyzeExprShapes(ast.NodeVisitor):
         else:
             assert False, "Impossible path"
 
-        self.node_shapes[node] = self.dispatch_call(f_name, node.args)
+        self.set_shape(node, self.dispatch_call(f_name, node.args), self.dispatch_call_dtype(f_name, node.args))
 
     def visit_Subscript(self, node):
         self.generic_visit(node)
@@ -112,20 +157,23 @@ class AnalyzeExprShapes(ast.NodeVisitor):
         else:
             indices.append(self.node_shapes[node.slice])
         f = getattr(func_table, 'subscript')
-        self.node_shapes[node] = f(self.node_shapes[node.value], indices)
+        dtype = dtype_table.subscript(self.dtype_of(node.value), indices)
+        self.set_shape(node, f(self.node_shapes[node.value], indices), dtype)
 
     def visit_Slice(self, node: ast.Slice):  
-        if (
-            isinstance(node.upper, ast.UnaryOp)
-            and isinstance(node.upper.op, ast.USub) 
-            and isinstance(node.upper.operand, ast.Constant)
-        ):
-            node.upper = ast.Constant(value=-node.upper.operand.value)
-
         args = []
         for arg in [node.lower, node.upper, node.step]:
             if arg is None:
                 args.append(None)
+            elif (
+                arg is node.upper
+                and isinstance(arg, ast.UnaryOp)
+                and isinstance(arg.op, ast.USub)
+                and isinstance(arg.operand, ast.Constant)
+            ):
+                # A negative upper bound such as `-1` parses as a unary minus.
+                # Read its value without rewriting the analysed tree.
+                args.append(-arg.operand.value)
             elif isinstance(arg, ast.Constant):
                 args.append(arg.value)
             elif isinstance(arg, ast.expr):
@@ -134,28 +182,176 @@ class AnalyzeExprShapes(ast.NodeVisitor):
                 raise RuntimeError("Should not reach here")
         
         f = getattr(func_table, 'slice')
-        self.node_shapes[node] = f(*args)
+        self.set_shape(node, f(*args), dtype_table.slice(*args))
 
 class AnalyzeAssignShapes(AnalyzeExprShapes):
+    '''
+    Flow-sensitive shape analysis over statements. The shape of a variable may
+    differ by program point: each Name node is mapped to the shape the
+    variable has where the node appears.
+
+    At control flow merges (after `if`/`else` and after loops) the shapes from
+    all incoming paths are joined with `func_table.join`, and loop bodies are
+    iterated until the shapes at the loop head reach a fixed point.
+    '''
+    MAX_FIXED_POINT_ITERS = 100
+
     def __init__(self, rt_vals):
         super().__init__(rt_vals)
+        self.returned = False
+
+    def get_state(self):
+        return dict(self.var_shapes), dict(self.var_dtypes)
+
+    def set_state(self, state):
+        self.var_shapes, self.var_dtypes = dict(state[0]), dict(state[1])
+
+    def join_states(self, s1, s2):
+        shapes, dtypes = dict(s1[0]), dict(s1[1])
+        for var, shape in s2[0].items():
+            if var in shapes:
+                shapes[var] = func_table.join(shapes[var], shape)
+                dtypes[var] = dtype_table.join(dtypes.get(var), s2[1].get(var))
+            else:
+                # Defined on one path only
+                shapes[var] = shape
+                dtypes[var] = s2[1].get(var)
+        return shapes, dtypes
+
+    def visit_stmts(self, stmts):
+        for stmt in stmts:
+            self.visit(stmt)
+
+    def visit_FunctionDef(self, node):
+        self.visit_stmts(node.body)
 
     def visit_Assign(self, node):
         self.visit(node.value)
-        target = node.targets[0]
-        if isinstance(target, ast.Name) and target.id not in self.var_shapes:
-            self.var_shapes[target.id] = self.node_shapes[node.value]
+        for target in node.targets:
+            self.assign_target(target, node.value)
+
+    def assign_target(self, target, value):
+        if isinstance(target, (ast.Tuple, ast.List)):
+            self.assign_tuple_target(target, value)
+            return
+
+        shape = self.node_shapes[value]
+        if isinstance(target, ast.Name):
+            # A name is rebound to the shape of the value from here on
+            self.var_shapes[target.id] = shape
+            self.var_dtypes[target.id] = self.dtype_of(value)
 
         self.visit(target)
         # Check if the shape of the target and the value are the same
-        if self.node_shapes[target] != self.node_shapes[node.value]:
-            raise RuntimeError(f"Shapes mismatch for assignment: {ast.unparse(node)}")
-        
+        if self.node_shapes[target] != shape:
+            raise RuntimeError(f"Shapes mismatch for assignment: {ast.unparse(target)} = {ast.unparse(value)}")
+
+    def assign_tuple_target(self, target, value):
+        if isinstance(value, (ast.Tuple, ast.List)):
+            if len(value.elts) != len(target.elts):
+                raise RuntimeError(f"Cannot unpack {len(value.elts)} values into {len(target.elts)} targets")
+            for elt_target, elt_value in zip(target.elts, value.elts):
+                self.assign_target(elt_target, elt_value)
+            return
+
+        shape = self.node_shapes.get(value)
+        if not shape or shape[0] != len(target.elts):
+            raise RuntimeError(f"Cannot unpack a value of shape {shape} into {len(target.elts)} targets")
+        # Unpacking an array binds each target to a row
+        for elt_target in target.elts:
+            if not isinstance(elt_target, ast.Name):
+                raise NotImplementedError("Only names are supported when unpacking an array")
+            self.var_shapes[elt_target.id] = shape[1:]
+            self.var_dtypes[elt_target.id] = self.dtype_of(value)
+            self.visit(elt_target)
+
+    def visit_AugAssign(self, node):
+        self.visit(node.value)
+        target = node.target
+        self.visit(target)
+        target_shape, value_shape = self.node_shapes[target], self.node_shapes[node.value]
+        shape = func_table.binop_generic(target_shape, value_shape)
+        dtype = dtype_table.binop_generic(type(node.op).__name__, self.dtype_of(target), self.dtype_of(node.value))
+        if len(target_shape) > 0:
+            # Arrays are updated in place and keep their shape and dtype
+            if shape != target_shape:
+                raise RuntimeError(f"Shapes mismatch for assignment: {ast.unparse(node)}")
+            dtype = self.dtype_of(target)
+        if isinstance(target, ast.Name):
+            self.var_shapes[target.id] = shape
+            self.var_dtypes[target.id] = dtype
+
+    def visit_Return(self, node):
+        if node.value is not None:
+            self.visit(node.value)
+            self.set_shape(node, self.node_shapes[node.value], self.dtype_of(node.value))
+        else:
+            self.set_shape(node, (), None)
+        self.returned = True
+
+    def visit_If(self, node):
+        self.visit(node.test)
+        entry, returned = self.get_state(), self.returned
+
+        self.returned = False
+        self.visit_stmts(node.body)
+        body_state, body_returned = self.get_state(), self.returned
+
+        self.set_state(entry)
+        self.returned = False
+        self.visit_stmts(node.orelse)
+        else_state, else_returned = self.get_state(), self.returned
+
+        # A branch that returned does not flow into the merge
+        if body_returned and not else_returned:
+            self.set_state(else_state)
+        elif else_returned and not body_returned:
+            self.set_state(body_state)
+        else:
+            self.set_state(self.join_states(body_state, else_state))
+        self.returned = returned or (body_returned and else_returned)
+
+    def visit_loop(self, node, visit_head):
+        entry, returned = self.get_state(), self.returned
+        state = entry
+        for _ in range(self.MAX_FIXED_POINT_ITERS):
+            self.set_state(state)
+            visit_head()
+            self.visit_stmts(node.body)
+            new_state = self.join_states(entry, self.get_state())
+            if new_state == state:
+                break
+            state = new_state
+        else:
+            raise RuntimeError(f"Shape analysis did not converge for loop at line {getattr(node, 'lineno', None)}")
+
+        # The loop may run zero times, so the exit state is the loop-head state
+        self.set_state(state)
+        self.returned = returned
+        self.visit_stmts(node.orelse)
+
     def visit_For(self, node):
-        # Only for-range calls are supported
-        assert is_call(node.iter, ["range"])
-        self.var_shapes[node.target.id] = ()
-        self.generic_visit(node)
+        self.visit(node.iter)
+        if is_call(node.iter, ["range"]):
+            target_shape, target_dtype = (), dtype_table.range()
+        else:
+            iter_shape = self.node_shapes[node.iter]
+            if not iter_shape:
+                raise RuntimeError(f"Cannot iterate over a value of shape {iter_shape}")
+            target_shape, target_dtype = iter_shape[1:], self.dtype_of(node.iter)
+
+        if not isinstance(node.target, ast.Name):
+            raise NotImplementedError("Only name loop targets are supported")
+
+        def visit_head():
+            self.var_shapes[node.target.id] = target_shape
+            self.var_dtypes[node.target.id] = target_dtype
+            self.visit(node.target)
+
+        self.visit_loop(node, visit_head)
+
+    def visit_While(self, node):
+        self.visit_loop(node, lambda: self.visit(node.test))
 
 
 def analyze(tree, rt_vals):
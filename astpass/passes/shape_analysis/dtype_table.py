@@ -0,0 +1,204 @@
+'''
+Dtype counterparts of the entries in `func_table`, following NumPy type
+promotion rules (NEP 50).
+
+Dtypes are represented by their NumPy names ('float32', 'int64', 'bool', ...).
+Python scalars are "weak" and are represented by the Python type names 'int',
+'float' and 'complex': they do not widen the dtype of an array they are
+combined with, e.g. `promote('float32', 'float') == 'float32'`. A dtype of None
+means unknown and propagates.
+'''
+
+WEAK_DTYPES = ('int', 'float', 'complex')
+
+_WEAK_KIND_ORDER = ['bool', 'int', 'float', 'complex']
+_WEAK_VALUES = {'int': 0, 'float': 0.0, 'complex': 0j}
+
+def is_weak(dtype):
+    return dtype in WEAK_DTYPES
+
+def kind(dtype):
+    '''
+    One of 'b', 'i', 'u', 'f', 'c', following `numpy.dtype.kind`.
+    '''
+    if dtype in ('bool', 'int', 'float', 'complex'):
+        return {'bool': 'b', 'int': 'i', 'float': 'f', 'complex': 'c'}[dtype]
+    import numpy as np
+    return np.dtype(dtype).kind
+
+_PYTHON_SCALAR_DTYPES = {bool: 'bool', int: 'int', float: 'float', complex: 'complex'}
+
+def dtype_of_value(val):
+    # Only Python scalars are weak: NumPy scalars such as `np.float64(1)`
+    # subclass `float` but promote like arrays
+    dtype = _PYTHON_SCALAR_DTYPES.get(type(val))
+    if dtype is not None:
+        return dtype
+    dtype = getattr(val, 'dtype', None)
+    if dtype is None:
+        return None
+    return dtype if isinstance(dtype, str) else dtype.name
+
+def promote(*dtypes):
+    if any(d is None for d in dtypes):
+        return None
+
+    strong = [d for d in dtypes if not is_weak(d)]
+    weak = [d for d in dtypes if is_weak(d)]
+    if not weak:
+        if all(d == strong[0] for d in strong):
+            return strong[0]
+    elif all(d == 'bool' for d in strong):
+        # Only Python scalars (and bools): Python promotion rules apply
+        return sorted(weak, key=_WEAK_KIND_ORDER.index)[-1]
+
+    import numpy as np
+    return np.result_type(*strong, *[_WEAK_VALUES[d] for d in weak]).name
+
+def to_float(dtype):
+    '''
+    Result dtype of a floating-point ufunc such as `np.sin` applied to `dtype`.
+    '''
+    if dtype is None:
+        return None
+    k = kind(dtype)
+    if k in 'fc':
+        return dtype
+    if is_weak(dtype):
+        return 'float'
+    import numpy as np
+    size = np.dtype(dtype).itemsize
+    return {1: 'float16', 2: 'float32'}.get(size, 'float64')
+
+def true_divide(left, right):
+    # Unlike the float ufuncs, division computes bools and integers of any
+    # size in float64
+    dtype = promote(left, right)
+    if dtype is None or kind(dtype) in 'fc':
+        return dtype
+    return 'float' if is_weak(dtype) else 'float64'
+
+def uop_generic(a):
+    return a
+
+def binop_generic(op, left, right):
+    if op == 'Div':
+        return true_divide(left, right)
+    result = promote(left, right)
+    if op in ('BitAnd', 'BitOr', 'BitXor') and result is not None and kind(result) not in 'biu':
+        raise TypeError(f"Bitwise operator {op} is not supported for dtype {result}")
+    return result
+
+def compare_generic(left, right):
+    return 'bool'
+
+def ifexp_generic(test, body, orelse):
+    return promote(body, orelse)
+
+def matmul_generic(left, right):
+    return promote(left, right)
+
+def join(left, right):
+    return promote(left, right)
+
+def range(*args):
+    return 'int'
+
+def slice(low, up, step):
+    return None
+
+def subscript(base, indices):
+    return base
+
+def numpy_sin(a):
+    return to_float(a)
+
+def numpy_cos(a):
+    return to_float(a)
+
+def numpy_tan(a):
+    return to_float(a)
+
+def numpy_sinh(a):
+    return to_float(a)
+
+def numpy_cosh(a):
+    return to_float(a)
+
+def numpy_tanh(a):
+    return to_float(a)
+
+def numpy_round(a, decimals=None):
+    return a
+
+def numpy_rint(a):
+    return to_float(a)
+
+def numpy_log(a):
+    return to_float(a)
+
+def numpy_exp(a):
+    return to_float(a)
+
+def numpy_sqrt(a):
+    return to_float(a)
+
+def numpy_pow(a, b):
+    return promote(a, b)
+
+def numpy_power(a, b):
+    return numpy_pow(a, b)
+
+def numpy_add(a, b):
+    return promote(a, b)
+
+def numpy_subtract(a, b):
+    return promote(a, b)
+
+def numpy_multiply(a, b):
+    return promote(a, b)
+
+def numpy_divide(a, b):
+    return true_divide(a, b)
+
+def numpy_minimum(a, b):
+    return promote(a, b)
+
+def numpy_maximum(a, b):
+    return promote(a, b)
+
+def numpy_sum(a, axis=None):
+    if a is None:
+        return None
+    # Bools and integers are accumulated in the 64-bit integer types
+    k = kind(a)
+    if k in 'bi':
+        return 'int64'
+    if k == 'u':
+        return 'uint64'
+    return {'float': 'float64', 'complex': 'complex128'}.get(a, a)
+
+def numpy_min(a, axis=None):
+    return {'int': 'int64', 'float': 'float64', 'complex': 'complex128'}.get(a, a)
+
+def numpy_max(a, axis=None):
+    return numpy_min(a, axis)
+
+def numpy_argmin(a, axis=None):
+    return 'int64'
+
+def numpy_argmax(a, axis=None):
+    return 'int64'
+
+## Built-in functions
+def pow(a, b):
+    return numpy_pow(a, b)
+
+def min(a, b):
+    return promote(a, b)
+
+def max(a, b):
+    return promote(a, b)
+
+def erf(a):
+    return to_float(a)
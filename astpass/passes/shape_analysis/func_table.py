@@ -26,6 +26,19 @@ def matmul_generic(left, right):
         raise RuntimeError(f"Mismatched contracting dimension found for matmul: {left[-1]} and {right[0]}")
     return left[:-1] + right[1:]
 
+def join(left, right):
+    '''
+    Join the shapes a variable has on two control flow paths. Dimensions that
+    differ become None (unknown extent); the ranks must agree.
+    '''
+    if left is None or right is None:
+        return None
+    if left == right:
+        return left
+    if len(left) != len(right):
+        raise RuntimeError(f"Variable has shapes of different ranks on different paths: {left} and {right}")
+    return tuple(l if l == r else None for l, r in zip(left, right))
+
 def range(*args):
     '''
     The shape of range cannot be determined by the shape of its arguments.
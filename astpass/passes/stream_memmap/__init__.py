@@ -0,0 +1,232 @@
+import ast
+from ...array_spec import to_spec
+from ...names import get_names
+from .. import shape_analysis
+from ..shape_analysis import get_dtype
+from ..vector_op_to_loop.convert_reduction_and_pointwise import ReductionAndPWExprToLoop
+from ...visitor import Visitor, Transformer
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+class CollectStreamOperands(Visitor):
+    '''
+    Collects the array operands of a statement and counts the array-valued
+    temporaries its evaluation allocates. Statements that subscript arrays
+    are not streamable and clear `supported`.
+    '''
+    def __init__(self, shape_info):
+        self.shape_info = shape_info
+        self.operands = []
+        self.num_temporaries = 0
+        self.supported = True
+
+    def visit_Name(self, node):
+        shape = self.shape_info[node]
+        if len(shape) > 0 and node.id not in self.operands:
+            self.operands.append(node.id)
+
+    def visit_Subscript(self, node):
+        self.supported = False
+
+    def visit_Call(self, node):
+        for arg in node.args:
+            self.visit(arg)
+        self.count_temporary(node)
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        self.count_temporary(node)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        self.count_temporary(node)
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        self.count_temporary(node)
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        self.count_temporary(node)
+
+    def count_temporary(self, node):
+        if len(self.shape_info[node]) > 0:
+            self.num_temporaries += 1
+
+
+class SliceOperands(Transformer):
+    '''
+    Replaces every array operand `a` with the block `a[lo:hi]`.
+    '''
+    def __init__(self, shape_info, lo, hi):
+        self.shape_info = shape_info
+        self.lo = lo
+        self.hi = hi
+
+    def visit_Call(self, node):
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+    def visit_Name(self, node):
+        if len(self.shape_info[node]) == 0:
+            return node
+        return ast.Subscript(
+            value=ast.Name(id=node.id, ctx=ast.Load()),
+            slice=ast.Slice(
+                lower=ast.Name(id=self.lo, ctx=ast.Load()),
+                upper=ast.Name(id=self.hi, ctx=ast.Load())
+            ),
+            ctx=node.ctx
+        )
+
+
+class StreamMemmapExprs(ReductionAndPWExprToLoop):
+    '''
+    Rewrites whole-array statements over memory-mapped operands into loops
+    over blocks of the leading dimension, e.g. with `a`, `b`, `c` memmaps of
+    shape (N,)::
+
+        c = a + b
+
+    becomes::
+
+        for __blk0 in range(0, N, CHUNK):
+            __blk0_end = min(__blk0 + CHUNK, N)
+            c[__blk0:__blk0_end] = a[__blk0:__blk0_end] + b[__blk0:__blk0_end]
+
+    and `s = np.sum(a * b)` accumulates the per-block partial sums into a
+    reduction variable. `CHUNK` is chosen so that the blocks of all operands
+    and temporaries fit within `memory_budget` bytes.
+    '''
+    def __init__(self, shape_info, runtime_vals, memory_budget, loop_index_prefix=None, names=None):
+        super().__init__(shape_info, loop_index_prefix if loop_index_prefix is not None else "__blk", names)
+        self.runtime_vals = runtime_vals
+        self.memory_budget = memory_budget
+
+    def is_memmap(self, name):
+        # Specs of memmaps, e.g. under batch or tiered compilation, count too
+        return getattr(to_spec(self.runtime_vals.get(name)), 'memmap', False)
+
+    def get_chunk_rows(self, operands, num_temporaries, shape):
+        itemsize = max(to_spec(self.runtime_vals[name]).itemsize for name in operands)
+        row_bytes = itemsize
+        for dim in shape[1:]:
+            row_bytes *= dim
+        num_blocks = len(operands) + num_temporaries
+        return max(1, self.memory_budget // (row_bytes * num_blocks))
+
+    def visit_Assign(self, node):
+        if len(node.targets) != 1:
+            return node
+
+        visitor = CollectStreamOperands(self.shape_info)
+        visitor.visit(node)
+        if not visitor.supported or not any(self.is_memmap(name) for name in visitor.operands):
+            return node
+
+        # Operands that are not runtime arrays, e.g. a new target or an
+        # earlier temporary, cannot be sliced in place
+        shapes = [getattr(self.runtime_vals.get(name), 'shape', None) for name in visitor.operands]
+        if any(s is None for s in shapes):
+            return node
+        if any(s != shapes[0] for s in shapes) or any(not isinstance(d, int) for d in shapes[0]):
+            return node
+
+        target_shape = self.get_node_shape(node.targets[0])
+        is_reduction = (
+            self.is_reduction_call(node.value) and len(node.value.args) == 1
+            and target_shape == ()
+        )
+        if not is_reduction and target_shape != shapes[0]:
+            return node
+
+        num_rows = shapes[0][0]
+        chunk = self.get_chunk_rows(visitor.operands, visitor.num_temporaries, shapes[0])
+        if chunk >= num_rows:
+            return node
+        return self.gen_block_loop(node, num_rows, chunk, is_reduction)
+
+    def gen_block_loop(self, node, num_rows, chunk, is_reduction):
+        index = self.get_new_loop_index()
+        end = self.names.unique(f"{index}_end")
+        bound = ast.Assign(
+            targets=[ast.Name(id=end, ctx=ast.Store())],
+            value=ast.Call(
+                func=ast.Name(id='min', ctx=ast.Load()),
+                args=[
+                    ast.BinOp(left=ast.Name(id=index, ctx=ast.Load()), op=ast.Add(), right=ast.Constant(chunk)),
+                    ast.Constant(num_rows)
+                ],
+                keywords=[]
+            ),
+            lineno=None
+        )
+        loop = ast.For(
+            target=ast.Name(id=index, ctx=ast.Store()),
+            iter=ast.Call(
+                func=ast.Name(id='range', ctx=ast.Load()),
+                args=[ast.Constant(0), ast.Constant(num_rows), ast.Constant(chunk)],
+                keywords=[]
+            ),
+            body=[bound],
+            orelse=[],
+        )
+        ast.copy_location(loop, node)
+        # A convenient attribute for later passes and the runtime
+        loop._stream_chunk = chunk
+
+        slicer = SliceOperands(self.shape_info, index, end)
+        if not is_reduction:
+            loop.body.append(slicer.visit(node))
+            return loop
+
+        reduce_op = self.get_reduce_op(node.value)
+        var = self.get_temp_reduction_var(reduce_op)
+        dtype = get_dtype(self.get_node_shape(node.value.args[0]))
+        node.value.args = [slicer.visit(node.value.args[0])]
+        block_value = ast.Call(func=node.value.func, args=[node.value], keywords=[])
+        loop.body.append(self.rewrite_reduction_assign(reduce_op, var, block_value))
+        loop._reduction = (reduce_op, var)
+        reassign_stmt = ast.copy_location(ast.Assign(
+            targets=[node.targets[0]],
+            value=ast.Name(id=var, ctx=ast.Load()),
+        ), node)
+        return self.gen_initialization(reduce_op, var, dtype), loop, reassign_stmt
+
+
+def transform(tree, runtime_vals, memory_budget=DEFAULT_MEMORY_BUDGET, loop_index_prefix=None, shape_info=None, names=None):
+    '''
+    Lower whole-array statements over `np.memmap` operands into block-wise
+    loops that read, compute and write fixed-size chunks.
+
+    Parameters
+    ----------
+    tree : ast.AST
+        The input Python AST.
+    runtime_vals : dict
+        A mapping from variable names to runtime values, used for shape
+        analysis and to detect memory-mapped operands.
+    memory_budget : int, optional
+        Upper bound in bytes for the blocks of all operands and temporaries
+        that are resident at the same time. Statements that already fit are
+        left unchanged.
+    loop_index_prefix : str, optional
+        Prefix to use for generated block indices. Default is "__blk".
+    shape_info : dict, optional
+        Precomputed result of `shape_analysis.analyze` for `tree`.
+    names : NameGenerator, optional
+        Generator of the new variable names. By default, one is created for
+        `tree`.
+
+    Notes
+    -----
+    Only statements whose array operands, including the target, are runtime
+    arrays with the same static shape are streamed, chunked along the leading
+    dimension.
+    Pointwise statements and full `sum`/`min`/`max` reductions are supported;
+    anything else is left as is.
+    '''
+    if shape_info is None:
+        shape_info = shape_analysis.analyze(tree, runtime_vals)
+    names = get_names(tree, names)
+    return StreamMemmapExprs(shape_info, runtime_vals, memory_budget, loop_index_prefix, names).visit(tree)
@@ -1,15 +1,18 @@
 import ast
+from ..names import get_names
 from ..utils import *
+from ..visitor import Transformer
 
-class BinaryOpToAssign(ast.NodeTransformer):
-    var_count = 0
-
-    def __init__(self):
+class BinaryOpToAssign(Transformer):
+    def __init__(self, names, temps):
         self.stmts = []
+        self.names = names
+        self.temps = temps
 
     def get_new_var(self):
-        BinaryOpToAssign.var_count += 1
-        return '__v%d' % BinaryOpToAssign.var_count
+        var = self.names.fresh('__v', start=1)
+        self.temps.add(var)
+        return var
 
     def visit_Call(self, node):
         self.generic_visit(node)
@@ -57,21 +60,26 @@ class BinaryOpToAssign(ast.NodeTransformer):
         else:
             node.right = newright
 
-        assign = ast.Assign(targets = [ast.Name(id = self.get_new_var(), ctx = ast.Store())], value = node, lineno = node.lineno, col_offset = node.col_offset)
+        assign = ast.copy_location(ast.Assign(targets = [ast.Name(id = self.get_new_var(), ctx = ast.Store())], value = node), node)
         self.stmts.append(assign)
         return assign
 
 
-class ToSingleOperatorStmts(ast.NodeTransformer):
+class ToSingleOperatorStmts(Transformer):
+    def __init__(self, names):
+        self.names = names
+        # The temporaries introduced, for RemoveRedundantAssign
+        self.temps = set()
+
     def visit_Assign(self, node):
         if isinstance(node.value, ast.BinOp):
-            visitor = BinaryOpToAssign()
+            visitor = BinaryOpToAssign(self.names, self.temps)
             assign = visitor.visit(node.value)
             #node.value = assign.targets[0]
             node.value = ast.Name(id = assign.targets[0].id, ctx = ast.Load())
             return visitor.stmts + [node]
         elif isinstance(node.value, ast.Call):
-            visitor = BinaryOpToAssign()
+            visitor = BinaryOpToAssign(self.names, self.temps)
             newargs = [visitor.visit(arg) for arg in node.value.args]
             node.value.args = []
             for newargs in newargs:
@@ -81,7 +89,7 @@ class ToSingleOperatorStmts(ast.NodeTransformer):
                     node.value.args.append(newargs)
             return visitor.stmts + [node]
         elif isinstance(node.value, ast.Tuple):
-            visitor = BinaryOpToAssign()
+            visitor = BinaryOpToAssign(self.names, self.temps)
             newelts = [visitor.visit(arg) for arg in node.value.elts]
             node.value.elts = []
             for newelt in newelts:
@@ -93,22 +101,27 @@ class ToSingleOperatorStmts(ast.NodeTransformer):
         else:
             return node
 
-class ReturnExprToStmt(ast.NodeTransformer):
+class ReturnExprToStmt(Transformer):
+    def __init__(self, names):
+        self.names = names
+
     def visit_Return(self, node):
         if not isinstance(node.value, ast.Name):
-            assign = ast.Assign(targets = [ast.Name(id = '__ret', ctx = ast.Store())], value = node.value, lineno = node.lineno, col_offset = node.col_offset)
-            node.value = ast.Name(id = '__ret', ctx = ast.Load())
+            ret = self.names.unique('__ret')
+            assign = ast.copy_location(ast.Assign(targets = [ast.Name(id = ret, ctx = ast.Store())], value = node.value), node)
+            node.value = ast.Name(id = ret, ctx = ast.Load())
             return [assign] + [node]
         else:
             return node
 
 
-class RemoveRedundantAssign(ast.NodeTransformer):
-    def __init__(self):
+class RemoveRedundantAssign(Transformer):
+    def __init__(self, temps):
         self.prev = None
+        self.temps = temps
 
     def visit_Assign(self, node):
-        if isinstance(node.value, ast.Name) and node.value.id.startswith('__v'):
+        if isinstance(node.value, ast.Name) and node.value.id in self.temps:
             assert self.prev != None and self.prev.targets[0].id == node.value.id
             self.prev.targets[0] = node.targets[0]
             return
@@ -117,8 +130,10 @@ class RemoveRedundantAssign(ast.NodeTransformer):
             return node
 
 
-def transform(tree, **kwargs):
-    tree = ReturnExprToStmt().visit(tree)
-    tree = ToSingleOperatorStmts().visit(tree)
-    tree = RemoveRedundantAssign().visit(tree)
+def transform(tree, names=None, **kwargs):
+    names = get_names(tree, names)
+    tree = ReturnExprToStmt(names).visit(tree)
+    to_single_op = ToSingleOperatorStmts(names)
+    tree = to_single_op.visit(tree)
+    tree = RemoveRedundantAssign(to_single_op.temps).visit(tree)
     return tree
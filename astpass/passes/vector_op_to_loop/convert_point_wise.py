@@ -1,8 +1,10 @@
 import ast
+from ...names import NameGenerator, get_names
 from ...passes.ast_utils import str_to_ast_expr
 from ...passes import shape_analysis
+from ...visitor import Visitor, Transformer
 
-class CollectNonzeroShapes(ast.NodeVisitor):
+class CollectNonzeroShapes(Visitor):
     def __init__(self, shape_info):
         self.shape_info = shape_info
         self.nonzero_shapes = []
@@ -28,7 +30,7 @@ class CollectNonzeroShapes(ast.NodeVisitor):
         if len(shape) > 0:
             self.nonzero_shapes.append(shape)
 
-class Scalarize(ast.NodeTransformer):
+class Scalarize(Transformer):
     def __init__(self, shape_info, idx):
         self.shape_info = shape_info
         self.idx = idx
@@ -76,11 +78,11 @@ class Scalarize(ast.NodeTransformer):
             )
 
 
-class PointwiseExprToLoop(ast.NodeTransformer):
-    def __init__(self, shape_info, loop_index_prefix=None):
+class PointwiseExprToLoop(Transformer):
+    def __init__(self, shape_info, loop_index_prefix=None, names=None):
         self.shape_info = shape_info
         self.loop_index_prefix = loop_index_prefix if loop_index_prefix is not None else "__i"
-        self.loop_index_count = 0
+        self.names = names if names is not None else NameGenerator()
 
     def get_node_shape(self, node):
         if node not in self.shape_info:
@@ -88,9 +90,7 @@ class PointwiseExprToLoop(ast.NodeTransformer):
         return self.shape_info[node]
 
     def get_new_loop_index(self):
-        name = f"{self.loop_index_prefix}{self.loop_index_count}"
-        self.loop_index_count += 1
-        return name
+        return self.names.fresh(self.loop_index_prefix)
 
     def get_loop_bounds(self, shapes):
         if not all([s == shapes[0] for s in shapes]):
@@ -121,7 +121,7 @@ class PointwiseExprToLoop(ast.NodeTransformer):
 
     def gen_loop(self, node, low, up):
         index = self.get_new_loop_index()
-        loop = ast.For(
+        loop = ast.copy_location(ast.For(
             target=ast.Name(id=index, ctx=ast.Store()),
             iter=ast.Call(
                 func=ast.Name(id='range', ctx=ast.Load()),
@@ -133,11 +133,10 @@ class PointwiseExprToLoop(ast.NodeTransformer):
             ),
             body=[Scalarize(self.shape_info, index).visit(node)],
             orelse=[],
-            lineno=node.lineno
-        )
+        ), node)
         return loop
 
-def transform(tree, runtime_vals, loop_index_prefix=None):
+def transform(tree, runtime_vals, loop_index_prefix=None, shape_info=None, names=None):
     '''
     This pass detects and rewrites tensor expressions to explicit loops.
 
@@ -147,5 +146,6 @@ def transform(tree, runtime_vals, loop_index_prefix=None):
     the loops, no memory allocations will be performed. In other words, all variables
     appeared in the input code should already be defined.
     '''
-    shape_info = shape_analysis.analyze(tree, runtime_vals)
-    return PointwiseExprToLoop(shape_info, loop_index_prefix).visit(tree)
\ No newline at end of file
+    if shape_info is None:
+        shape_info = shape_analysis.analyze(tree, runtime_vals)
+    return PointwiseExprToLoop(shape_info, loop_index_prefix, get_names(tree, names)).visit(tree)
\ No newline at end of file
@@ -1,12 +1,14 @@
 import ast
 from .. import shape_analysis
-from ...passes.ast_utils import is_call, str_to_ast_expr
+from ...names import get_names
+from ..shape_analysis import dtype_table, get_dtype
+from ...passes.ast_utils import StructKey, is_call, str_to_ast_expr
 from .convert_point_wise import PointwiseExprToLoop, Scalarize
 
 class ReductionAndPWExprToLoop(PointwiseExprToLoop):
-    def get_reduce_op(self, call_node: ast.Call):
-        func = ast.unparse(call_node.func)
-        table = {
+    reduce_op_table = {
+        StructKey(str_to_ast_expr(func)): op
+        for func, op in {
             'sum': 'sum',
             'min': 'min',
             'max': 'max',
@@ -16,13 +18,24 @@ class ReductionAndPWExprToLoop(PointwiseExprToLoop):
             'torch.sum': 'sum',
             'torch.min': 'min',
             'torch.max': 'max',
-        }
-        return table[func]
+        }.items()
+    }
+
+    def get_reduce_op(self, call_node: ast.Call):
+        return self.reduce_op_table[StructKey(call_node.func)]
     
-    def gen_initialization(self, reduce_op, var):
+    def gen_initialization(self, reduce_op, var, dtype=None):
+        '''
+        Generate the initialisation of the reduction variable. If the dtype of
+        the reduced operand is known, integer reductions start from an integer
+        identity so they are not promoted to float.
+        '''
+        is_int = dtype is not None and dtype_table.kind(dtype) in 'biu'
         value = None
         if reduce_op == 'sum':
-            value = ast.Constant(0.0)
+            value = ast.Constant(0 if is_int else 0.0)
+        elif reduce_op in ('max', 'min') and is_int:
+            value = ast.Constant(self.get_int_bound(reduce_op, dtype))
         elif reduce_op == 'max':
             value = str_to_ast_expr("float('-inf')")
         elif reduce_op == 'min':
@@ -36,6 +49,13 @@ class ReductionAndPWExprToLoop(PointwiseExprToLoop):
             lineno=None
         )
     
+    def get_int_bound(self, reduce_op, dtype):
+        if dtype_table.is_weak(dtype) or dtype == 'bool':
+            dtype = 'int64'
+        import numpy as np
+        info = np.iinfo(dtype)
+        return int(info.min) if reduce_op == 'max' else int(info.max)
+
     def rewrite_reduction_assign(self, reduce_op, var, orig_value):
         value = None
         if reduce_op == 'sum':
@@ -71,9 +91,12 @@ class ReductionAndPWExprToLoop(PointwiseExprToLoop):
         )
 
     def get_temp_reduction_var(self, reduce_op):
-        return f"__reduce_{reduce_op}_var"
+        return self.names.unique(f"__reduce_{reduce_op}_var")
 
     def gen_loop(self, node: ast.Assign, low: int|str, up: int|str):
+        if self.is_reduction_call(node.value):
+            # Look up the operand dtype before the loop body is scalarized
+            dtype = get_dtype(self.get_node_shape(node.value.args[0]))
         loop = super().gen_loop(node, low, up)
         # A convenient attribute for APPy
         loop._simd_okay = True
@@ -82,20 +105,19 @@ class ReductionAndPWExprToLoop(PointwiseExprToLoop):
             if len(self.get_node_shape(node.targets[0])) > 0:
                 raise RuntimeError(f"Only 1D array reduction is supported, but got target: {ast.dump(node.targets[0])}")
             var = self.get_temp_reduction_var(reduce_op)
-            init_stmt = self.gen_initialization(reduce_op, var)
+            init_stmt = self.gen_initialization(reduce_op, var, dtype)
             loop.body = [self.rewrite_reduction_assign(reduce_op, var, node.value)]
-            reassign_stmt = ast.Assign(
+            reassign_stmt = ast.copy_location(ast.Assign(
                 targets=[node.targets[0]],
                 value=ast.Name(id=var, ctx=ast.Load()),
-                lineno=node.lineno
-            )
+            ), node)
             # A convenient attribute for APPy
             loop._reduction = (reduce_op, var)
             return init_stmt, loop, reassign_stmt
         else:
             return loop
     
-def transform(tree, runtime_vals, loop_index_prefix=None):
+def transform(tree, runtime_vals, loop_index_prefix=None, shape_info=None, names=None):
     """
     Detect and rewrite tensor expressions into explicit loops.
 
@@ -112,6 +134,12 @@ def transform(tree, runtime_vals, loop_index_prefix=None):
         analysis.
     loop_index_prefix : str, optional
         Prefix to use for generated loop indices.
+    shape_info : dict, optional
+        Precomputed result of `shape_analysis.analyze` for `tree`, e.g. a
+        cached analysis from a `PassManager`.
+    names : NameGenerator, optional
+        Generator of the new variable names. By default, one is created for
+        `tree`.
 
     Examples
     --------
@@ -139,5 +167,6 @@ def transform(tree, runtime_vals, loop_index_prefix=None):
     to be already defined. If the input code inherently requires memory
     allocation for intermediate results, an exception will be raised.
     """
-    shape_info = shape_analysis.analyze(tree, runtime_vals)
-    return ReductionAndPWExprToLoop(shape_info, loop_index_prefix).visit(tree)
+    if shape_info is None:
+        shape_info = shape_analysis.analyze(tree, runtime_vals)
+    return ReductionAndPWExprToLoop(shape_info, loop_index_prefix, get_names(tree, names)).visit(tree)
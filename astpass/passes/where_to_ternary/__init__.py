@@ -1,6 +1,7 @@
 import ast
+from ...visitor import Transformer
 
-class WhereToTernary(ast.NodeTransformer):
+class WhereToTernary(Transformer):
     def visit_Call(self, node):
         func = node.func
         if (
@@ -12,12 +13,11 @@ class WhereToTernary(ast.NodeTransformer):
              and func.value.id in ['np', 'numpy', 'torch', 'cupy'])
         ):
             assert len(node.args) == 3, f"where should have 3 arguments, but got {len(node.args)}"
-            return ast.IfExp(
+            return ast.copy_location(ast.IfExp(
                 test=node.args[0],
                 body=node.args[1],
                 orelse=node.args[2],
-                lineno=node.lineno
-            )
+            ), node)
         return node
 
 def transform(node):
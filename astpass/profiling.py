@@ -0,0 +1,257 @@
+'''
+Instrumentation of pass invocations.
+
+Instrumented code (`PassManager`, the code and transform caches) reports an
+event for every pass, analysis, parse, unparse and load it performs. Events
+are only collected while a `Profile` is active, either for a block of code::
+
+    with profiling.profile(memory=True) as prof:
+        tree = pm.run(tree, runtime_vals)
+    print(prof.summary())
+    prof.save_chrome_trace("compile.json")
+
+or process-wide with `install`, e.g. to stream events to a callback in
+production. When no profile is active, instrumented code only pays for one
+context variable lookup per operation.
+
+Each event records the wall time and, optionally, the number of AST nodes
+before and after, the memory allocated and the peak memory (with
+`memory=True`, through `tracemalloc`), and whether the result was served from
+a cache.
+'''
+import ast
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+_current = contextvars.ContextVar('astpass_profile', default=None)
+_installed = None
+
+
+def active():
+    '''
+    Return the profile collecting events in this context, or None.
+    '''
+    prof = _current.get()
+    return prof if prof is not None else _installed
+
+
+def count_nodes(tree):
+    if isinstance(tree, list):
+        return sum(count_nodes(node) or 0 for node in tree)
+    if not isinstance(tree, ast.AST):
+        return None
+    return sum(1 for _ in ast.walk(tree))
+
+
+class Event:
+    '''
+    One instrumented operation. Times are in seconds on the
+    `time.perf_counter` clock, memory in bytes. Fields that were not measured
+    are None.
+    '''
+    __slots__ = ('name', 'category', 'start', 'duration', 'nodes_in', 'nodes_out',
+                 'allocated', 'peak', 'cache', 'thread', 'output')
+
+    def __init__(self, name, category, start, thread, cache=None):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = 0.0
+        self.nodes_in = None
+        self.nodes_out = None
+        self.allocated = None
+        self.peak = None
+        self.cache = cache
+        self.thread = thread
+        self.output = None
+
+    def set_output(self, tree):
+        '''
+        Record the tree the operation produced, for the output node count.
+        '''
+        self.output = tree
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__ if slot != 'output'}
+
+    def __repr__(self):
+        return f"Event({self.category}:{self.name}, {self.duration * 1000:.3f} ms)"
+
+
+class Profile:
+    '''
+    Collects the events of instrumented operations.
+
+    Parameters
+    ----------
+    memory : bool, optional
+        Measure allocations with `tracemalloc`, which is started if needed.
+        This slows down the profiled code considerably.
+    nodes : bool, optional
+        Count the nodes of the input and output trees of every pass.
+    callback : callable, optional
+        Called with every finished `Event`.
+    keep_events : bool, optional
+        Keep the events in `events`. Disable it for long-running profiles
+        that only feed a callback.
+    '''
+    def __init__(self, memory=False, nodes=True, callback=None, keep_events=True):
+        self.memory = memory
+        self.nodes = nodes
+        self.callback = callback
+        self.keep_events = keep_events
+        self.events = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started_tracemalloc = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+    def stop(self):
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    @contextlib.contextmanager
+    def record(self, name, category, tree=None, cache=None):
+        '''
+        Time the enclosed block as one event. `tree` is the input of the
+        operation; call `set_output` on the yielded event to record its output.
+        '''
+        event = Event(name, category, 0.0, threading.get_ident(), cache)
+        if self.nodes and tree is not None:
+            event.nodes_in = count_nodes(tree)
+
+        # Nested events reset the tracemalloc peak, so each event propagates
+        # its absolute peak to the enclosing one
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        tracing = self.memory and tracemalloc.is_tracing()
+        if tracing:
+            mem_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        frame = [0]
+        stack.append(frame)
+        event.start = time.perf_counter()
+        try:
+            yield event
+        finally:
+            event.duration = time.perf_counter() - event.start
+            stack.pop()
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame[0])
+                event.allocated = current - mem_before
+                event.peak = peak - mem_before
+                if stack:
+                    stack[-1][0] = max(stack[-1][0], peak)
+            if self.nodes and event.output is not None:
+                event.nodes_out = count_nodes(event.output)
+                event.output = None
+            self.add(event)
+
+    def add(self, event):
+        if self.keep_events:
+            with self.lock:
+                self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+
+    def count(self, name, category, cache):
+        '''
+        Record an operation that was not timed, e.g. a cache hit.
+        '''
+        self.add(Event(name, category, time.perf_counter(), threading.get_ident(), cache))
+
+    def summary(self):
+        '''
+        Return a table of the total time, count and cache hits per operation.
+        '''
+        totals = {}
+        for e in self.events:
+            key = (e.category, e.name)
+            count, hits, seconds, allocated = totals.get(key, (0, 0, 0.0, 0))
+            totals[key] = (count + 1, hits + (e.cache == 'hit'), seconds + e.duration,
+                           allocated + (e.allocated or 0))
+        lines = [f"{'operation':<48} {'calls':>6} {'hits':>6} {'time':>13} {'allocated':>12}"]
+        for (category, name), (count, hits, seconds, allocated) in \
+                sorted(totals.items(), key=lambda item: -item[1][2]):
+            lines.append(f"{category + ':' + name:<48} {count:6d} {hits:6d} "
+                         f"{seconds * 1000:10.3f} ms {allocated / 1024:9.1f} KiB")
+        return "\n".join(lines)
+
+    def to_json(self):
+        return json.dumps([e.to_dict() for e in self.events], indent=1)
+
+    def to_chrome_trace(self):
+        '''
+        Return the events in the Chrome trace event format, which can be
+        opened in chrome://tracing or Perfetto.
+        '''
+        pid = os.getpid()
+        events = []
+        for e in self.events:
+            args = {k: v for k, v in e.to_dict().items()
+                    if k not in ('name', 'category', 'start', 'duration', 'thread') and v is not None}
+            events.append({
+                'name': e.name, 'cat': e.category, 'ph': 'X',
+                'ts': e.start * 1e6, 'dur': e.duration * 1e6,
+                'pid': pid, 'tid': e.thread, 'args': args,
+            })
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+    def save_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            f.write(self.to_chrome_trace())
+
+
+@contextlib.contextmanager
+def profile(memory=False, nodes=True, callback=None):
+    '''
+    Collect the events of the enclosed block, in the current thread or
+    asyncio task, into a new `Profile`, which is returned.
+    '''
+    prof = Profile(memory, nodes, callback)
+    prof.start()
+    token = _current.set(prof)
+    try:
+        yield prof
+    finally:
+        _current.reset(token)
+        prof.stop()
+
+
+def install(prof):
+    '''
+    Make `prof` collect events in every thread that has no active
+    `profile()` block. Pass None to uninstall it.
+    '''
+    global _installed
+    if _installed is not None:
+        _installed.stop()
+    _installed = prof
+    if prof is not None:
+        prof.start()
+
+
+@contextlib.contextmanager
+def record(name, category, tree=None, cache=None):
+    '''
+    Record the enclosed block in the active profile, if any. Yields the event,
+    or None when profiling is disabled.
+    '''
+    prof = active()
+    if prof is None:
+        yield None
+        return
+    with prof.record(name, category, tree, cache) as event:
+        yield event
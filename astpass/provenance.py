@@ -0,0 +1,159 @@
+'''
+Source locations and provenance of generated nodes.
+
+Transforms replace nodes of the user's code with new ones, e.g.
+`vector_op_to_loop` replaces `c[:] = a + b` with a loop. The passes copy the
+source span of the node they replace to the node they return, and at the end
+of a run `PassManager` gives every node still without a location the span of
+its nearest located ancestor, so every node of a transformed tree points back
+into the original source.
+
+With `PassManager(pipeline, provenance=True)`, the manager also records which
+pass created each node in a `Provenance` table. `line_map` relates the lines
+of the unparsed output to the original lines, which lets profilers report
+samples of generated code against the user's source::
+
+    pm = PassManager(['vector_op_to_loop'], provenance=True)
+    tree = pm.run(tree, runtime_vals)
+    for out_line, (line, pass_name) in pm.provenance.line_map(tree).items():
+        ...
+'''
+import ast
+from .visitor import get_fields
+
+LOCATION_ATTRS = ('lineno', 'col_offset', 'end_lineno', 'end_col_offset')
+
+# Nodes that make up the blocks of statements
+_BLOCK_TYPES = (ast.stmt, ast.excepthandler, ast.match_case)
+
+
+def has_location(node):
+    return getattr(node, 'lineno', None) is not None
+
+
+def span(node):
+    return tuple(getattr(node, attr, None) for attr in LOCATION_ATTRS)
+
+
+def propagate_locations(node, source=None):
+    '''
+    Give every node below `node` (inclusive) without a location the location
+    of its nearest located ancestor, or of `source` if none is located.
+    Unlike `ast.fix_missing_locations`, a `lineno` of None counts as missing.
+    '''
+    loc = source if source is not None and has_location(source) else None
+    stack = [(node, loc)]
+    push = stack.append
+    while stack:
+        n, loc = stack.pop()
+        if 'lineno' in n._attributes:
+            if getattr(n, 'lineno', None) is None:
+                if loc is not None:
+                    for attr in LOCATION_ATTRS:
+                        setattr(n, attr, getattr(loc, attr, None))
+            else:
+                loc = n
+        # Inlined `ast.iter_child_nodes`, which dominates the cost on large
+        # trees; the shared `Load`/`Store` contexts have no location
+        for field in get_fields(n.__class__):
+            value = getattr(n, field, None)
+            if isinstance(value, list):
+                for child in value:
+                    if isinstance(child, ast.AST):
+                        push((child, loc))
+            elif isinstance(value, ast.AST) and not isinstance(value, ast.expr_context):
+                push((value, loc))
+    return node
+
+
+class Origin:
+    '''
+    Where a node of a transformed tree comes from: the nodes of the original
+    tree with the same source span (most specific first), and the pass that
+    created it, or None if it is a node of the original tree.
+    '''
+    __slots__ = ('nodes', 'pass_name')
+
+    def __init__(self, nodes, pass_name):
+        self.nodes = nodes
+        self.pass_name = pass_name
+
+    @property
+    def lineno(self):
+        return self.nodes[0].lineno if self.nodes else None
+
+    def __repr__(self):
+        return f"Origin(line {self.lineno}, pass={self.pass_name!r})"
+
+
+class Provenance:
+    '''
+    Table from the nodes of a transformed tree to their `Origin`.
+
+    Parameters
+    ----------
+    tree : ast.AST
+        The original tree, before any pass ran.
+    '''
+    def __init__(self, tree):
+        self.spans = {}
+        for node in ast.walk(tree):
+            if has_location(node):
+                self.spans.setdefault(span(node), []).append(node)
+        self.created = {}
+
+    def snapshot(self, tree):
+        # Keep the nodes alive so that their ids are not reused
+        return {id(node): node for node in ast.walk(tree)}
+
+    def record(self, tree, before, pass_name):
+        '''
+        Attribute the nodes of `tree` that are not in the snapshot `before`
+        to `pass_name`, and give them locations.
+        '''
+        propagate_locations(tree)
+        for node in ast.walk(tree):
+            if id(node) not in before and node not in self.created:
+                self.created[node] = pass_name
+
+    def origin(self, node):
+        nodes = self.spans.get(span(node), [])
+        # Prefer original nodes of the same type, e.g. the statement rather
+        # than the expression of an expression statement
+        nodes = sorted(nodes, key=lambda n: type(n) is not type(node))
+        return Origin(nodes, self.created.get(node))
+
+    def line_map(self, tree, src=None):
+        '''
+        Map each line of `src`, the unparsed `tree` (computed if not given),
+        that starts a statement to `(original line, pass name)`.
+        '''
+        if src is None:
+            src = ast.unparse(tree)
+        line_map = {}
+        for node, out in paired_statements(tree, ast.parse(src)):
+            if out.lineno not in line_map:
+                line_map[out.lineno] = (getattr(node, 'lineno', None), self.created.get(node))
+        return line_map
+
+
+def paired_statements(tree, reparsed):
+    '''
+    Yield the statements of `tree` with the matching statements of
+    `reparsed`, its unparsed source parsed again. Only statement lists are
+    paired: unparsing does not round-trip every expression, e.g. a constant
+    tuple comes back as a `Tuple` of constants.
+    '''
+    for field in get_fields(type(tree)):
+        body = getattr(tree, field, None)
+        if not isinstance(body, list) or not body or not isinstance(body[0], _BLOCK_TYPES):
+            continue
+        out_body = getattr(reparsed, field, None)
+        if not isinstance(out_body, list) or len(body) != len(out_body):
+            raise ValueError(f"The source does not match the tree at {type(tree).__name__}.{field}")
+        for node, out in zip(body, out_body):
+            if type(node) is not type(out):
+                raise ValueError(f"The source has {type(out).__name__} where the tree has {type(node).__name__}")
+            if isinstance(node, ast.stmt):
+                yield node, out
+            yield from paired_statements(node, out)
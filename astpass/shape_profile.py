@@ -0,0 +1,183 @@
+'''
+Histograms of the arguments a wrapped function is called with.
+
+A `ShapeProfile` attached to a `jit` dispatcher counts the combinations of
+argument shapes, dtypes and types it sees, and the most frequent values of
+scalar arguments. The signatures worth specializing are then selected from the
+histogram, and the profile can be saved and loaded to pre-compile them in the
+next process before traffic arrives::
+
+    @astpass.jit(profile=True)
+    def kernel(a, n): ...
+
+    ...                                  # serve traffic
+    kernel.profile.save("kernel.profile.json")
+
+    # Next deploy
+    @astpass.jit(profile=ShapeProfile.load("kernel.profile.json"))
+    def kernel(a, n): ...
+
+    kernel.warm()                        # compile the hot signatures now
+
+Recording one call costs a counter increment for the signature, which the
+dispatcher computes anyway, plus one per scalar argument. Counts are
+approximate when several threads call the function at once.
+'''
+import json
+import os
+import tempfile
+from collections import Counter
+
+from .array_spec import ArraySpec
+
+_SCALAR_TYPES = {'int': int, 'float': float, 'bool': bool, 'complex': complex}
+
+
+def arg_signature(entry):
+    '''
+    The signature string of one entry of a dispatcher key: the spec signature
+    of arrays, e.g. 'float64[8]', and the type name of other values.
+    '''
+    if isinstance(entry, tuple):
+        if isinstance(entry[0], tuple):
+            return ArraySpec(entry[0], entry[1]).signature()
+        # A scalar specialized on its value
+        entry = entry[0]
+    return entry.__name__
+
+
+class ShapeProfile:
+    '''
+    Histogram of the call signatures and scalar argument values of a function.
+
+    Parameters
+    ----------
+    params : list of str, optional
+        Parameter names of the function; set by the dispatcher if omitted.
+    max_values : int, optional
+        Number of distinct values tracked per scalar parameter. Values first
+        seen after that are only counted as 'other'.
+    sample_every : int, optional
+        Record only one call in this many.
+    '''
+    def __init__(self, params=None, max_values=32, sample_every=1):
+        self.params = list(params) if params is not None else None
+        self.max_values = max_values
+        self.sample_every = sample_every
+        self.calls = 0
+        self.keys = Counter()
+        self.loaded = Counter()
+        self.values = {}
+        self.other_values = Counter()
+
+    def record(self, key, args):
+        self.calls += 1
+        if self.calls % self.sample_every:
+            return
+        self.keys[key] += 1
+        for i, arg in enumerate(args):
+            if type(arg) in (int, float, bool):
+                counts = self.values.get(i)
+                if counts is None:
+                    counts = self.values[i] = Counter()
+                if arg in counts or len(counts) < self.max_values:
+                    counts[arg] += 1
+                else:
+                    self.other_values[i] += 1
+
+    def signatures(self):
+        '''
+        Return a Counter of signatures, tuples with the signature string of
+        each argument, including those of a loaded profile.
+        '''
+        counts = Counter(self.loaded)
+        for key, n in self.keys.items():
+            counts[tuple(arg_signature(entry) for entry in key)] += n
+        return counts
+
+    def hot_values(self, param, min_fraction=0.1):
+        '''
+        The values of the scalar parameter `param` seen in at least
+        `min_fraction` of the recorded calls, most frequent first.
+        '''
+        counts = self.values.get(self.params.index(param), Counter())
+        total = sum(counts.values()) + self.other_values[self.params.index(param)]
+        return [v for v, n in counts.most_common() if total and n / total >= min_fraction]
+
+    def select(self, max_signatures=4, min_fraction=0.01):
+        '''
+        The most frequent signatures, at most `max_signatures` of them, that
+        account for at least `min_fraction` of the recorded calls each.
+        '''
+        counts = self.signatures()
+        total = sum(counts.values())
+        return [sig for sig, n in counts.most_common(max_signatures) if n / total >= min_fraction]
+
+    def example(self, sig):
+        '''
+        Arguments matching the signature `sig`: specs for arrays, and the most
+        frequent recorded value (or zero) for scalars. Returns None if an
+        argument cannot be rebuilt from its signature.
+        '''
+        args = []
+        for i, s in enumerate(sig):
+            if s in _SCALAR_TYPES:
+                counts = self.values.get(i)
+                hot = [v for v, _ in counts.most_common() if type(v) is _SCALAR_TYPES[s]] if counts else []
+                args.append(hot[0] if hot else _SCALAR_TYPES[s]())
+            else:
+                try:
+                    args.append(ArraySpec.from_signature(s))
+                except (ValueError, TypeError):
+                    return None
+        return tuple(args)
+
+    def runtime_vals(self, sig):
+        '''
+        The runtime values of the signature `sig`, e.g. for
+        `multiversion.transform`.
+        '''
+        args = self.example(sig)
+        return None if args is None else dict(zip(self.params, args))
+
+    ## Serialization
+
+    def to_dict(self):
+        values = {}
+        for i, counts in self.values.items():
+            values[self.params[i]] = [[v, n] for v, n in counts.most_common()]
+        return {
+            'params': self.params,
+            'calls': self.calls,
+            'signatures': [{'args': list(sig), 'count': n} for sig, n in self.signatures().most_common()],
+            'values': values,
+        }
+
+    @classmethod
+    def from_dict(cls, d, max_values=32, sample_every=1):
+        profile = cls(d['params'], max_values, sample_every)
+        profile.calls = d.get('calls', 0)
+        for entry in d['signatures']:
+            profile.loaded[tuple(entry['args'])] += entry['count']
+        for param, pairs in d.get('values', {}).items():
+            profile.values[profile.params.index(param)] = Counter({v: n for v, n in pairs})
+        return profile
+
+    def save(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.profile-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=1)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path, **options):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f), **options)
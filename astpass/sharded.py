@@ -0,0 +1,464 @@
+import ast
+import hashlib
+import importlib
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from .names import NameGenerator
+from .passes.ast_utils import StructKey
+from .visitor import Visitor
+
+# Reduction statements recognised inside a parallel loop body, mapped to the
+# identity each shard starts from and the function that merges two partials.
+_REDUCE_IDENTITY = {
+    'sum': 0,
+    'prod': 1,
+    'max': float('-inf'),
+    'min': float('inf'),
+}
+
+_REDUCE_MERGE = {
+    'sum': lambda a, b: a + b,
+    'prod': lambda a, b: a * b,
+    'max': max,
+    'min': min,
+}
+
+# Per-worker-process state, reused across tasks so that repeated calls do not
+# recompile the shard function or re-attach the shared memory segments.
+_worker_funcs = {}
+_worker_segments = {}
+
+
+def is_parallel_loop(node):
+    '''
+    A loop is parallel if a pass marked it so (`_simd_okay` set by
+    `vector_op_to_loop`, or `_parallel`), or if it iterates over `prange(...)`.
+    '''
+    if not isinstance(node, ast.For):
+        return False
+    if getattr(node, '_parallel', False) or getattr(node, '_simd_okay', False):
+        return True
+    return (
+        isinstance(node.iter, ast.Call)
+        and isinstance(node.iter.func, ast.Name)
+        and node.iter.func.id == 'prange'
+    )
+
+
+_REDUCE_BINOPS = {ast.Add: 'sum', ast.Mult: 'prod'}
+
+
+def loads_name(node, name):
+    return any(isinstance(n, ast.Name) and n.id == name for n in ast.walk(node))
+
+
+def get_reduction(stmt):
+    '''
+    Return `(reduce_op, var, operand)` if `stmt` is a scalar reduction update
+    of the form `x = x + e`, `x = e + x`, `x += e`, their products,
+    `x = max(x, e)` or `x = min(x, e)` (in either argument order), where `e`
+    does not read `x`, else None.
+    '''
+    if isinstance(stmt, ast.AugAssign) and isinstance(stmt.target, ast.Name):
+        reduce_op = _REDUCE_BINOPS.get(type(stmt.op))
+        var = stmt.target.id
+        if reduce_op is None or loads_name(stmt.value, var):
+            return None
+        return reduce_op, var, stmt.value
+
+    if not (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1
+            and isinstance(stmt.targets[0], ast.Name)):
+        return None
+
+    var = stmt.targets[0].id
+    value = stmt.value
+    if isinstance(value, ast.BinOp) and type(value.op) in _REDUCE_BINOPS:
+        reduce_op, operands = _REDUCE_BINOPS[type(value.op)], [value.left, value.right]
+    elif (
+        isinstance(value, ast.Call) and isinstance(value.func, ast.Name)
+        and value.func.id in ('max', 'min') and len(value.args) == 2 and not value.keywords
+    ):
+        reduce_op, operands = value.func.id, list(value.args)
+    else:
+        return None
+    for i, operand in enumerate(operands):
+        other = operands[1 - i]
+        if isinstance(operand, ast.Name) and operand.id == var and not loads_name(other, var):
+            return reduce_op, var, other
+    return None
+
+
+class CollectLoopNames(Visitor):
+    '''
+    Collects the names a parallel loop body reads, the arrays it writes and the
+    scalar reductions it performs, and the scalars carried from one iteration
+    to the next in any other way: those read before they are written, and
+    reduction variables read outside their updates.
+    '''
+    def __init__(self):
+        self.loaded = []
+        self.written_arrays = []
+        self.reductions = {}
+        self.assigned = set()
+        self.exposed = set()
+
+    @property
+    def carried(self):
+        return self.exposed & self.assigned
+
+    def visit_Name(self, node):
+        if isinstance(getattr(node, 'ctx', None), ast.Load):
+            self.load(node.id)
+        else:
+            self.assigned.add(node.id)
+
+    def load(self, name):
+        if name not in self.loaded:
+            self.loaded.append(name)
+        if name not in self.assigned or name in self.reductions:
+            self.exposed.add(name)
+
+    def visit_Assign(self, node):
+        # The value is evaluated before the targets are stored
+        red = self.record_reduction(node)
+        self.visit(red[2] if red is not None else node.value)
+        for target in node.targets:
+            self.record_written(target)
+            self.visit_target(target, red is None)
+
+    def visit_AugAssign(self, node):
+        red = self.record_reduction(node)
+        if red is None and isinstance(node.target, ast.Name):
+            self.load(node.target.id)
+        self.visit(node.value)
+        self.record_written(node.target)
+        self.visit_target(node.target, red is None)
+
+    def visit_target(self, target, overwrites=True):
+        if isinstance(target, ast.Name):
+            if overwrites and target.id in self.reductions:
+                # A reduction variable overwritten by another statement
+                self.exposed.add(target.id)
+            self.assigned.add(target.id)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self.visit_target(elt, overwrites)
+        else:
+            self.visit(target)
+
+    def record_written(self, target):
+        # Generated subscript targets do not always carry a Store context, so
+        # look at the assignment target position instead
+        if isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+            if target.value.id not in self.written_arrays:
+                self.written_arrays.append(target.value.id)
+
+    def record_reduction(self, node):
+        red = get_reduction(node)
+        if red is None:
+            return None
+        reduce_op, var, _ = red
+        if var in self.assigned and var not in self.reductions:
+            # Reset earlier in the iteration, so private to it
+            return None
+        if self.reductions.get(var, reduce_op) != reduce_op:
+            raise RuntimeError(f"Variable {var} is reduced with more than one operator")
+        self.reductions[var] = reduce_op
+        return red
+
+
+def gen_shard_func(loop, func_name, params, reductions, bounds=('__lo', '__hi', '__step')):
+    '''
+    Outline the body of `loop` into a function that runs the iterations
+    `range(lo, hi, step)`, with the names given in `bounds`, and returns the
+    partial value of each reduction.
+    '''
+    body = [
+        ast.Assign(
+            targets=[ast.Name(id=var, ctx=ast.Store())],
+            value=ast.Constant(_REDUCE_IDENTITY[op])
+        )
+        for var, op in reductions.items()
+    ]
+    body.append(ast.For(
+        target=loop.target,
+        iter=ast.Call(
+            func=ast.Name(id='range', ctx=ast.Load()),
+            args=[ast.Name(id=n, ctx=ast.Load()) for n in bounds],
+            keywords=[]
+        ),
+        body=loop.body,
+        orelse=[]
+    ))
+    body.append(ast.Return(value=ast.Tuple(
+        elts=[ast.Name(id=var, ctx=ast.Load()) for var in reductions],
+        ctx=ast.Load()
+    )))
+    func = ast.FunctionDef(
+        name=func_name,
+        args=ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(arg=a) for a in list(bounds) + params],
+            kwonlyargs=[], kw_defaults=[], defaults=[]
+        ),
+        body=body,
+        decorator_list=[]
+    )
+    module = ast.Module(body=[func], type_ignores=[])
+    ast.fix_missing_locations(module)
+    return ast.unparse(module)
+
+
+def _attach_array(spec):
+    import numpy as np
+    seg_name, shape, dtype = spec
+    shm = _worker_segments.get(seg_name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=seg_name)
+        _worker_segments[seg_name] = shm
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _run_shard(src, func_name, arrays, scalars, modules, lo, hi, step):
+    '''
+    Task executed in a worker process. Arrays arrive as shared memory segment
+    descriptors, everything else is passed by value.
+    '''
+    key = hashlib.sha256(src.encode()).hexdigest()
+    func = _worker_funcs.get(key)
+    if func is None:
+        ns = {}
+        exec(compile(src, f"<astpass-shard-{key[:12]}>", "exec"), ns)
+        func = _worker_funcs[key] = ns[func_name]
+
+    args = []
+    for name in func.__code__.co_varnames[3:func.__code__.co_argcount]:
+        if name in arrays:
+            args.append(_attach_array(arrays[name]))
+        elif name in modules:
+            args.append(importlib.import_module(modules[name]))
+        else:
+            args.append(scalars[name])
+    return func(lo, hi, step, *args)
+
+
+class ShardedExecutor:
+    '''
+    Executes statement-level code (e.g. the output of `vector_op_to_loop`) and
+    runs every parallel loop in it as slices of its iteration space on a
+    `ProcessPoolExecutor`.
+
+    Array operands are placed in `multiprocessing.shared_memory` segments
+    instead of being pickled. Output arrays are written in place by the
+    workers and copied back, and scalar reductions (sums, products, `max` and
+    `min`, see `get_reduction`) are merged from the per-shard partials. Other
+    scalars assigned inside a parallel loop are private to each shard, unless
+    the loop reads them before writing them: such loops carry a value from one
+    iteration to the next and run sequentially instead.
+
+    The pool and the shared segments are kept alive across calls to `run`;
+    call `close` (or use the executor as a context manager) to release them.
+    Arrays allocated with `empty` or `share` live in shared memory already and
+    are never copied.
+    '''
+    def __init__(self, max_workers=None, min_chunk=1):
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.min_chunk = min_chunk
+        self.pool = None
+        self.segments = {}
+        self.shared_arrays = {}
+        self.loop_cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self.pool
+
+    def empty(self, shape, dtype=float):
+        '''
+        Allocate an uninitialised array that lives in its own shared segment.
+        '''
+        import numpy as np
+        dtype = np.dtype(dtype)
+        nbytes = max(int(np.prod(shape, dtype=np.int64)) * dtype.itemsize, 1)
+        shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        self.shared_arrays[id(arr)] = (arr, shm)
+        return arr
+
+    def share(self, array):
+        '''
+        Return a copy of `array` that lives in shared memory.
+        '''
+        arr = self.empty(array.shape, array.dtype)
+        arr[...] = array
+        return arr
+
+    def get_segment(self, var, nbytes):
+        shm = self.segments.get(var)
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+            self.segments[var] = shm
+        return shm
+
+    def export_array(self, var, val, written):
+        '''
+        Return the shared segment descriptor for `val` and, if the array had to
+        be copied in, the shared view to copy back from after the loop.
+        '''
+        import numpy as np
+        if id(val) in self.shared_arrays and self.shared_arrays[id(val)][0] is val:
+            shm = self.shared_arrays[id(val)][1]
+            return (shm.name, val.shape, val.dtype.str), None
+
+        shm = self.get_segment(var, val.nbytes)
+        view = np.ndarray(val.shape, dtype=val.dtype, buffer=shm.buf)
+        view[...] = val
+        return (shm.name, val.shape, val.dtype.str), (view if var in written else None)
+
+    def prepare_loop(self, loop, ns):
+        visitor = CollectLoopNames()
+        for stmt in loop.body:
+            visitor.visit(stmt)
+        # Names missing from the namespace (builtins such as `max` or `float`)
+        # are resolved as globals inside the worker
+        params = [n for n in visitor.loaded
+                  if n != loop.target.id and n not in visitor.reductions and n in ns]
+        key = (StructKey(loop), tuple(params))
+        if key not in self.loop_cache:
+            names = NameGenerator(loop)
+            func_name = names.unique('__astpass_shard')
+            bounds = tuple(names.unique(n) for n in ('__lo', '__hi', '__step'))
+            if visitor.carried:
+                # Privatising these would silently give wrong results
+                src = None
+            else:
+                src = gen_shard_func(loop, func_name, params, visitor.reductions, bounds)
+            self.loop_cache[key] = (src, func_name, params, visitor.written_arrays, visitor.reductions)
+        return self.loop_cache[key]
+
+    def run_sequential(self, loop, ns):
+        seq = ast.For(
+            target=loop.target,
+            iter=ast.Call(func=ast.Name(id='range', ctx=ast.Load()), args=loop.iter.args, keywords=[]),
+            body=loop.body,
+            orelse=loop.orelse,
+        )
+        self.exec_stmts([ast.copy_location(seq, loop)], ns)
+
+    def run_loop(self, loop, ns):
+        import numpy as np
+        src, func_name, params, written, reductions = self.prepare_loop(loop, ns)
+        if src is None:
+            self.run_sequential(loop, ns)
+            return
+        iters = range(*[eval(ast.unparse(arg), ns) for arg in loop.iter.args])
+        if len(iters) == 0:
+            return
+
+        num_shards = min(self.max_workers, -(-len(iters) // self.min_chunk))
+        chunk = -(-len(iters) // num_shards)
+        shards = [iters[i:i + chunk] for i in range(0, len(iters), chunk)]
+
+        arrays, scalars, modules, copy_back = {}, {}, {}, {}
+        for name in params:
+            val = ns[name]
+            if isinstance(val, np.ndarray):
+                arrays[name], view = self.export_array(name, val, written)
+                if view is not None:
+                    copy_back[name] = view
+            elif inspect.ismodule(val):
+                modules[name] = val.__name__
+            else:
+                scalars[name] = val
+
+        pool = self.get_pool()
+        futures = [
+            pool.submit(_run_shard, src, func_name, arrays, scalars, modules,
+                        r.start, r.stop, r.step)
+            for r in shards
+        ]
+        partials = [f.result() for f in futures]
+
+        for name, view in copy_back.items():
+            ns[name][...] = view
+        for i, (var, op) in enumerate(reductions.items()):
+            acc = ns.get(var, _REDUCE_IDENTITY[op])
+            for partial in partials:
+                acc = _REDUCE_MERGE[op](acc, partial[i])
+            ns[var] = acc
+
+    def run(self, tree, runtime_vals):
+        '''
+        Execute the top-level statements of `tree` in order, sharding every
+        parallel loop across the worker pool.
+
+        Parameters
+        ----------
+        tree : ast.Module
+            Statement-level code whose parallel loops iterate over `range` or
+            `prange` with bounds computable from `runtime_vals`.
+        runtime_vals : dict
+            A mapping from variable names to runtime values. Arrays are
+            updated in place.
+
+        Returns
+        -------
+        dict
+            The namespace after execution, including reduction results.
+        '''
+        ns = dict(runtime_vals)
+        pending = []
+        for stmt in tree.body:
+            if is_parallel_loop(stmt):
+                self.exec_stmts(pending, ns)
+                pending = []
+                self.run_loop(stmt, ns)
+            else:
+                pending.append(stmt)
+        self.exec_stmts(pending, ns)
+        return ns
+
+    def exec_stmts(self, stmts, ns):
+        if not stmts:
+            return
+        module = ast.Module(body=stmts, type_ignores=[])
+        ast.fix_missing_locations(module)
+        exec(compile(module, '<astpass-sharded>', 'exec'), ns)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        for shm in self.segments.values():
+            shm.close()
+            shm.unlink()
+        self.segments = {}
+        for _, shm in self.shared_arrays.values():
+            try:
+                shm.close()
+            except BufferError:
+                # The caller still holds a view; the mapping goes away with it
+                pass
+            shm.unlink()
+        self.shared_arrays = {}
+
+
+def run(tree, runtime_vals, max_workers=None):
+    '''
+    Run `tree` once with a temporary `ShardedExecutor`. Use the executor
+    directly to reuse the pool and the shared segments across calls.
+    '''
+    with ShardedExecutor(max_workers) as executor:
+        return executor.run(tree, runtime_vals)
@@ -0,0 +1,190 @@
+'''
+Persistent cache of transformed source code.
+
+Entries are keyed on the source of the input, the signature of the runtime
+values (see `array_spec.runtime_signature`), the pass pipeline with its options
+and the astpass version, so a process that restarts with the same kernels and
+input signatures skips analysis and transformation entirely. Each entry is a
+small file holding the transformed source; the compiled code can in turn be
+cached with `code_cache.CodeCache`.
+
+Writes go to a temporary file that is renamed into place, so several processes
+can share a cache directory. When the total size exceeds `max_bytes`, the
+least recently used entries (by file modification time, which is refreshed on
+every hit) are removed.
+'''
+import ast
+import hashlib
+import os
+import tempfile
+import threading
+from collections import Counter
+
+from . import profiling
+from .array_spec import runtime_signature
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SUFFIX = '.py'
+
+
+def pipeline_key(pipeline, fuse=False):
+    '''
+    A canonical string for a `PassManager` pipeline and its options.
+    '''
+    from .pass_manager import PassManager
+    entries = []
+    for p, options in PassManager(pipeline).pipeline:
+        entries.append((p.name, sorted(options.items())))
+    return repr((entries, fuse))
+
+
+def cache_key(src, runtime_vals, pipeline, fuse=False):
+    from . import __version__
+    h = hashlib.sha256()
+    for part in (__version__, pipeline_key(pipeline, fuse), runtime_signature(runtime_vals), src):
+        h.update(part.encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class TransformCache:
+    '''
+    On-disk cache of the results of running a pipeline on a source.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory holding the entries. It is created if needed.
+    max_bytes : int, optional
+        Size cap of the directory. Default is 64 MiB.
+
+    Examples
+    --------
+    ::
+
+        cache = TransformCache("/var/cache/astpass")
+        new_src = cache.transform(src, runtime_vals, ['vector_op_to_loop'])
+        print(cache.stats())
+    '''
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + _SUFFIX)
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def get(self, key):
+        '''
+        Return the cached source for `key`, or None.
+        '''
+        path = self.path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                src = f.read()
+        except OSError:
+            self.count('misses')
+            return None
+        try:
+            # Mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        self.count('hits')
+        return src
+
+    def put(self, key, src):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{key[:16]}-", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(src)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.count('writes')
+        self.evict()
+
+    def entries(self):
+        '''
+        Return `(mtime, size, path)` for every entry, oldest first.
+        '''
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(_SUFFIX):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # Removed by another process
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                self.count('evictions')
+            except OSError:
+                pass
+            total -= size
+
+    def transform(self, src, runtime_vals, pipeline, fuse=False):
+        '''
+        Return the source produced by running `pipeline` on `src`, from the
+        cache if possible.
+        '''
+        key = cache_key(src, runtime_vals, pipeline, fuse)
+        new_src = self.get(key)
+        prof = profiling.active()
+        if new_src is not None:
+            if prof is not None:
+                prof.count('transform', 'transform_cache', cache='hit')
+            return new_src
+
+        from .pass_manager import PassManager
+        with profiling.record('parse', 'parse') as event:
+            tree = ast.parse(src)
+            if event is not None:
+                event.set_output(tree)
+        tree = PassManager(pipeline, fuse=fuse).run(tree, runtime_vals)
+        with profiling.record('unparse', 'unparse', tree):
+            new_src = ast.unparse(tree)
+        self.put(key, new_src)
+        return new_src
+
+    def stats(self):
+        '''
+        Return the hit, miss, write and eviction counts of this process
+        together with the current number of entries and size of the cache.
+        '''
+        entries = self.entries()
+        with self.lock:
+            stats = {name: self.counts[name] for name in ('hits', 'misses', 'writes', 'evictions')}
+        stats['entries'] = len(entries)
+        stats['bytes'] = sum(size for _, size, _ in entries)
+        return stats
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
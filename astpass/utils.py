@@ -89,8 +89,78 @@ def new_ast_function_def(name, args, body):
 def new_ast_attribute(value, attr, ctx=ast.Load()):
     return ast.Attribute(value=value, attr=attr, ctx=ctx)
 
+LOCATION_ATTRS = frozenset(('lineno', 'col_offset', 'end_lineno', 'end_col_offset'))
+
+def clone_ast(node, locations=True, attrs=True, share=None):
+    '''
+    Copy an AST (or a list of nodes) much faster than `copy.deepcopy`.
+
+    Parameters
+    ----------
+    node : ast.AST or list
+        The tree to copy.
+    locations : bool, optional
+        Whether to copy `lineno`, `col_offset`, `end_lineno` and
+        `end_col_offset`. If False they are set to None, like on the nodes
+        built by the `new_ast_*` helpers.
+    attrs : bool or collection of str, optional
+        Which custom attributes attached by passes, e.g. `_simd_okay`,
+        `def_vars` or `use_vars`, to copy: all of them (True), none (False) or
+        only the given names. Container values are copied shallowly.
+    share : callable or tuple of types, optional
+        Subtrees for which `share(node)` is true, or which are instances of
+        the given types, are referenced by the copy instead of being copied.
+        Only use this for subtrees that neither tree will mutate in place.
+
+    Notes
+    -----
+    Nodes without fields or attributes, such as `ast.Load()` or `ast.Add()`,
+    are stateless and always shared, like `ast.parse` does.
+    '''
+    if isinstance(share, (type, tuple)):
+        share_types = share
+        share = lambda n: isinstance(n, share_types)
+    if attrs is True:
+        keep_attr = lambda key: True
+    elif attrs is False:
+        keep_attr = lambda key: False
+    else:
+        keep_attr = frozenset(attrs).__contains__
+    filtered = not locations or attrs is not True
+    AST = ast.AST
+    containers = (set, dict)
+
+    def clone(node):
+        items = node.__dict__
+        if not items or (share is not None and share(node)):
+            return node
+        cls = node.__class__
+        new = cls.__new__(cls)
+        d = new.__dict__
+        if filtered:
+            fields = cls._fields
+            for key, value in items.items():
+                if key in LOCATION_ATTRS:
+                    d[key] = value if locations else None
+                elif key in fields or keep_attr(key):
+                    d[key] = value
+        else:
+            d.update(items)
+        for key, value in d.items():
+            if isinstance(value, AST):
+                d[key] = clone(value)
+            elif value.__class__ is list:
+                d[key] = [clone(v) if isinstance(v, AST) else v for v in value]
+            elif value.__class__ in containers:
+                d[key] = value.copy()
+        return new
+
+    if isinstance(node, list):
+        return [clone(n) for n in node]
+    return clone(node)
+
 def deepcopy_ast_node(node, ctx=None):
-    newnode = copy.deepcopy(node)
+    newnode = clone_ast(node)
     newnode.ctx = ctx
     return newnode
 
@@ -111,15 +181,14 @@ def get_init_value_for_reduction(f):
         assert False
 
 def load_code(src, keep_file=False):
-    from pathlib import Path
-    import sys, importlib, hashlib
-    module_name = hashlib.sha256(src.encode()).hexdigest()
-    file_name = f"/tmp/tmp_{module_name}.py"
-    Path(file_name).write_text(src, encoding='utf-8')
-    spec = importlib.util.spec_from_file_location(f"module_{module_name}", file_name)
-    foo = importlib.util.module_from_spec(spec)
-    sys.modules[f"module_{module_name}"] = foo
-    spec.loader.exec_module(foo)
-    if not keep_file:
-        Path(file_name).unlink()
-    return foo
\ No newline at end of file
+    '''
+    Compile `src` in memory and execute it in a new module, which is returned.
+    Identical sources are compiled and executed only once, see
+    `astpass.code_cache`. With `keep_file`, the source is also written to
+    `/tmp/tmp_<sha>.py` for inspection.
+    '''
+    from . import code_cache
+    if keep_file:
+        from pathlib import Path
+        Path(f"/tmp/tmp_{code_cache.source_hash(src)}.py").write_text(src, encoding='utf-8')
+    return code_cache.load_code(src)
@@ -0,0 +1,189 @@
+'''
+Drop-in replacements for `ast.NodeVisitor` and `ast.NodeTransformer` with
+faster dispatch.
+
+`ast.NodeVisitor.visit` formats a method name and calls `getattr` for every
+node, and `generic_visit` goes through `ast.iter_fields`. The classes here
+instead precompute, per visitor class, a table from node type to handler and,
+per node type, the tuple of its fields. They also skip every child that cannot
+contain a node type the visitor has a handler for, e.g. a visitor that only
+handles statements never descends into expressions, and no visitor descends
+into `ctx` or operator nodes unless it handles them.
+'''
+import ast
+import sys
+
+# Node categories and the categories that can appear directly below them,
+# following the ASDL grammar of the `ast` module.
+_CATEGORIES = [
+    ast.mod, ast.stmt, ast.expr, ast.expr_context, ast.boolop, ast.operator,
+    ast.unaryop, ast.cmpop, ast.comprehension, ast.excepthandler, ast.arguments,
+    ast.arg, ast.keyword, ast.alias, ast.withitem, ast.match_case, ast.pattern,
+    ast.type_ignore,
+]
+
+_CHILD_CATEGORIES = {
+    ast.mod: {ast.stmt, ast.expr, ast.type_ignore},
+    ast.stmt: {ast.stmt, ast.expr, ast.excepthandler, ast.arguments, ast.keyword,
+               ast.alias, ast.withitem, ast.match_case, ast.operator},
+    ast.expr: {ast.expr, ast.expr_context, ast.boolop, ast.operator, ast.unaryop,
+               ast.cmpop, ast.comprehension, ast.keyword, ast.arguments},
+    ast.arguments: {ast.arg, ast.expr},
+    ast.arg: {ast.expr},
+    ast.comprehension: {ast.expr},
+    ast.keyword: {ast.expr},
+    ast.excepthandler: {ast.expr, ast.stmt},
+    ast.withitem: {ast.expr},
+    ast.match_case: {ast.pattern, ast.expr, ast.stmt},
+    ast.pattern: {ast.pattern, ast.expr},
+}
+
+if sys.version_info >= (3, 12):
+    _CATEGORIES.append(ast.type_param)
+    _CHILD_CATEGORIES[ast.stmt].add(ast.type_param)
+    _CHILD_CATEGORIES[ast.type_param] = {ast.expr}
+
+
+def _all_node_types(cls=ast.AST):
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from _all_node_types(sub)
+
+
+def _category(node_type):
+    for cat in _CATEGORIES:
+        if issubclass(node_type, cat):
+            return cat
+    return None
+
+
+def _reachable_categories():
+    '''
+    Map each category to the set of categories that can appear anywhere in a
+    subtree rooted at a node of that category (itself included).
+    '''
+    reach = {}
+    for cat in _CATEGORIES:
+        seen, stack = {cat}, [cat]
+        while stack:
+            for child in _CHILD_CATEGORIES.get(stack.pop(), ()):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        reach[cat] = frozenset(seen)
+    return reach
+
+
+NODE_TYPES = sorted(set(_all_node_types()), key=lambda t: t.__name__)
+NODE_FIELDS = {t: tuple(t._fields) for t in NODE_TYPES}
+NODE_CATEGORY = {t: _category(t) for t in NODE_TYPES}
+REACHABLE = _reachable_categories()
+
+
+def get_fields(node_type):
+    fields = NODE_FIELDS.get(node_type)
+    if fields is None:
+        fields = NODE_FIELDS[node_type] = tuple(node_type._fields)
+    return fields
+
+
+def compute_descend(handled_types):
+    '''
+    Return the set of node types worth visiting: the handled types and the
+    types whose subtrees can contain a node of a handled type. Returns None
+    (descend everywhere) if a handled type is outside the known categories.
+    '''
+    handled_cats = {NODE_CATEGORY.get(t) for t in handled_types}
+    if None in handled_cats:
+        return None
+    descend = set(handled_types)
+    for t in NODE_TYPES:
+        below = set()
+        for child in _CHILD_CATEGORIES.get(NODE_CATEGORY[t], ()):
+            below |= REACHABLE[child]
+        if below & handled_cats:
+            descend.add(t)
+    return frozenset(descend)
+
+
+def get_handlers(visitor):
+    '''
+    Map each node type to the `visit_<NodeType>` handler of `visitor` (a
+    class or an instance), ignoring the compatibility handlers that
+    `ast.NodeVisitor` defines itself.
+    '''
+    handlers = {}
+    for t in NODE_TYPES:
+        name = 'visit_' + t.__name__
+        handler = getattr(visitor, name, None)
+        if handler is None:
+            continue
+        default = getattr(ast.NodeVisitor, name, None)
+        if default is not None and getattr(handler, '__func__', handler) is default:
+            continue
+        handlers[t] = handler
+    return handlers
+
+
+class Visitor(ast.NodeVisitor):
+    '''
+    Fast drop-in base class for `ast.NodeVisitor`.
+    '''
+    _dispatch = {}
+    _descend = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = get_handlers(cls)
+        cls._descend = compute_descend(set(cls._dispatch))
+
+    def visit(self, node):
+        handler = self._dispatch.get(node.__class__)
+        if handler is None:
+            return self.generic_visit(node)
+        return handler(self, node)
+
+    def generic_visit(self, node):
+        descend = self._descend
+        for field in get_fields(node.__class__):
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, ast.AST) and (descend is None or item.__class__ in descend):
+                        self.visit(item)
+            elif isinstance(value, ast.AST) and (descend is None or value.__class__ in descend):
+                self.visit(value)
+
+
+class Transformer(Visitor, ast.NodeTransformer):
+    '''
+    Fast drop-in base class for `ast.NodeTransformer`.
+    '''
+    def generic_visit(self, node):
+        descend = self._descend
+        for field in get_fields(node.__class__):
+            old_value = getattr(node, field, None)
+            if isinstance(old_value, list):
+                new_values = []
+                changed = False
+                for value in old_value:
+                    if isinstance(value, ast.AST) and (descend is None or value.__class__ in descend):
+                        new_value = self.visit(value)
+                        if new_value is not value:
+                            changed = True
+                        if new_value is None:
+                            continue
+                        elif not isinstance(new_value, ast.AST):
+                            new_values.extend(new_value)
+                            continue
+                        value = new_value
+                    new_values.append(value)
+                if changed:
+                    old_value[:] = new_values
+            elif isinstance(old_value, ast.AST) and (descend is None or old_value.__class__ in descend):
+                new_node = self.visit(old_value)
+                if new_node is None:
+                    delattr(node, field)
+                elif new_node is not old_value:
+                    setattr(node, field, new_node)
+        return node
@@ -0,0 +1,45 @@
+'''
+Scaling of `batch.transform_batch` with the number of worker processes.
+
+Run from the repository root with `python -m benchmarks.bench_batch [num_jobs]`.
+'''
+import os
+import sys
+import time
+
+from astpass.array_spec import ArraySpec
+from astpass.batch import transform_batch
+
+
+def make_job(k, n=1000):
+    src = f"""
+def kernel_{k}(a, b, c, d):
+    c[:] = a * {k}.0 + b
+    d[:] = c * c - a
+    s = np.sum(d)
+    return s
+"""
+    import numpy as np
+    vals = {name: ArraySpec((n,)) for name in 'abcd'}
+    vals['s'] = 0.0
+    vals['np'] = np
+    return src, vals
+
+
+def main(num_jobs=400):
+    jobs = [make_job(k) for k in range(num_jobs)]
+    pipeline = ['vector_op_to_loop', 'hoist_shape_access']
+    workers = 1
+    baseline = None
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        results = transform_batch(jobs, pipeline, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        assert all(r.ok for r in results), next(r.error for r in results if not r.ok)
+        baseline = baseline or elapsed
+        print(f"{workers:3d} workers {elapsed * 1000:10.1f} ms {baseline / elapsed:8.2f}x")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400)
@@ -0,0 +1,40 @@
+'''
+Micro-benchmark of `utils.clone_ast` against `copy.deepcopy` on a large
+synthetic tree.
+
+Run from the repository root with `python -m benchmarks.bench_clone [num_funcs]`.
+'''
+import ast
+import copy
+import sys
+import timeit
+
+from astpass.utils import clone_ast
+from .bench_visitor import make_source
+
+
+def bench(label, fn, baseline, number):
+    t = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    print(f"{label:<28} {t * 1000:10.2f} ms {baseline / t:8.2f}x")
+    return t
+
+
+def main(num_funcs=500, number=3):
+    tree = ast.parse(make_source(num_funcs))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.For):
+            node._simd_okay = True
+    print(f"{sum(1 for _ in ast.walk(tree))} nodes")
+    assert ast.dump(clone_ast(tree), include_attributes=True) == ast.dump(tree, include_attributes=True)
+
+    print(f"{'benchmark':<28} {'time':>13} {'speedup':>9}")
+    t_deepcopy = min(timeit.repeat(lambda: copy.deepcopy(tree), number=number, repeat=3)) / number
+    print(f"{'copy.deepcopy':<28} {t_deepcopy * 1000:10.2f} ms {1:8.2f}x")
+    bench("clone_ast", lambda: clone_ast(tree), t_deepcopy, number)
+    bench("clone_ast no locations", lambda: clone_ast(tree, locations=False), t_deepcopy, number)
+    bench("clone_ast no attrs", lambda: clone_ast(tree, attrs=False), t_deepcopy, number)
+    bench("clone_ast share exprs", lambda: clone_ast(tree, share=ast.expr), t_deepcopy, number)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,87 @@
+'''
+Micro-benchmarks of the astpass visitor base classes against the stdlib
+`ast.NodeVisitor` / `ast.NodeTransformer` on a large synthetic tree.
+
+Run from the repository root with `python -m benchmarks.bench_visitor [num_funcs]`.
+'''
+import ast
+import sys
+import timeit
+
+from astpass.visitor import Visitor, Transformer
+
+
+def make_source(num_funcs):
+    funcs = []
+    for k in range(num_funcs):
+        funcs.append(f"""
+def kernel_{k}(a, b, c, n):
+    s = 0.0
+    for i in range(n):
+        for j in range(n):
+            c[i, j] = (a[i, j] * 2.0 + b[j, i] - 1.0) / (a[i, j] + {k}) if a[i, j] > 0 else -b[i, j]
+            s = s + c[i, j] * c[i, j]
+    return s
+""")
+    return "".join(funcs)
+
+
+def make_visitors(base):
+    class CountNames(base):
+        def __init__(self):
+            self.count = 0
+
+        def visit_Name(self, node):
+            self.count += 1
+
+    class CountFuncs(base):
+        def __init__(self):
+            self.count = 0
+
+        def visit_FunctionDef(self, node):
+            self.count += 1
+            self.generic_visit(node)
+
+    return CountNames, CountFuncs
+
+
+def make_transformer(base):
+    class RenameName(base):
+        def visit_Name(self, node):
+            if node.id == 'a':
+                node.id = 'x'
+            elif node.id == 'x':
+                node.id = 'a'
+            return node
+
+    return RenameName
+
+
+def bench(label, stdlib_fn, fast_fn, number):
+    t_std = min(timeit.repeat(stdlib_fn, number=number, repeat=3)) / number
+    t_fast = min(timeit.repeat(fast_fn, number=number, repeat=3)) / number
+    print(f"{label:<28} {t_std * 1000:10.2f} ms {t_fast * 1000:10.2f} ms {t_std / t_fast:8.2f}x")
+
+
+def main(num_funcs=500, number=3):
+    tree = ast.parse(make_source(num_funcs))
+    print(f"{sum(1 for _ in ast.walk(tree))} nodes")
+    print(f"{'benchmark':<28} {'stdlib':>13} {'astpass':>13} {'speedup':>9}")
+
+    std_names, std_funcs = make_visitors(ast.NodeVisitor)
+    fast_names, fast_funcs = make_visitors(Visitor)
+    assert std_names().visit(tree) is None
+    v1, v2 = std_names(), fast_names()
+    v1.visit(tree)
+    v2.visit(tree)
+    assert v1.count == v2.count
+
+    bench("visit Name", lambda: std_names().visit(tree), lambda: fast_names().visit(tree), number)
+    bench("visit FunctionDef only", lambda: std_funcs().visit(tree), lambda: fast_funcs().visit(tree), number)
+
+    std_rename, fast_rename = make_transformer(ast.NodeTransformer), make_transformer(Transformer)
+    bench("transform Name", lambda: std_rename().visit(tree), lambda: fast_rename().visit(tree), number)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
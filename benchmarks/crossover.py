@@ -0,0 +1,48 @@
+'''
+Crossover report of the loops generated by `vector_op_to_loop` against the
+original NumPy code, with and without Numba (if installed).
+
+Run from the repository root with `python -m benchmarks.crossover [max_size]`.
+'''
+import json
+import sys
+
+import numpy as np
+
+from astpass import harness
+
+KERNELS = {
+    'axpy': """
+def kernel(a, b, c):
+    c[:] = a * 2.0 + b
+""",
+    'dot': """
+def kernel(a, b):
+    s = np.sum(a * b)
+    return s
+""",
+}
+
+
+def make_vals(n):
+    rng = np.random.default_rng(0)
+    return {'a': rng.random(n), 'b': rng.random(n), 'c': np.empty(n), 'np': np}
+
+
+def main(max_size=1 << 16):
+    sizes = [1 << k for k in range(2, max_size.bit_length(), 2)]
+    variants = {
+        'loops': ['vector_op_to_loop'],
+        'loops+numba': ['vector_op_to_loop', ('add_func_decorator', {'decorator': 'numba.njit'})],
+    }
+    summary = {}
+    for name, src in KERNELS.items():
+        report = harness.sweep(src, make_vals, sizes, variants, repeat=3)
+        print(f"== {name}")
+        print(report.table())
+        summary[name] = report.to_dict()['crossover']
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 16)
@@ -0,0 +1,369 @@
+'''
+Throughput and peak-memory benchmarks of the passes on large synthetic kernels
+and on a corpus of real-world code (the standard library sources).
+
+Run from the repository root::
+
+    python -m benchmarks.suite                       # run and print
+    python -m benchmarks.suite --save baseline.json  # record a baseline
+    python -m benchmarks.suite --compare benchmarks/baseline.json
+
+With `--compare`, benchmarks slower (or using more memory) than the baseline by
+more than `--threshold` are reported and the exit status is 1. Use `--quick`
+for smaller inputs and `-k` to select benchmarks by substring. Timings are
+machine specific: compare against a baseline recorded on the same host.
+'''
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import sys
+import sysconfig
+import time
+import tracemalloc
+
+from astpass.array_spec import ArraySpec
+from astpass.utils import clone_ast
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    '''
+    Register `setup(size)`, which returns `(run, make_input)`. `run` is timed
+    on a fresh input from `make_input()` in every repetition.
+    '''
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+## Synthetic kernels
+_FUNCS = ['np.sin', 'np.exp', 'np.sqrt', 'np.cos']
+_OPS = ['+', '-', '*', '/']
+NUM_ARRAYS = 8
+
+
+def make_expr(depth, k, leaf):
+    '''
+    A deterministic expression tree of the given depth over the leaves
+    `leaf(i)`, mixing binary operators and unary function calls.
+    '''
+    if depth == 0:
+        return leaf(k)
+    if k % 5 == 4:
+        return f"{_FUNCS[k % len(_FUNCS)]}({make_expr(depth - 1, k + 1, leaf)})"
+    left = make_expr(depth - 1, 2 * k + 1, leaf)
+    right = make_expr(depth - 1, 2 * k + 2, leaf)
+    return f"({left} {_OPS[k % len(_OPS)]} {right})"
+
+
+def make_array_kernel(num_stmts, depth):
+    '''
+    Straight-line whole-array statements and reductions over 1D arrays, with
+    the runtime values (as `ArraySpec`s) the analyses need.
+    '''
+    lines = []
+    rt_vals = {f"a{i}": ArraySpec((1000,)) for i in range(NUM_ARRAYS)}
+    for k in range(num_stmts):
+        expr = make_expr(depth, k, lambda i: f"a{i % NUM_ARRAYS}")
+        if k % 10 == 9:
+            lines.append(f"s{k} = np.sum({expr})")
+            rt_vals[f"s{k}"] = 0.0
+        else:
+            lines.append(f"t{k} = {expr}")
+            rt_vals[f"t{k}"] = ArraySpec((1000,))
+    import numpy as np
+    rt_vals['np'] = np
+    return "\n".join(lines) + "\n", rt_vals
+
+
+def make_scalar_kernel(num_stmts, depth):
+    body = []
+    for k in range(num_stmts):
+        expr = make_expr(depth, k, lambda i: f"x{i % NUM_ARRAYS}")
+        body.append(f"    y{k} = {expr}")
+    args = ", ".join(f"x{i}" for i in range(NUM_ARRAYS))
+    return f"@jit\ndef kernel({args}):\n" + "\n".join(body) + f"\n    return y{num_stmts - 1} * 2\n"
+
+
+def make_loop_kernel(num_funcs, nest):
+    '''
+    Functions with loop nests of depth `nest` whose bounds and bodies access
+    array shapes.
+    '''
+    funcs = []
+    for f in range(num_funcs):
+        lines = [f"@jit\ndef kernel_{f}(a, b, c):"]
+        indent = "    "
+        for d in range(nest):
+            arr = "abc"[d % 3]
+            lines.append(f"{indent}for i{d} in range({arr}.shape[{d % 2}]):")
+            indent += "    "
+        idx = ", ".join(f"i{d}" for d in range(nest))
+        lines.append(f"{indent}c[{idx}] = np.where(a[{idx}] > 0, a[{idx}] * b.shape[0], b[{idx}] / a.shape[1])")
+        lines.append(f"{indent}for j in range(10, c.shape[0]):")
+        lines.append(f"{indent}    c[j] = c[j] + a.shape[0]")
+        funcs.append("\n".join(lines))
+    return "\n\n".join(funcs) + "\n"
+
+
+def stdlib_corpus(max_files):
+    '''
+    The sources of the standard library modules that parse with this
+    interpreter, in a stable order.
+    '''
+    root = sysconfig.get_paths()['stdlib']
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in ('test', 'tests', 'site-packages', 'idlelib'))
+        for filename in sorted(filenames):
+            if not filename.endswith('.py'):
+                continue
+            try:
+                with open(os.path.join(dirpath, filename), encoding='utf-8') as f:
+                    src = f.read()
+                ast.parse(src)
+            except (SyntaxError, UnicodeDecodeError, ValueError, OSError):
+                continue
+            sources.append(src)
+            if len(sources) >= max_files:
+                return sources
+    return sources
+
+
+def _sizes(size):
+    # (statements, expression depth, loop functions, stdlib files)
+    return {'quick': (200, 4, 100, 40), 'full': (2000, 6, 1000, 400)}[size]
+
+
+def _tree_input(src):
+    tree = ast.parse(src)
+    return lambda: clone_ast(tree)
+
+
+## Benchmarks
+@benchmark('parse')
+def _parse(size):
+    src = make_array_kernel(*_sizes(size)[:2])[0]
+    return ast.parse, lambda: src
+
+
+@benchmark('unparse')
+def _unparse(size):
+    tree = ast.parse(make_array_kernel(*_sizes(size)[:2])[0])
+    return ast.unparse, lambda: tree
+
+
+@benchmark('clone_ast')
+def _clone(size):
+    tree = ast.parse(make_array_kernel(*_sizes(size)[:2])[0])
+    return clone_ast, lambda: tree
+
+
+@benchmark('shape_analysis.analyze')
+def _shape_analysis(size):
+    from astpass.passes import shape_analysis
+    src, rt_vals = make_array_kernel(*_sizes(size)[:2])
+    tree = ast.parse(src)
+    return lambda t: shape_analysis.analyze(t, rt_vals), lambda: tree
+
+
+@benchmark('vector_op_to_loop.transform')
+def _vector_op_to_loop(size):
+    # Includes the shape analysis of the input. Scalarized statements must be
+    # flat to become loops, hence the depth of 1
+    from astpass.passes import vector_op_to_loop
+    src, rt_vals = make_array_kernel(_sizes(size)[0], 1)
+    return lambda t: vector_op_to_loop.transform(t, rt_vals), _tree_input(src)
+
+
+@benchmark('to_single_op_form.transform')
+def _to_single_op_form(size):
+    from astpass.passes import to_single_op_form
+    return to_single_op_form.transform, _tree_input(make_scalar_kernel(*_sizes(size)[:2]))
+
+
+@benchmark('hoist_shape_access.transform')
+def _hoist_shape_access(size):
+    from astpass.passes import hoist_shape_access
+    return hoist_shape_access.transform, _tree_input(make_loop_kernel(_sizes(size)[2], 3))
+
+
+@benchmark('normalize_ranges.transform')
+def _normalize_ranges(size):
+    from astpass.passes import normalize_ranges
+    return normalize_ranges.transform, _tree_input(make_loop_kernel(_sizes(size)[2], 3))
+
+
+@benchmark('where_to_ternary.transform')
+def _where_to_ternary(size):
+    from astpass.passes import where_to_ternary
+    return where_to_ternary.transform, _tree_input(make_loop_kernel(_sizes(size)[2], 3))
+
+
+@benchmark('remove_func_decorator.transform')
+def _remove_func_decorator(size):
+    from astpass.passes import remove_func_decorator
+    return remove_func_decorator.transform, _tree_input(make_loop_kernel(_sizes(size)[2], 3))
+
+
+@benchmark('get_used_names.analyze')
+def _get_used_names(size):
+    from astpass.passes import get_used_names
+    tree = ast.parse(make_scalar_kernel(*_sizes(size)[:2]))
+    return lambda t: get_used_names.analyze(t, False), lambda: tree
+
+
+@benchmark('pipeline')
+def _pipeline(size):
+    from astpass.pass_manager import PassManager
+    pipeline = ['remove_func_decorator', 'where_to_ternary', 'normalize_ranges', 'hoist_shape_access']
+    return PassManager(pipeline).run, _tree_input(make_loop_kernel(_sizes(size)[2], 3))
+
+
+@benchmark('pipeline.fused')
+def _pipeline_fused(size):
+    from astpass.pass_manager import PassManager
+    pipeline = ['remove_func_decorator', 'where_to_ternary', 'normalize_ranges', 'hoist_shape_access']
+    return PassManager(pipeline, fuse=True).run, _tree_input(make_loop_kernel(_sizes(size)[2], 3))
+
+
+def _corpus_input(size):
+    trees = [ast.parse(src) for src in stdlib_corpus(_sizes(size)[3])]
+    return lambda: [clone_ast(t) for t in trees]
+
+
+@benchmark('stdlib.clone_ast')
+def _stdlib_clone(size):
+    trees = [ast.parse(src) for src in stdlib_corpus(_sizes(size)[3])]
+    return lambda ts: [clone_ast(t) for t in ts], lambda: trees
+
+
+@benchmark('stdlib.get_used_names.analyze')
+def _stdlib_used_names(size):
+    from astpass.passes import get_used_names
+    trees = [ast.parse(src) for src in stdlib_corpus(_sizes(size)[3])]
+    return lambda ts: [get_used_names.analyze(t, False) for t in ts], lambda: trees
+
+
+@benchmark('stdlib.node_local_passes')
+def _stdlib_node_local(size):
+    from astpass.passes import normalize_ranges, remove_func_decorator, where_to_ternary
+
+    def run(trees):
+        for t in trees:
+            t = remove_func_decorator.transform(t)
+            t = where_to_ternary.transform(t)
+            normalize_ranges.transform(t)
+    return run, _corpus_input(size)
+
+
+@benchmark('stdlib.to_single_op_form.transform')
+def _stdlib_to_single_op_form(size):
+    from astpass.passes import to_single_op_form
+
+    def run(trees):
+        for t in trees:
+            try:
+                to_single_op_form.transform(t)
+            except (AssertionError, AttributeError, TypeError):
+                # The pass only supports a subset of Python
+                pass
+    return run, _corpus_input(size)
+
+
+## Driver
+def measure(setup, size, repeat):
+    run, make_input = setup(size)
+    times = []
+    for _ in range(repeat):
+        inp = make_input()
+        # Like timeit, keep collections out of the measurement
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run(inp)
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    inp = make_input()
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    run(inp)
+    peak = tracemalloc.get_traced_memory()[1] - before
+    if not was_tracing:
+        tracemalloc.stop()
+    return {'time': min(times), 'peak': peak}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ('time', 'peak'):
+            if base[metric] > 0 and result[metric] > base[metric] * (1 + threshold):
+                regressions.append((name, metric, result[metric] / base[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-k', default='', help="only run benchmarks whose name contains this")
+    parser.add_argument('--quick', action='store_true', help="use small inputs")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="compare against this baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="relative slowdown reported as a regression (default 0.2)")
+    args = parser.parse_args(argv)
+    size = 'quick' if args.quick else 'full'
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            data = json.load(f)
+        if data['size'] != size:
+            parser.error(f"baseline was recorded with size {data['size']!r}, not {size!r}")
+        baseline = data['results']
+
+    results = {}
+    print(f"{'benchmark':<40} {'time':>12} {'peak':>12} {'vs baseline':>12}")
+    for name, setup in BENCHMARKS.items():
+        if args.k not in name:
+            continue
+        result = results[name] = measure(setup, size, args.repeat)
+        ratio = ''
+        if baseline is not None and name in baseline and baseline[name]['time'] > 0:
+            ratio = f"{result['time'] / baseline[name]['time']:.2f}x"
+        print(f"{name:<40} {result['time'] * 1000:9.2f} ms {result['peak'] / 2**20:8.2f} MiB {ratio:>12}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'size': size,
+                'python': sys.version.split()[0],
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=1)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, ratio in regressions:
+            print(f"REGRESSION {name}: {metric} {ratio:.2f}x baseline")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import ast
+import pickle
+import textwrap
+import numpy as np
+
+import astpass as at
+from astpass.array_spec import ArraySpec, to_specs
+from astpass.passes import shape_analysis, vector_op_to_loop
+
+def test_from_array():
+    spec = ArraySpec.from_array(np.empty((3, 4), dtype=np.float32))
+    assert spec.shape == (3, 4)
+    assert spec.dtype == 'float32'
+    assert spec.order == 'C'
+    assert spec.nbytes == 48
+    assert spec == ArraySpec((3, 4), 'f4')
+
+    spec = ArraySpec.from_array(np.empty((3, 4), order='F'))
+    assert spec.order == 'F'
+
+    spec = ArraySpec.from_array(np.empty((3, 4))[:, ::2])
+    assert spec.order == 'A'
+    assert spec.strides == (32, 16)
+
+def test_from_signature():
+    spec = ArraySpec.from_signature("f4[1024, 3]:F")
+    assert spec == ArraySpec((1024, 3), 'float32', order='F')
+    assert spec.signature() == "float32[1024, 3]:F"
+    assert ArraySpec.from_signature(spec.signature()) == spec
+    assert ArraySpec.from_signature("int64").shape == ()
+
+def test_hash():
+    specs = {ArraySpec((10,)): 1}
+    assert specs[ArraySpec.from_signature("float64[10]")] == 1
+    assert ArraySpec((10,)) != ArraySpec((10,), 'float32')
+    assert pickle.loads(pickle.dumps(ArraySpec((2, 3)))) == ArraySpec((2, 3))
+
+def test_memmap(tmp_path):
+    spec = ArraySpec.from_array(np.memmap(tmp_path / 'a', mode='w+', shape=(10,)))
+    assert spec.memmap
+    assert spec != ArraySpec((10,))
+    assert pickle.loads(pickle.dumps(spec)) == spec
+
+def test_shape_analysis():
+    tree = ast.parse("a + 1")
+    rt_vals = {"a": ArraySpec.from_signature("float64[3, 4]")}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape) for node, shape in shape_info.items()]
+    assert results == [('a', (3, 4)), ('1', ()), ('a + 1', (3, 4))]
+
+def test_vector_op_to_loop():
+    code = """
+    c = a + b
+    """
+    rt_vals = {
+        'a': np.random.randn(10),
+        'b': 1.0,
+        'c': np.empty(10)
+    }
+    expected = ast.unparse(vector_op_to_loop.transform(ast.parse(textwrap.dedent(code)), rt_vals))
+    tree = vector_op_to_loop.transform(ast.parse(textwrap.dedent(code)), to_specs(rt_vals))
+    assert ast.unparse(tree) == expected
+    assert isinstance(at.ArraySpec((1,)), ArraySpec)
@@ -0,0 +1,36 @@
+import ast
+
+from astpass.passes.ast_utils import StructKey, is_call, str_to_ast_expr, struct_eq, struct_hash
+
+def test_struct_eq():
+    a = ast.parse("x = a[i + 1] * 2").body[0]
+    b = ast.parse("\n\ny   =   a[(i + 1)] * 2").body[0]
+    assert struct_eq(a.value, b.value)
+    assert struct_hash(a.value) == struct_hash(b.value)
+    assert not struct_eq(a, b)
+
+    # ctx is ignored, constant types are not
+    assert struct_eq(a.targets[0], str_to_ast_expr("x"))
+    assert not struct_eq(str_to_ast_expr("1"), str_to_ast_expr("1.0"))
+    assert not struct_eq(str_to_ast_expr("1"), str_to_ast_expr("True"))
+
+def test_struct_key():
+    table = {StructKey(str_to_ast_expr("np.sum")): 'sum'}
+    assert table[StructKey(str_to_ast_expr("np . sum"))] == 'sum'
+    assert StructKey(str_to_ast_expr("np.max")) not in table
+
+def test_struct_hash_cache():
+    tree = ast.parse("c = a * b + a * b")
+    cache = {}
+    h = struct_hash(tree, cache)
+    value = tree.body[0].value
+    assert cache[id(value.left)][1] == cache[id(value.right)][1]
+    assert struct_hash(tree, cache) == h
+
+def test_is_call():
+    node = str_to_ast_expr("np.sum(a)")
+    assert is_call(node)
+    assert is_call(node, ["sum", "np.sum"])
+    assert is_call(node, "np.sum")
+    assert not is_call(node, ["sum"])
+    assert not is_call(str_to_ast_expr("a"))
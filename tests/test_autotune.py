@@ -0,0 +1,88 @@
+import json
+import textwrap
+import threading
+import time
+import numpy as np
+from astpass import autotune
+from astpass.autotune import Autotuner, SearchSpace
+
+CODE = textwrap.dedent("""
+c = a * 2.0 + b
+""")
+
+def make_vals(n=16):
+    rng = np.random.default_rng(0)
+    return {'a': rng.random(n), 'b': rng.random(n), 'c': np.empty(n), 'np': np}
+
+def test_search_space():
+    space = SearchSpace(lambda loops, hoist: (['vector_op_to_loop'] if loops else []) + (['hoist_shape_access'] if hoist else []),
+                        loops=[False, True], hoist=[False, True])
+    candidates = space.candidates()
+    assert list(candidates) == ['hoist=False,loops=False', 'hoist=False,loops=True',
+                                'hoist=True,loops=False', 'hoist=True,loops=True']
+    assert candidates['hoist=True,loops=True'] == ['vector_op_to_loop', 'hoist_shape_access']
+
+def test_tune_and_reuse(tmp_path):
+    db_path = str(tmp_path / "tuning.json")
+    candidates = {
+        'loops': ['vector_op_to_loop'],
+        'wrong': [('replace_name', {'old_name': 'b', 'new_name': 'a'})],
+    }
+    tuner = Autotuner(candidates, db_path=db_path, repeat=1, min_time=0)
+    result = tuner.tune(CODE, make_vals())
+    assert not result.cached
+    assert set(result.times) == {'original', 'loops'}
+    assert result.errors['wrong'].startswith('Mismatch')
+    assert result.best in ('original', 'loops')
+
+    # A new tuner reads the choice from the database without measuring
+    tuner = Autotuner(candidates, db_path=db_path, repeat=1, min_time=0)
+    tuner.measure = None
+    again = tuner.tune(CODE, make_vals())
+    assert again.cached
+    assert (again.best, again.pipeline) == (result.best, result.pipeline)
+    with open(db_path) as f:
+        assert len(json.load(f)) == 1
+
+def test_key_depends_on_signature_and_space():
+    tuner = Autotuner({'loops': ['vector_op_to_loop']})
+    key = tuner.key(CODE, make_vals(16))
+    assert key == tuner.key(CODE, make_vals(16))
+    assert key != tuner.key(CODE, make_vals(32))
+    assert key != Autotuner({'loops': ['vector_op_to_loop', 'hoist_shape_access']}).key(CODE, make_vals(16))
+
+def test_timeout():
+    tuner = Autotuner({'loops': ['vector_op_to_loop']}, repeat=1, min_time=0, timeout=0)
+    try:
+        tuner.tune(CODE, make_vals())
+    except RuntimeError as e:
+        assert 'TimeoutError' in str(e)
+    else:
+        assert False, "expected every candidate to time out"
+
+def test_timeout_interrupts_slow_candidate():
+    def hang():
+        time.sleep(60)
+    code = CODE + "pause()\n"
+    vals = dict(make_vals(), pause=lambda: None, hang=hang)
+    tuner = Autotuner({'slow': [('replace_name', {'old_name': 'pause', 'new_name': 'hang'})]},
+                      repeat=1, min_time=0, timeout=0.5)
+    start = time.perf_counter()
+    result = tuner.tune(code, vals)
+    assert time.perf_counter() - start < 5
+    assert result.best == 'original'
+    assert result.errors['slow'].startswith('TimeoutError')
+
+    # Off the main thread, the candidate is abandoned on a daemon thread
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.append(tuner.tune(code, vals, force=True)))
+    thread.start()
+    thread.join(5)
+    assert outcome and outcome[0].errors['slow'].startswith('TimeoutError')
+
+def test_transform():
+    tuner = Autotuner({'loops': ['vector_op_to_loop']}, repeat=1, min_time=0)
+    tuner.tune(CODE, make_vals())
+    tuner.db.entries[tuner.key(CODE, make_vals())]['pipeline'] = ['vector_op_to_loop']
+    assert 'for __i0 in range' in tuner.transform(CODE, make_vals())
+    assert autotune.host_id()
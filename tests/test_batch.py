@@ -0,0 +1,43 @@
+import ast
+import textwrap
+import numpy as np
+from astpass.batch import transform_batch
+
+src = textwrap.dedent("""
+def f(a, b, c):
+    c[:] = np.sin(a) + b
+""")
+
+def rt_vals(n):
+    return {'a': np.zeros(n), 'b': np.zeros(n), 'c': np.zeros(n), 'np': np}
+
+def test_batch_in_order():
+    jobs = [(src.replace('+ b', f'+ {k}'), rt_vals(10)) for k in range(6)]
+    results = transform_batch(jobs, ['vector_op_to_loop'], max_workers=2)
+    assert [r.ok for r in results] == [True] * 6
+    for k, r in enumerate(results):
+        assert f"np.sin(a[__i0]) + {k}" in r.source
+
+def test_batch_errors_are_isolated():
+    jobs = [
+        (ast.parse(src), rt_vals(10)),
+        ("def f(:", rt_vals(10)),
+        (src, {'a': np.zeros(10)}),
+        (src, rt_vals(10), ['no_such_pass']),
+        (src, rt_vals(10), ['remove_func_decorator']),
+    ]
+    results = transform_batch(jobs, ['vector_op_to_loop'], max_workers=2)
+    assert [r.ok for r in results] == [True, False, False, False, True]
+    assert results[1].error.startswith('SyntaxError')
+    assert results[3].error.startswith('KeyError')
+    assert 'Traceback' in results[2].traceback
+
+def test_batch_inline():
+    results = transform_batch([(src, rt_vals(4))], ['vector_op_to_loop'], max_workers=1)
+    assert 'for __i0 in range(0, 4)' in results[0].source
+
+def test_batch_keeps_memmaps(tmp_path):
+    vals = {'a': np.memmap(tmp_path / 'a', dtype='float64', mode='w+', shape=(100,)), 'b': 1.0,
+            'c': np.memmap(tmp_path / 'c', dtype='float64', mode='w+', shape=(100,))}
+    results = transform_batch([("c = a + b", vals)], [('stream_memmap', {'memory_budget': 640})], max_workers=2)
+    assert 'for __blk0 in range(0, 100, 26)' in results[0].source
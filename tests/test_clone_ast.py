@@ -0,0 +1,61 @@
+import ast
+import textwrap
+from astpass.utils import clone_ast, deepcopy_ast_node
+
+def parse(code):
+    return ast.parse(textwrap.dedent(code))
+
+def annotated_tree():
+    tree = parse("""
+    def f(a, b, n):
+        for i in range(n):
+            a[i] = b[i] + 1
+        return a
+    """)
+    loop = tree.body[0].body[0]
+    loop._simd_okay = True
+    loop.def_vars = {'a'}
+    loop.use_vars = {'b', 'n'}
+    return tree, loop
+
+def test_clone_is_equal_and_independent():
+    tree, _ = annotated_tree()
+    new_tree = clone_ast(tree)
+    assert ast.dump(new_tree, include_attributes=True) == ast.dump(tree, include_attributes=True)
+    for old, new in zip(ast.walk(tree), ast.walk(new_tree)):
+        assert old is not new or not old.__dict__
+    new_tree.body[0].body[0].target.id = 'j'
+    assert tree.body[0].body[0].target.id == 'i'
+
+def test_clone_custom_attrs():
+    tree, loop = annotated_tree()
+    new_loop = clone_ast(tree).body[0].body[0]
+    assert new_loop._simd_okay and new_loop.def_vars == {'a'}
+    new_loop.def_vars.add('c')
+    assert loop.def_vars == {'a'}
+
+    new_loop = clone_ast(tree, attrs=False).body[0].body[0]
+    assert not hasattr(new_loop, '_simd_okay') and not hasattr(new_loop, 'def_vars')
+
+    new_loop = clone_ast(tree, attrs=['_simd_okay']).body[0].body[0]
+    assert new_loop._simd_okay and not hasattr(new_loop, 'use_vars')
+
+def test_clone_without_locations():
+    tree, _ = annotated_tree()
+    new_tree = clone_ast(tree, locations=False)
+    assert all(getattr(node, 'lineno', None) is None for node in ast.walk(new_tree))
+    assert ast.unparse(new_tree) == ast.unparse(tree)
+
+def test_clone_share():
+    tree, loop = annotated_tree()
+    new_loop = clone_ast(loop, share=ast.expr)
+    assert new_loop is not loop
+    assert new_loop.iter is loop.iter
+    assert new_loop.body[0] is not loop.body[0]
+    assert new_loop.body[0].value is loop.body[0].value
+
+def test_deepcopy_ast_node():
+    node = ast.parse("a[i]").body[0].value
+    new_node = deepcopy_ast_node(node, ctx=ast.Store())
+    assert isinstance(new_node.ctx, ast.Store) and isinstance(node.ctx, ast.Load)
+    assert new_node.value is not node.value
@@ -0,0 +1,55 @@
+import inspect
+import os
+import sys
+import textwrap
+from astpass import utils
+from astpass.code_cache import CodeCache
+
+def kernel_src(k):
+    return textwrap.dedent(f"""
+    def kernel(a):
+        return a + {k}
+    """)
+
+def test_load_is_cached():
+    cache = CodeCache()
+    m1 = cache.load(kernel_src(1))
+    m2 = cache.load(kernel_src(1))
+    assert m1 is m2
+    assert m1.kernel(1) == 2
+    assert cache.stats['misses'] == 1 and cache.stats['module_hits'] == 1
+    assert m1.__name__ not in sys.modules
+    assert 'return a + 1' in inspect.getsource(m1.kernel)
+
+def test_lru_eviction():
+    cache = CodeCache(maxsize=2)
+    for k in range(3):
+        cache.get_code(kernel_src(k))
+    cache.get_code(kernel_src(2))
+    assert len(cache.codes) == 2
+    assert cache.stats['evictions'] == 1 and cache.stats['hits'] == 1
+    cache.get_code(kernel_src(0))
+    assert cache.stats['misses'] == 4
+
+def test_disk_cache(tmp_path):
+    CodeCache(cache_dir=str(tmp_path)).get_code(kernel_src(3))
+    files = os.listdir(tmp_path)
+    assert len(files) == 1 and files[0].endswith('.bin')
+
+    cache = CodeCache(cache_dir=str(tmp_path))
+    m = cache.load(kernel_src(3))
+    assert m.kernel(1) == 4
+    assert cache.stats['disk_hits'] == 1 and cache.stats['misses'] == 0
+
+def test_disk_cache_corrupt_entry(tmp_path):
+    CodeCache(cache_dir=str(tmp_path)).get_code(kernel_src(4))
+    path = tmp_path / os.listdir(tmp_path)[0]
+    path.write_bytes(b'garbage')
+    cache = CodeCache(cache_dir=str(tmp_path))
+    assert cache.load(kernel_src(4)).kernel(0) == 4
+    assert cache.stats['misses'] == 1
+
+def test_utils_load_code():
+    m = utils.load_code(kernel_src(5))
+    assert m.kernel(1) == 6
+    assert utils.load_code(kernel_src(5)) is m
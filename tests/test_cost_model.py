@@ -0,0 +1,102 @@
+import ast
+import textwrap
+import numpy as np
+from astpass.passes import cost_model
+from astpass.passes.cost_model import Cost, Machine
+from astpass.pass_manager import PassManager, Pass, ALL
+
+def get_costs(code, rt_vals):
+    tree = ast.parse(textwrap.dedent(code))
+    costs = cost_model.analyze(tree, rt_vals)
+    return tree, {ast.unparse(node): cost for node, cost in costs.items() if node is not tree}
+
+def test_vector_add():
+    tree, costs = get_costs("c = a + b", {'a': np.zeros(100), 'b': np.zeros(100)})
+    assert costs['c = a + b'] == Cost(flops=100, bytes_read=1600, bytes_written=800, temporaries=1, temp_bytes=800, ops=4)
+
+def test_nested_temporaries():
+    code = "c[:] = a * 2.0 + b"
+    tree, costs = get_costs(code, {'a': np.zeros(10), 'b': np.zeros(10), 'c': np.zeros(10)})
+    cost = costs[code]
+    assert cost.temporaries == 2
+    assert cost.flops == 20
+    # a, b and both temporaries are read; the temporaries and c are written
+    assert cost.bytes_read == 4 * 80
+    assert cost.bytes_written == 3 * 80
+
+def test_dtype_sizes():
+    tree, costs = get_costs("s = np.sum(a)", {'a': np.zeros(100, dtype=np.float32), 'np': np})
+    assert costs['s = np.sum(a)'] == Cost(flops=100, bytes_read=400, ops=5)
+
+def test_func_table_costs():
+    tree, costs = get_costs("b = np.exp(a)", {'a': np.zeros(10), 'np': np})
+    assert costs['b = np.exp(a)'].flops == 10 * cost_model.cost_table.FUNC_FLOPS['numpy_exp']
+
+def test_loop():
+    code = """
+    for i in range(1, n):
+        c[i] = a[i] + a[i - 1]
+    """
+    tree, costs = get_costs(code, {'a': np.zeros(100), 'c': np.zeros(100), 'n': 100})
+    assert costs['c[i] = a[i] + a[i - 1]'] == Cost(flops=1, bytes_read=16, bytes_written=8, ops=12)
+    loop = costs[textwrap.dedent(code).strip()]
+    # Evaluating `range(1, n)`, then advancing, storing `i` and the body in
+    # each iteration
+    assert loop == Cost(flops=99, bytes_read=99 * 16, bytes_written=99 * 8, ops=4 + 99 * (2 + 12))
+    assert loop.exact
+
+def test_vector_code_is_cheaper_than_interpreted_loop():
+    rt_vals = {'a': np.zeros(1000), 'b': np.zeros(1000), 'c': np.zeros(1000), 'np': np}
+    vector = ast.parse("c[:] = a * b + a")
+    loops = PassManager(['vector_op_to_loop']).run(ast.parse("c[:] = a * b + a"), rt_vals)
+    t_vector = cost_model.estimate(vector, rt_vals)
+    t_loops = cost_model.estimate(loops, rt_vals)
+    assert t_vector < t_loops
+    # Compiled, the loop saves the temporaries
+    compiled = Machine(op_time=0)
+    assert cost_model.estimate(loops, rt_vals, compiled) < cost_model.estimate(vector, rt_vals, compiled)
+
+def test_symbolic_extents():
+    tree, costs = get_costs("b = a[:n] + 1.0", {'a': np.zeros(100), 'n': 10})
+    assert costs['b = a[:n] + 1.0'].flops == 10
+
+def test_unknown_trip_count():
+    code = """
+    while x > 0:
+        x = x - 1
+    """
+    tree, costs = get_costs(code, {'x': 10})
+    assert not costs[textwrap.dedent(code).strip()].exact
+    assert costs['x = x - 1'].exact
+
+def test_view_binding_is_free():
+    tree, costs = get_costs("b = a[1:]", {'a': np.zeros(100)})
+    assert costs['b = a[1:]'] == Cost(ops=5)
+
+def test_machine():
+    machine = Machine(peak_flops=1e9, bandwidth=1e9, alloc_time=0)
+    assert machine.ridge_point == 1
+    memory_bound = Cost(flops=10, bytes_read=100)
+    compute_bound = Cost(flops=1000, bytes_read=100)
+    assert machine.bound(memory_bound) == 'memory'
+    assert machine.bound(compute_bound) == 'compute'
+    assert machine.time(compute_bound) == 1e-6
+    assert Machine.from_dict(machine.to_dict()).to_dict() == machine.to_dict()
+
+def test_pass_manager_analysis():
+    seen = {}
+    def record(tree, analyses, runtime_vals):
+        seen.update(analyses['cost'])
+        return tree
+    tree = ast.parse("b = a * 2.0")
+    PassManager([Pass('record', record, requires=('cost',))]).run(tree, {'a': np.zeros(4)})
+    assert seen[tree].flops == 4
+
+def test_cost_analysis_reuses_shapes():
+    def record(tree, analyses, runtime_vals):
+        return tree
+    pm = PassManager([Pass('shapes', record, requires=('shapes',), preserves=ALL), Pass('cost', record, requires=('cost',))])
+    pm.run(ast.parse("b = a * 2.0"), {'a': np.zeros(4)})
+    assert pm.stats['computed']['shapes'] == 1
+    assert pm.stats['cached']['shapes'] == 1
+    assert pm.stats['computed']['cost'] == 1
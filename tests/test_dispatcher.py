@@ -0,0 +1,107 @@
+import time
+import numpy as np
+import pytest
+import astpass
+from astpass.dispatcher import Dispatcher
+
+@astpass.jit
+def add(a, b, c):
+    c[:] = a * 2.0 + b
+    return c
+
+@astpass.jit(pipeline=[], specialize=('n',))
+def head(a, n):
+    return a[:n] + 1.0
+
+def test_compile_on_first_call():
+    a, b, c = np.arange(4.0), np.ones(4), np.empty(4)
+    assert isinstance(add, Dispatcher)
+    assert add.__name__ == 'add'
+    np.testing.assert_allclose(add(a, b, c), a * 2.0 + b)
+    src = add.source(a, b, c)
+    assert 'for __i0 in range(0, 4)' in src
+    assert '@' not in src
+    assert len(add.specializations) == 1
+
+def test_specializations_per_shape_and_dtype():
+    d = Dispatcher(add.func)
+    d(np.zeros(3), np.zeros(3), np.zeros(3))
+    d(np.zeros(3), np.zeros(3), c=np.zeros(3))
+    assert len(d.specializations) == 1
+    d(np.zeros(5), np.zeros(5), np.zeros(5))
+    d(np.zeros(3, np.float32), np.zeros(3, np.float32), np.zeros(3, np.float32))
+    assert len(d.specializations) == 3
+
+def test_specialize_scalar_values():
+    a = np.arange(6.0)
+    np.testing.assert_allclose(head(a, 2), [1.0, 2.0])
+    np.testing.assert_allclose(head(a, n=3), [1.0, 2.0, 3.0])
+    assert 'a[:3]' in head.source(a, 3)
+    assert len(head.specializations) == 2
+
+def test_reassigned_parameter_is_not_substituted():
+    def f(a, n):
+        n = n + 1
+        return a[:n]
+    d = Dispatcher(f, pipeline=[], specialize=('n',))
+    np.testing.assert_allclose(d(np.arange(5.0), 1), [0.0, 1.0])
+    assert 'n = n + 1' in d.source(np.arange(5.0), 1)
+
+def test_unsupported_functions():
+    with pytest.raises(ValueError):
+        astpass.jit(lambda *args: args)
+    with pytest.raises(ValueError):
+        astpass.jit(add.func, specialize=('m',))
+
+def test_dispatch_overhead():
+    def noop(a, n):
+        return n
+    d = Dispatcher(noop, pipeline=[])
+    a = np.zeros(3)
+    d(a, 1)
+    start = time.perf_counter()
+    for _ in range(1000):
+        d(a, 1)
+    assert (time.perf_counter() - start) / 1000 < 1e-4
+
+def test_tiered_runs_original_until_compiled():
+    d = Dispatcher(add.func, tiered=True)
+    a, b = np.arange(3.0), np.ones(3)
+    np.testing.assert_allclose(d(a, b, np.empty(3)), a * 2.0 + b)
+    assert d.wait(timeout=10)
+    spec = next(iter(d.specializations.values()))
+    assert 'for __i0 in range(0, 3)' in spec.src
+    np.testing.assert_allclose(d(a, b, np.empty(3)), a * 2.0 + b)
+
+def test_tiered_failure_falls_back(caplog):
+    d = Dispatcher(add.func, pipeline=['no_such_pass'], tiered=True)
+    a = np.zeros(2)
+    with caplog.at_level('WARNING', logger='astpass.dispatcher'):
+        d(a, a, a)
+        assert d.wait(timeout=10)
+    assert 'falling back' in caplog.text
+    spec = next(iter(d.specializations.values()))
+    assert spec.func is d.func and spec.src is None
+    d(a, a, a)
+    assert not d.pending
+
+def test_tiered_streams_memmaps(tmp_path):
+    def f(a, c):
+        c = a + 1.0
+    d = Dispatcher(f, pipeline=[('stream_memmap', {'memory_budget': 640})], tiered=True)
+    a = np.memmap(tmp_path / 'a', dtype='float64', mode='w+', shape=(100,))
+    c = np.memmap(tmp_path / 'c', dtype='float64', mode='w+', shape=(100,))
+    d(np.zeros(100), np.zeros(100))
+    d(a, c)
+    assert d.wait(timeout=10)
+    assert len(d.specializations) == 2
+    assert 'for __blk0 in range(0, 100, 26)' in d.specializations[d.key((a, c))].src
+    assert 'for' not in d.specializations[d.key((np.zeros(100), np.zeros(100)))].src
+    d(a, c)
+    np.testing.assert_allclose(c, 1.0)
+
+def test_locations_refer_to_the_file():
+    a = np.zeros(2)
+    add(a, a, np.zeros(2))
+    # Decorator, def, then the first statement
+    assert add.tree.body[0].body[0].lineno == add.func.__code__.co_firstlineno + 2
@@ -0,0 +1,74 @@
+import ast
+import textwrap
+
+from astpass.fused import fuse
+from astpass.pass_manager import PassManager
+from astpass.passes.remove_func_decorator import RemoveFuncDecorator
+from astpass.passes.where_to_ternary import WhereToTernary
+from astpass.passes.replace_name import ReplaceName
+from astpass.passes.normalize_ranges import NormalizeRange
+
+code = """
+@njit
+def foo(a: int, b, c):
+    for i in range(n):
+        c[i] = np.where(a[i] > 0, b[i], 0) + n
+"""
+
+def test_fuse():
+    tree = ast.parse(textwrap.dedent(code))
+    tree = fuse(RemoveFuncDecorator(), WhereToTernary(), ReplaceName('a', 'x'), NormalizeRange()).visit(tree)
+
+    expected = """
+    def foo(a: int, b, c):
+        for i in range(0, n, 1):
+            c[i] = (b[i] if x[i] > 0 else 0) + n
+    """
+    assert ast.unparse(tree) == ast.unparse(ast.parse(textwrap.dedent(expected)))
+
+def test_fused_pipeline():
+    pipeline = [
+        'remove_func_decorator',
+        'remove_func_arg_annotation',
+        'where_to_ternary',
+        'normalize_ranges',
+        ('replace_name', {'old_name': 'n', 'new_name': 'N'}),
+        ('add_func_decorator', {'decorator': 'jit'}),
+    ]
+    unfused = PassManager(pipeline)
+    fused = PassManager(pipeline, fuse=True)
+    assert len(fused.pipeline) == 1
+
+    expected = unfused.run(ast.parse(textwrap.dedent(code)))
+    tree = fused.run(ast.parse(textwrap.dedent(code)))
+    assert ast.unparse(tree) == ast.unparse(expected)
+    assert [name for name, _ in fused.timings] == [
+        'fused(remove_func_decorator, remove_func_arg_annotation, where_to_ternary, '
+        'normalize_ranges, replace_name, add_func_decorator)'
+    ]
+
+def test_fused_nested():
+    code = """
+    @dec
+    def foo(a, b, c):
+        @dec
+        def bar(x: int):
+            return np.where(x > 0, np.where(x > 1, x, 1), range(len(range(x))))
+        return bar(a)
+    """
+    pipeline = [
+        'remove_func_decorator',
+        'remove_func_arg_annotation',
+        'where_to_ternary',
+        'normalize_ranges',
+        ('replace_name', {'old_name': 'x', 'new_name': 'y'}),
+        ('add_func_decorator', {'decorator': 'jit'}),
+    ]
+    expected = PassManager(pipeline).run(ast.parse(textwrap.dedent(code)))
+    tree = PassManager(pipeline, fuse=True).run(ast.parse(textwrap.dedent(code)))
+    assert ast.unparse(tree) == ast.unparse(expected)
+    # The passes only rewrite the outermost nodes they handle
+    src = ast.unparse(tree)
+    assert src.count('@jit') == 1 and src.count('@dec') == 1
+    assert 'np.where(y > 1, y, 1)' in src
+    assert 'range(0, len(range(y)), 1)' in src
@@ -0,0 +1,44 @@
+import textwrap
+import numpy as np
+from astpass import harness
+
+def make_vals(n):
+    rng = np.random.default_rng(0)
+    return {'a': rng.random(n), 'b': rng.random(n), 'c': np.empty(n), 's': 0.0, 'np': np}
+
+def test_sweep_statements():
+    code = """
+    c = a * 2.0 + b
+    s = np.sum(c)
+    """
+    report = harness.sweep(textwrap.dedent(code), make_vals, [4, 16], {
+        'loops': ['vector_op_to_loop'],
+        'wrong': [('replace_name', {'old_name': 'b', 'new_name': 'a'})],
+    }, repeat=1, min_time=0)
+    for size in (4, 16):
+        assert report['original', size].ok and report['loops', size].ok
+        assert 'for __i0 in range(0, %d)' % size in report['loops', size].src
+        assert report['wrong', size].error.startswith('Mismatch')
+    assert 'crossover loops' in report.table()
+
+def test_sweep_function():
+    code = """
+    def kernel(a, b, c):
+        c[:] = a - b
+        return np.max(c)
+    """
+    vals = lambda n: {k: v for k, v in make_vals(n).items() if k != 's'}
+    report = harness.sweep(textwrap.dedent(code), vals, [8], {'loops': ['vector_op_to_loop']},
+                           repeat=1, min_time=0)
+    assert report['loops', 8].ok, report['loops', 8].error
+
+def test_crossover():
+    report = harness.Report(['original', 'loops'], [10, 100, 1000, 10000])
+    for size, (t0, t1) in zip(report.sizes, [(1, 2), (1, 0.5), (1, 2), (1, 0.5)]):
+        report.add(harness.VariantResult('original', size, time=t0))
+        report.add(harness.VariantResult('loops', size, time=t1))
+    assert report.crossover('loops') == 10000
+    report.add(harness.VariantResult('loops', 1000, time=0.9))
+    assert report.crossover('loops') == 100
+    assert report.speedup('loops', 100) == 2
+    assert report.to_dict()['crossover'] == {'loops': 100}
@@ -0,0 +1,81 @@
+import ast
+import textwrap
+import numpy as np
+from astpass import ArraySpec
+from astpass.passes import multiversion
+from astpass.pass_manager import PassManager
+
+CODE = """
+def f(a, b, c):
+    c[:] = a * 2.0 + b
+    return c
+"""
+
+def sig(n):
+    return {'a': ArraySpec((n,)), 'b': ArraySpec((n,)), 'c': ArraySpec((n,))}
+
+def test_function_versions():
+    tree = multiversion.transform(ast.parse(textwrap.dedent(CODE)), [sig(1), sig(8)])
+    src = ast.unparse(tree)
+    assert src.startswith("def f(a, b, c):\n    if getattr(a, 'shape', None) == (1,) and getattr(a, 'dtype', None) == 'float64'")
+    assert "getattr(b, 'shape', None) == (1,)" in src
+    assert "    elif getattr(a, 'shape', None) == (8,) and getattr(a, 'dtype', None) == 'float64'" in src
+    assert 'range(0, 8)' in src
+    assert src.endswith("else:\n        c[:] = a * 2.0 + b\n        return c")
+
+    namespace = {}
+    exec(src, namespace)
+    for n in (1, 8, 5):
+        a, b = np.arange(float(n)), np.ones(n)
+        np.testing.assert_allclose(namespace['f'](a, b, np.empty(n)), a * 2.0 + b)
+
+def test_duplicate_guards_are_skipped():
+    fortran = {k: ArraySpec((4,), order='F') for k in 'abc'}
+    tree = multiversion.transform(ast.parse(textwrap.dedent(CODE)), [sig(4), fortran])
+    assert ast.unparse(tree).count("getattr(a, 'shape', None) == (4,)") == 1
+
+def test_dtype_versions():
+    code = """
+    def f(a):
+        return np.sum(a)
+    """
+    float32 = {'a': ArraySpec((8,), 'float32')}
+    int64 = {'a': ArraySpec((8,), 'int64')}
+    tree = multiversion.transform(ast.parse(textwrap.dedent(code)), [float32, int64], runtime_vals={'np': np})
+    src = ast.unparse(tree)
+    assert "getattr(a, 'dtype', None) == 'float32'" in src
+    assert "getattr(a, 'dtype', None) == 'int64'" in src
+
+    namespace = {'np': np}
+    exec(src, namespace)
+    for a in (np.arange(8, dtype=np.float32), np.arange(8), np.arange(8.0)):
+        result = namespace['f'](a)
+        assert result == a.sum() and type(result) is type(a.sum())
+
+def test_straight_line_code():
+    code = "c = a + 1.0"
+    tree = multiversion.transform(ast.parse(code), [{'a': np.zeros(3), 'n': 2}])
+    src = ast.unparse(tree)
+    assert src.startswith("if getattr(a, 'shape', None) == (3,) and getattr(a, 'dtype', None) == 'float64':")
+    assert 'getattr(n' not in src
+
+def test_pass_manager():
+    pm = PassManager([('multiversion', {'signatures': [sig(2), sig(3)]})])
+    src = ast.unparse(pm.run(ast.parse(textwrap.dedent(CODE)), {'np': np}))
+    assert "getattr(a, 'shape', None) == (2,)" in src and "getattr(a, 'shape', None) == (3,)" in src
+
+def test_mixed_scalar_and_array_arguments():
+    scalar_b = {'a': ArraySpec((8,)), 'b': 2.0, 'c': ArraySpec((8,))}
+    tree = multiversion.transform(ast.parse(textwrap.dedent(CODE)), [sig(8), scalar_b])
+    src = ast.unparse(tree)
+    assert "getattr(b, 'shape', None) is None" in src
+
+    namespace = {}
+    exec(src, namespace)
+    f = namespace['f']
+    a = np.arange(8.0)
+    np.testing.assert_allclose(f(a, 2.0, np.empty(8)), a * 2.0 + 2.0)
+    np.testing.assert_allclose(f(a, np.ones(8), np.empty(8)), a * 2.0 + 1.0)
+    # An array where the signature has a scalar, and other sizes, fall through
+    np.testing.assert_allclose(f(np.arange(5.0), 2.0, np.empty(5)), np.arange(5.0) * 2.0 + 2.0)
+    np.testing.assert_allclose(f(np.arange(5.0), np.ones(5), np.empty(5)), np.arange(5.0) * 2.0 + 1.0)
@@ -0,0 +1,50 @@
+import ast
+import textwrap
+import numpy as np
+from astpass.names import NameGenerator
+from astpass.passes import vector_op_to_loop, hoist_shape_access, to_single_op_form
+
+def test_fresh_and_unique():
+    names = NameGenerator(ast.parse("def f(__i1, x):\n    __i0 = __ret"))
+    assert [names.fresh('__i') for _ in range(3)] == ['__i2', '__i3', '__i4']
+    assert names.fresh('__v', start=1) == '__v1'
+    assert names.unique('__ret') == '__ret_1'
+    assert names.unique('__tmp') == '__tmp'
+    assert names.unique('__tmp') == '__tmp_1'
+    assert names.unique('f') == 'f_1'
+    assert names.is_generated('__tmp') and not names.is_generated('x')
+
+def test_loop_index_avoids_used_names():
+    code = """
+    __i0 = 1
+    c = a + b
+    """
+    rt_vals = {'a': np.zeros(10), 'b': np.zeros(10), 'c': np.zeros(10)}
+    tree = vector_op_to_loop.transform(ast.parse(textwrap.dedent(code)), rt_vals)
+    assert 'for __i1 in range(0, 10)' in ast.unparse(tree)
+
+def test_hoisted_shape_avoids_used_names():
+    code = """
+    a_shape_0 = 2
+    for i in range(a.shape[0]):
+        b[i] = a[i] * a_shape_0
+    """
+    expected = """
+    a_shape_0 = 2
+    a_shape_0_1 = a.shape[0]
+    for i in range(a_shape_0_1):
+        b[i] = a[i] * a_shape_0
+    """
+    tree = hoist_shape_access.transform(ast.parse(textwrap.dedent(code)))
+    assert ast.unparse(tree) == ast.unparse(ast.parse(textwrap.dedent(expected)))
+
+def test_output_is_reproducible():
+    code = """
+    def f(a, b, __v1):
+        d = a + b * __v1
+        return d * 2
+    """
+    outputs = {ast.unparse(to_single_op_form.transform(ast.parse(textwrap.dedent(code)))) for _ in range(3)}
+    assert len(outputs) == 1
+    out = outputs.pop()
+    assert '__v2 = b * __v1' in out and '__ret = d * 2' in out
@@ -0,0 +1,47 @@
+import ast
+import textwrap
+import numpy as np
+
+from astpass.pass_manager import PassManager, Pass, ALL
+from astpass.passes import vector_op_to_loop, hoist_shape_access
+
+def test_pipeline():
+    code = """
+    c = a + b
+    """
+    rt_vals = {
+        'a': np.random.randn(10),
+        'b': 1.0,
+        'c': np.empty(10)
+    }
+    pm = PassManager([
+        'remove_func_decorator',
+        ('vector_op_to_loop', {'loop_index_prefix': '__j'}),
+        'hoist_shape_access',
+    ])
+    tree = pm.run(ast.parse(textwrap.dedent(code)), rt_vals)
+
+    expected = vector_op_to_loop.transform(ast.parse(textwrap.dedent(code)), rt_vals, '__j')
+    expected = hoist_shape_access.transform(expected)
+    assert ast.unparse(tree) == ast.unparse(expected)
+    assert [name for name, _ in pm.timings] == \
+        ['remove_func_decorator', 'analysis:shapes', 'analysis:names', 'vector_op_to_loop', 'hoist_shape_access']
+
+def test_cached_analysis():
+    seen = []
+    def record_shapes(tree, analyses, runtime_vals):
+        seen.append(analyses['shapes'])
+        return tree
+
+    reader = Pass('reader', record_shapes, requires=('shapes',), preserves=ALL)
+    pm = PassManager([reader, ('add_func_decorator', {'decorator': 'jit'}),
+                      reader, 'normalize_ranges', reader])
+    code = """
+    def foo(a):
+        return a + 1
+    """
+    pm.run(ast.parse(textwrap.dedent(code)), {'a': np.ones(3)})
+    assert seen[0] is seen[1]
+    assert seen[1] is not seen[2]
+    assert pm.stats['computed']['shapes'] == 2
+    assert pm.stats['cached']['shapes'] == 1
@@ -0,0 +1,67 @@
+import ast
+import json
+import textwrap
+import numpy as np
+from astpass import profiling
+from astpass.code_cache import CodeCache
+from astpass.pass_manager import PassManager
+
+code = """
+c = a + b
+s = np.sum(c)
+"""
+
+rt_vals = {'a': np.zeros(10), 'b': np.zeros(10), 'c': np.zeros(10), 's': 0.0, 'np': np}
+
+def run_pipeline():
+    pm = PassManager(['remove_func_decorator', 'vector_op_to_loop', 'hoist_shape_access'])
+    return pm.run(ast.parse(textwrap.dedent(code)), rt_vals)
+
+def test_profile_pipeline():
+    with profiling.profile(memory=True) as prof:
+        tree = run_pipeline()
+    names = [(e.category, e.name, e.cache) for e in prof.events]
+    assert names == [
+        ('pass', 'remove_func_decorator', None), ('analysis', 'shapes', 'miss'),
+        ('analysis', 'names', 'miss'), ('pass', 'vector_op_to_loop', None),
+        ('analysis', 'names', 'hit'), ('pass', 'hoist_shape_access', None),
+    ]
+    loop_pass = prof.events[3]
+    assert loop_pass.nodes_in < loop_pass.nodes_out
+    assert prof.events[-1].nodes_out == sum(1 for _ in ast.walk(tree))
+    timed = [e for e in prof.events if e.cache != 'hit']
+    assert all(e.duration > 0 and e.peak is not None and e.peak >= 0 for e in timed)
+    assert 'vector_op_to_loop' in prof.summary()
+
+def test_export():
+    with profiling.profile() as prof:
+        run_pipeline()
+    events = json.loads(prof.to_json())
+    assert events[0]['name'] == 'remove_func_decorator' and events[0]['allocated'] is None
+    trace = json.loads(prof.to_chrome_trace())['traceEvents']
+    assert len(trace) == len(events)
+    assert trace[1]['ph'] == 'X' and trace[1]['cat'] == 'analysis' and trace[1]['dur'] > 0
+
+def test_callback_and_cache_hits():
+    seen = []
+    cache = CodeCache()
+    with profiling.profile(nodes=False, callback=seen.append):
+        cache.load("x = 1")
+        cache.load("x = 1")
+    assert [(e.name, e.cache) for e in seen] == [('compile', 'miss'), ('load', 'miss'), ('load', 'hit')]
+
+def test_disabled():
+    assert profiling.active() is None
+    with profiling.record('op', 'test') as event:
+        assert event is None
+
+def test_install():
+    seen = []
+    profiling.install(profiling.Profile(callback=seen.append, keep_events=False))
+    try:
+        run_pipeline()
+    finally:
+        profiling.install(None)
+    assert len(seen) == 6
+    run_pipeline()
+    assert len(seen) == 6
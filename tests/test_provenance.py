@@ -0,0 +1,86 @@
+import ast
+import textwrap
+import numpy as np
+from astpass.pass_manager import PassManager
+from astpass.provenance import propagate_locations
+from astpass.passes import where_to_ternary
+
+CODE = textwrap.dedent("""
+def f(a, b, c):
+    c[:] = a + b
+    s = np.sum(c)
+    return s
+""")
+
+def rt_vals():
+    return {'a': np.zeros(4), 'b': np.zeros(4), 'c': np.zeros(4), 'np': np}
+
+def test_every_node_has_a_location():
+    tree = PassManager(['vector_op_to_loop', 'hoist_shape_access']).run(ast.parse(CODE), rt_vals())
+    for node in ast.walk(tree):
+        if 'lineno' in node._attributes:
+            assert node.lineno is not None, ast.dump(node)
+
+def test_generated_loop_gets_span_of_replaced_statement():
+    tree = PassManager(['vector_op_to_loop']).run(ast.parse(CODE), rt_vals())
+    loops = [node for node in ast.walk(tree) if isinstance(node, ast.For)]
+    assert [loop.lineno for loop in loops] == [3, 4]
+    assert all(stmt.lineno == 3 for stmt in loops[0].body)
+
+def test_provenance_table():
+    original = ast.parse(CODE)
+    assign = original.body[0].body[0]
+    pm = PassManager(['vector_op_to_loop'], provenance=True)
+    tree = pm.run(original, rt_vals())
+    loop = next(node for node in ast.walk(tree) if isinstance(node, ast.For))
+    origin = pm.provenance.origin(loop)
+    assert origin.pass_name == 'vector_op_to_loop'
+    assert origin.nodes[0] is assign
+    assert origin.lineno == 3
+    ret = tree.body[0].body[-1]
+    assert pm.provenance.origin(ret).pass_name is None
+
+def test_line_map():
+    pm = PassManager(['vector_op_to_loop'], provenance=True)
+    tree = pm.run(ast.parse(CODE), rt_vals())
+    src = ast.unparse(tree)
+    line_map = pm.provenance.line_map(tree, src)
+    lines = src.splitlines()
+    for out_line, (line, pass_name) in line_map.items():
+        text = lines[out_line - 1].strip()
+        if text.startswith('for __i0'):
+            assert (line, pass_name) == (3, 'vector_op_to_loop')
+        if text.startswith('c[__i0] ='):
+            # The original statement, rewritten in place
+            assert line == 3
+        if text == 'return s':
+            assert (line, pass_name) == (5, None)
+
+def test_transformer_copies_location_of_replaced_node():
+    tree = ast.parse("x = 1\ny = np.where(a > 0, a, b)")
+    tree = where_to_ternary.transform(tree)
+    value = tree.body[1].value
+    assert isinstance(value, ast.IfExp)
+    assert (value.lineno, value.col_offset) == (2, 4)
+
+def test_propagate_locations_treats_none_as_missing():
+    stmt = ast.parse("x = 1").body[0]
+    new = ast.Expr(value=ast.Name(id='y', ctx=ast.Load()), lineno=None)
+    propagate_locations(new, stmt)
+    assert new.lineno == new.value.lineno == 1
+
+def test_line_map_covers_multiversioned_function():
+    from astpass import ArraySpec
+    signatures = [{k: ArraySpec((n,)) for k in 'abc'} for n in (2, 3)]
+    pm = PassManager([('multiversion', {'signatures': signatures})], provenance=True)
+    tree = pm.run(ast.parse(CODE), rt_vals())
+    src = ast.unparse(tree)
+    stmt_lines = {node.lineno for node in ast.walk(ast.parse(src)) if isinstance(node, ast.stmt)}
+    assert set(pm.provenance.line_map(tree, src)) == stmt_lines
+
+    # Constant tuples unparse as tuple displays, which must not end the map
+    stmt = ast.Assign(targets=[ast.Name(id='t', ctx=ast.Store())], value=ast.Constant((4,)))
+    tree.body[0].body.insert(0, propagate_locations(stmt, tree.body[0]))
+    src = ast.unparse(tree)
+    stmt_lines = {node.lineno for node in ast.walk(ast.parse(src)) if isinstance(node, ast.stmt)}
+    assert set(pm.provenance.line_map(tree, src)) == stmt_lines
@@ -628,4 +628,141 @@ def test_assign2():
 #         if isinstance(node, ast.Name) and node.id == 'a':
 #             assert shape == (100,)
 #         else:
-#             assert shape == ()
\ No newline at end of file
+#             assert shape == ()
+
+
+def test_dtype1():
+    code = """
+    a * 2 + b
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {"a": np.ones(10, dtype=np.float32), "b": 1.5}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape.dtype) for node, shape in shape_info.items()]
+    assert results == [('a', 'float32'), ('2', 'int'), ('a * 2', 'float32'), ('b', 'float'), ('a * 2 + b', 'float32')]
+
+def test_dtype2():
+    code = """
+    a / b
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {"a": np.ones(10, dtype=np.int32), "b": np.ones(10, dtype=np.int16)}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape, shape.dtype) for node, shape in shape_info.items()]
+    assert results == [('a', (10,), 'int32'), ('b', (10,), 'int16'), ('a / b', (10,), 'float64')]
+
+def test_dtype_small_int_division():
+    for dtype in (np.bool_, np.int8, np.uint8, np.int16, np.uint16):
+        tree = ast.parse("a / a")
+        rt_vals = {"a": np.ones(10, dtype=dtype)}
+        shape_info = shape_analysis.analyze(tree, rt_vals)
+        expected = (rt_vals["a"] / rt_vals["a"]).dtype.name
+        assert shape_info[tree.body[0].value].dtype == expected == 'float64'
+
+def test_dtype_numpy_scalar():
+    tree = ast.parse("a + b")
+    rt_vals = {"a": np.ones(10, dtype=np.float32), "b": np.float64(1)}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape.dtype) for node, shape in shape_info.items()]
+    assert results == [('a', 'float32'), ('b', 'float64'), ('a + b', 'float64')]
+    assert (rt_vals["a"] + rt_vals["b"]).dtype.name == 'float64'
+
+def test_dtype3():
+    code = """
+    np.sum(np.sin(a) > b)
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {"a": np.ones(10, dtype=np.int16), "b": 0.5, "np": np}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape.dtype) for node, shape in shape_info.items()]
+    assert results == [('a', 'int16'), ('np.sin(a)', 'float32'), ('b', 'float'), \
+        ('np.sin(a) > b', 'bool'), ('np.sum(np.sin(a) > b)', 'int64')]
+
+def test_dtype4():
+    code = """
+    c = a[i] + 1
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {"a": np.ones(10, dtype=np.uint8), "i": 0}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape.dtype) for node, shape in shape_info.items()]
+    assert results == [('a', 'uint8'), ('i', 'int'), ('a[i]', 'uint8'), ('1', 'int'), ('a[i] + 1', 'uint8'), ('c', 'uint8')]
+
+def test_if1():
+    code = """
+    if n > 0:
+        x = a
+    else:
+        x = b
+    y = x + 1
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {"a": np.random.randn(10), "b": np.random.randn(20), "n": 1}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape) for node, shape in shape_info.items() if isinstance(node, ast.Name)]
+    assert results == [('n', ()), ('a', (10,)), ('x', (10,)), ('b', (20,)), ('x', (20,)), \
+        ('x', (None,)), ('y', (None,))]
+
+def test_if2():
+    code = """
+    def foo(a, n):
+        if n > 0:
+            return a[0]
+        x = a * 2
+        return x
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {"a": np.random.randn(10), "n": 1}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape) for node, shape in shape_info.items() if isinstance(node, ast.Return)]
+    assert results == [('return a[0]', ()), ('return x', (10,))]
+
+def test_for1():
+    code = """
+    s = 0.0
+    for i in range(n):
+        s += a[i]
+    for row in b:
+        t = row * s
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {"a": np.ones(10, dtype=np.float32), "b": np.random.randn(3, 4), "n": 10}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape, shape.dtype) for node, shape in shape_info.items() \
+        if isinstance(node, ast.Name) and node.id in ['s', 'row', 't']]
+    assert results == [('s', (), 'float'), ('s', (), 'float32'), ('row', (4,), 'float64'), \
+        ('row', (4,), 'float64'), ('s', (), 'float32'), ('t', (4,), 'float64')]
+
+def test_while1():
+    code = """
+    x = a
+    while n > 0:
+        y = x + 1
+        x = b
+        n -= 1
+    z = x
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {"a": np.random.randn(10), "b": np.random.randn(20), "n": 3}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape) for node, shape in shape_info.items() \
+        if isinstance(node, ast.Name) and node.id in ['y', 'z']]
+    assert results == [('y', (None,)), ('z', (None,))]
+
+def test_tuple_assign1():
+    code = """
+    x, y = a, b[0]
+    u, v = c
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {"a": 1.0, "b": np.random.randn(4, 5), "c": np.random.randn(2, 3)}
+    shape_info = shape_analysis.analyze(tree, rt_vals)
+    results = [(ast.unparse(node), shape) for node, shape in shape_info.items() \
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)]
+    assert results == [('x', ()), ('y', (5,)), ('u', (3,)), ('v', (3,))]
+
+def test_module_without_shape_attr():
+    import math
+    tree = ast.parse("b = a + 1.0")
+    shape_info = shape_analysis.analyze(tree, {'a': np.zeros(3), 'math': math})
+    assert shape_info[tree.body[0].value] == (3,)
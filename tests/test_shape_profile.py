@@ -0,0 +1,58 @@
+import numpy as np
+from astpass.dispatcher import Dispatcher
+from astpass.shape_profile import ShapeProfile
+
+def kernel(a, b, c, n):
+    c[:] = a * 2.0 + b
+    return c[:n]
+
+def call(d, size, n=1, dtype=np.float64):
+    a = np.zeros(size, dtype)
+    return d(a, a, np.zeros(size, dtype), n)
+
+def test_record_histogram():
+    d = Dispatcher(kernel, profile=True)
+    for _ in range(3):
+        call(d, 8)
+    call(d, 64, n=2)
+    call(d, 8, dtype=np.float32)
+    sigs = d.profile.signatures()
+    assert sigs[('float64[8]', 'float64[8]', 'float64[8]', 'int')] == 3
+    assert sigs[('float32[8]', 'float32[8]', 'float32[8]', 'int')] == 1
+    assert d.profile.select(max_signatures=1) == [('float64[8]', 'float64[8]', 'float64[8]', 'int')]
+    assert d.profile.hot_values('n', min_fraction=0.5) == [1]
+
+def test_max_values_and_sampling():
+    profile = ShapeProfile(['n'], max_values=2, sample_every=2)
+    for n in range(10):
+        profile.record((int,), (n,))
+    assert profile.calls == 10
+    assert sum(profile.signatures().values()) == 5
+    assert len(profile.values[0]) == 2
+    assert profile.other_values[0] == 3
+
+def test_save_load_and_warm(tmp_path):
+    d = Dispatcher(kernel, profile=True)
+    call(d, 8)
+    call(d, 16)
+    path = str(tmp_path / "profile.json")
+    d.profile.save(path)
+
+    loaded = ShapeProfile.load(path)
+    assert loaded.signatures() == d.profile.signatures()
+    assert loaded.runtime_vals(('float64[16]',) * 3 + ('int',))['n'] == 1
+
+    fresh = Dispatcher(kernel, profile=loaded)
+    assert len(fresh.warm()) == 2
+    assert len(fresh.specializations) == 2
+    compiled = set(fresh.specializations)
+    call(fresh, 16)
+    assert set(fresh.specializations) == compiled
+
+def test_warm_specialized_hot_values():
+    d = Dispatcher(kernel, specialize=('n',), profile=True)
+    for n in (1, 2, 2, 3):
+        call(d, 4, n=n)
+    d.specializations.clear()
+    keys = d.warm(max_signatures=1)
+    assert sorted(k[3][1] for k in keys) == [1, 2, 3]
@@ -0,0 +1,85 @@
+import ast
+import textwrap
+import numpy as np
+
+from astpass import sharded
+from astpass.passes import vector_op_to_loop
+
+def test_pointwise():
+    code = """
+    c = a + b
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {
+        'a': np.random.randn(100),
+        'b': 1.0,
+        'c': np.empty(100)
+    }
+    tree = vector_op_to_loop.transform(tree, rt_vals)
+    with sharded.ShardedExecutor(max_workers=2) as executor:
+        executor.run(tree, rt_vals)
+    assert np.allclose(rt_vals['c'], rt_vals['a'] + 1.0)
+
+def test_reduction():
+    code = """
+    s = 0.0
+    m = float('-inf')
+    for i in prange(0, 100):
+        s = s + a[i] * b[i]
+        m = max(m, a[i])
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {
+        'a': np.random.randn(100),
+        'b': np.random.randn(100),
+    }
+    with sharded.ShardedExecutor(max_workers=3) as executor:
+        ns = executor.run(tree, rt_vals)
+    assert np.isclose(ns['s'], rt_vals['a'] @ rt_vals['b'])
+    assert ns['m'] == rt_vals['a'].max()
+
+def test_commuted_and_product_reductions():
+    code = """
+    s = 0.0
+    p = 1.0
+    for i in prange(0, 10):
+        s = a[i] + s
+        p *= a[i]
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {'a': np.arange(1.0, 11.0)}
+    with sharded.ShardedExecutor(max_workers=3) as executor:
+        ns = executor.run(tree, rt_vals)
+    assert ns['s'] == 55.0
+    assert ns['p'] == np.prod(rt_vals['a'])
+
+def test_carried_scalar_runs_sequentially():
+    code = """
+    s = 0.0
+    for i in prange(0, 10):
+        s = s * 0.5 + a[i]
+        c[i] = s
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {'a': np.arange(10.0), 'c': np.zeros(10)}
+    expected = dict(rt_vals, c=np.zeros(10), prange=range)
+    exec(ast.unparse(tree), expected)
+    with sharded.ShardedExecutor(max_workers=3) as executor:
+        ns = executor.run(tree, rt_vals)
+    assert ns['s'] == expected['s']
+    assert np.array_equal(rt_vals['c'], expected['c'])
+
+def test_reuse_segments():
+    code = """
+    for i in prange(1, n):
+        c[i] = a[i] - a[i - 1]
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    with sharded.ShardedExecutor(max_workers=2) as executor:
+        a = executor.share(np.arange(50.0) ** 2)
+        for n in [50, 20]:
+            c = np.zeros(50)
+            executor.run(tree, {'a': a, 'c': c, 'n': n})
+            assert np.allclose(c[1:n], np.diff(a[:n]))
+            assert np.all(c[n:] == 0)
+        assert list(executor.segments) == ['c']
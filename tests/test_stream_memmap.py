@@ -0,0 +1,95 @@
+import ast
+import textwrap
+import numpy as np
+
+from astpass.passes import stream_memmap
+
+def make_memmap(tmp_path, name, values):
+    m = np.memmap(tmp_path / name, dtype=values.dtype, mode='w+', shape=values.shape)
+    m[:] = values
+    return m
+
+def test_pointwise(tmp_path):
+    code = """
+    c = a + b
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {
+        'a': make_memmap(tmp_path, 'a', np.random.randn(100)),
+        'b': 1.0,
+        'c': make_memmap(tmp_path, 'c', np.zeros(100)),
+    }
+    tree = stream_memmap.transform(tree, rt_vals, memory_budget=640)
+
+    expected = """
+    for __blk0 in range(0, 100, 26):
+        __blk0_end = min(__blk0 + 26, 100)
+        c[__blk0:__blk0_end] = a[__blk0:__blk0_end] + b
+    """
+    assert ast.unparse(tree) == ast.unparse(ast.parse(textwrap.dedent(expected)))
+
+    exec(ast.unparse(tree), rt_vals)
+    assert np.allclose(rt_vals['c'], rt_vals['a'] + 1.0)
+
+def test_reduction(tmp_path):
+    code = """
+    s = np.sum(a * b)
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {
+        'a': make_memmap(tmp_path, 'a', np.random.randn(10, 4)),
+        'b': make_memmap(tmp_path, 'b', np.random.randn(10, 4)),
+        's': 0.0,
+        'np': np,
+    }
+    tree = stream_memmap.transform(tree, rt_vals, memory_budget=300)
+
+    expected = """
+    __reduce_sum_var = 0.0
+    for __blk0 in range(0, 10, 3):
+        __blk0_end = min(__blk0 + 3, 10)
+        __reduce_sum_var = __reduce_sum_var + np.sum(a[__blk0:__blk0_end] * b[__blk0:__blk0_end])
+    s = __reduce_sum_var
+    """
+    assert ast.unparse(tree) == ast.unparse(ast.parse(textwrap.dedent(expected)))
+
+    exec(ast.unparse(tree), rt_vals)
+    assert np.isclose(rt_vals['s'], np.sum(rt_vals['a'] * rt_vals['b']))
+
+def test_fits_in_budget(tmp_path):
+    code = """
+    c = a + b
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {
+        'a': make_memmap(tmp_path, 'a', np.random.randn(100)),
+        'b': np.random.randn(100),
+        'c': np.zeros(100),
+    }
+    tree = stream_memmap.transform(tree, rt_vals)
+    assert ast.unparse(tree) == 'c = a + b'
+
+def test_new_target(tmp_path):
+    code = """
+    c = a + 1.0
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {'a': make_memmap(tmp_path, 'a', np.random.randn(100))}
+    tree = stream_memmap.transform(tree, rt_vals, memory_budget=640)
+    assert ast.unparse(tree) == 'c = a + 1.0'
+
+def test_temporary_operand(tmp_path):
+    code = """
+    t = a * 2.0
+    c = t + a
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {
+        'a': make_memmap(tmp_path, 'a', np.random.randn(100)),
+        'c': make_memmap(tmp_path, 'c', np.zeros(100)),
+    }
+    tree = stream_memmap.transform(tree, rt_vals, memory_budget=640)
+    assert ast.unparse(tree) == ast.unparse(ast.parse(textwrap.dedent(code)))
+
+    exec(ast.unparse(tree), rt_vals)
+    assert np.allclose(rt_vals['c'], rt_vals['a'] * 3.0)
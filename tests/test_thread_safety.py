@@ -0,0 +1,64 @@
+import ast
+import sys
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from astpass.pass_manager import PassManager
+from astpass.passes import shape_analysis, get_used_names, to_single_op_form
+from astpass.utils import clone_ast
+
+src = textwrap.dedent("""
+def f(a, b, c, n):
+    c[:-1] = np.sin(a[1:]) + b[:-1] * 2.0
+    s = np.sum(c)
+    for i in range(n):
+        s += a[i]
+    return s
+""")
+
+rt_vals = {
+    'a': np.zeros(10), 'b': np.zeros(10), 'c': np.zeros(10), 'n': 3, 's': 0.0, 'np': np,
+}
+
+def dump(tree):
+    return ast.dump(tree, include_attributes=True)
+
+def run_concurrently(func, n=64):
+    old = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            return list(executor.map(lambda _: func(), range(n)))
+    finally:
+        sys.setswitchinterval(old)
+
+def test_analyses_do_not_mutate_shared_tree():
+    tree = ast.parse(src)
+    before = dump(tree)
+
+    def analyze():
+        shapes = shape_analysis.analyze(tree, rt_vals)
+        names = get_used_names.analyze(tree, no_funcname=False)
+        return sorted((ast.unparse(node), repr(shape)) for node, shape in shapes.items()), names
+
+    results = run_concurrently(analyze)
+    assert all(r == results[0] for r in results)
+    assert dump(tree) == before
+
+def test_concurrent_pipelines_are_reproducible():
+    tree = ast.parse(src)
+    pipeline = ['remove_func_decorator', 'vector_op_to_loop', 'hoist_shape_access']
+
+    def compile_kernel():
+        return ast.unparse(PassManager(pipeline).run(clone_ast(tree), rt_vals))
+
+    expected = compile_kernel()
+    assert all(r == expected for r in run_concurrently(compile_kernel))
+
+def test_fresh_names_are_per_invocation():
+    code = "d = a + b * c"
+    first = ast.unparse(to_single_op_form.transform(ast.parse(code)))
+    second = ast.unparse(to_single_op_form.transform(ast.parse(code)))
+    assert first == second
+    assert all(r == first for r in run_concurrently(
+        lambda: ast.unparse(to_single_op_form.transform(ast.parse(code)))))
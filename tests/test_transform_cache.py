@@ -0,0 +1,49 @@
+import os
+import textwrap
+import numpy as np
+from astpass.array_spec import ArraySpec
+from astpass.transform_cache import TransformCache, cache_key
+
+src = textwrap.dedent("""
+def f(a, b, c):
+    c[:] = a + b
+""")
+
+def rt_vals(n):
+    return {'a': np.zeros(n), 'b': np.zeros(n), 'c': np.zeros(n)}
+
+def test_transform_hit_and_miss(tmp_path):
+    cache = TransformCache(str(tmp_path))
+    out1 = cache.transform(src, rt_vals(10), ['vector_op_to_loop'])
+    assert 'for ' in out1
+    out2 = cache.transform(src, rt_vals(10), ['vector_op_to_loop'])
+    assert out1 == out2
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['writes'] == 1
+    assert stats['entries'] == 1 and stats['bytes'] == len(out1)
+
+    # A new process sees the entry
+    assert TransformCache(str(tmp_path)).transform(src, rt_vals(10), ['vector_op_to_loop']) == out1
+
+def test_key():
+    pipeline = ['vector_op_to_loop']
+    key = cache_key(src, rt_vals(10), pipeline)
+    specs = {'a': ArraySpec((10,)), 'b': ArraySpec((10,)), 'c': ArraySpec((10,))}
+    assert cache_key(src, specs, pipeline) == key
+    assert cache_key(src, rt_vals(11), pipeline) != key
+    assert cache_key(src, rt_vals(10), [('vector_op_to_loop', {'loop_index_prefix': '__j'})]) != key
+    assert cache_key(src, rt_vals(10), pipeline, fuse=True) != key
+    assert cache_key(src + "\n", rt_vals(10), pipeline) != key
+
+def test_lru_eviction(tmp_path):
+    cache = TransformCache(str(tmp_path), max_bytes=350)
+    for k in range(3):
+        cache.put(f"key{k}", "x" * 100)
+        os.utime(cache.path(f"key{k}"), (k, k))
+    # key0 was written first but used last
+    os.utime(cache.path("key0"), (10, 10))
+    cache.put("key3", "x" * 100)
+    assert cache.get("key1") is None
+    assert all(cache.get(key) is not None for key in ("key0", "key2", "key3"))
+    assert cache.stats()['evictions'] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
@@ -159,4 +159,46 @@ def test_np_min1():
         c = min(c, a[__i0])
     """
     new_code = ast.unparse(tree)
-    assert new_code == ast.unparse(ast.parse(textwrap.dedent(expected)))
\ No newline at end of file
+    assert new_code == ast.unparse(ast.parse(textwrap.dedent(expected)))
+
+def test_np_sum_int():
+    code = """
+    c = np.sum(a)
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {
+        'a': np.arange(10),
+        'c': 0,
+        'np': np
+    }
+    tree = vector_op_to_loop.transform(tree, rt_vals)
+
+    expected = """
+    __reduce_sum_var = 0
+    for __i0 in range(0, 10):
+        __reduce_sum_var = __reduce_sum_var + a[__i0]
+    c = __reduce_sum_var
+    """
+    new_code = ast.unparse(tree)
+    assert new_code == ast.unparse(ast.parse(textwrap.dedent(expected)))
+
+def test_np_max_int():
+    code = """
+    c = np.max(a)
+    """
+    tree = ast.parse(textwrap.dedent(code))
+    rt_vals = {
+        'a': np.arange(10, dtype=np.int32),
+        'c': 0,
+        'np': np
+    }
+    tree = vector_op_to_loop.transform(tree, rt_vals)
+
+    expected = """
+    __reduce_max_var = -2147483648
+    for __i0 in range(0, 10):
+        __reduce_max_var = max(__reduce_max_var, a[__i0])
+    c = __reduce_max_var
+    """
+    new_code = ast.unparse(tree)
+    assert new_code == ast.unparse(ast.parse(textwrap.dedent(expected)))
@@ -0,0 +1,73 @@
+import ast
+import textwrap
+
+from astpass.visitor import Visitor, Transformer
+
+code = """
+def foo(a, b):
+    for i in range(10):
+        a[i] = b[i] + (lambda x: x * 2)(i)
+    return a
+"""
+
+def test_visitor():
+    class Names(Visitor):
+        def __init__(self):
+            self.names = []
+
+        def visit_Name(self, node):
+            self.names.append(node.id)
+
+    class StdNames(ast.NodeVisitor):
+        def __init__(self):
+            self.names = []
+
+        def visit_Name(self, node):
+            self.names.append(node.id)
+
+    tree = ast.parse(textwrap.dedent(code))
+    v1, v2 = Names(), StdNames()
+    v1.visit(tree)
+    v2.visit(tree)
+    assert v1.names == v2.names
+
+def test_skip_subtrees():
+    class Stmts(Visitor):
+        def __init__(self):
+            self.visited = []
+
+        def visit_Return(self, node):
+            self.visited.append(node)
+
+        def generic_visit(self, node):
+            self.visited.append(node)
+            super().generic_visit(node)
+
+    tree = ast.parse(textwrap.dedent(code))
+    v = Stmts()
+    v.visit(tree)
+    assert not any(isinstance(node, (ast.expr, ast.expr_context)) for node in v.visited)
+    assert isinstance(v.visited[-1], ast.Return)
+
+def test_transformer():
+    class Expand(Transformer):
+        def visit_Assign(self, node):
+            self.generic_visit(node)
+            return [node, ast.Expr(value=ast.Name(id='done', ctx=ast.Load()))]
+
+        def visit_Return(self, node):
+            return None
+
+        def visit_Name(self, node):
+            if node.id == 'b':
+                return ast.Name(id='c', ctx=node.ctx)
+            return node
+
+    tree = Expand().visit(ast.parse(textwrap.dedent(code)))
+    expected = """
+    def foo(a, b):
+        for i in range(10):
+            a[i] = c[i] + (lambda x: x * 2)(i)
+            done
+    """
+    assert ast.unparse(tree) == ast.unparse(ast.parse(textwrap.dedent(expected)))